@@ -3,9 +3,15 @@ import os
 from flask_cors import CORS
 from flask import Flask, jsonify
 
+from config import JSON_PROVIDER
 from routes import Router
+from services.json_provider import JSON_PROVIDERS
+from services.timing_service import init_request_timing
+from services.metrics_service import init_request_metrics
+from services.compression_service import init_response_compression
 
 app = Flask(__name__)
+app.json = JSON_PROVIDERS[JSON_PROVIDER](app)
 
 cors_origins_str = os.environ.get("CORS_ORIGINS")
 if cors_origins_str:
@@ -16,13 +22,26 @@ else:
 CORS(
     app,
     origins=cors_origins,
-    allow_headers=["Content-Type", "Authorization"],
+    allow_headers=["Content-Type", "Authorization", "Idempotency-Key"],
     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
 )
 
 router = Router(app)
 router.init()
 
+init_request_timing(app)
+init_request_metrics(app)
+
+# Registered last so it runs before the other `after_request` hooks, and the
+# time spent compressing is included in request timings
+init_response_compression(app)
+
+
+@app.errorhandler(400)
+def bad_request_error(error):
+    # Keep the reason given when the request was rejected (e.g. a parse error)
+    return jsonify({"error": error.description}), 400
+
 
 @app.errorhandler(401)
 def unauthorized_error(error):
@@ -44,6 +63,11 @@ def invalid_request(error):
     return jsonify({"error": "Invalid or Malformed Request"}), 409
 
 
+@app.errorhandler(413)
+def request_too_large_error(error):
+    return jsonify({"error": "Request Entity Too Large"}), 413
+
+
 @app.errorhandler(415)
 def media_not_supported_error(error):
     return jsonify({"error": "Unsupported Media Type"}), 415
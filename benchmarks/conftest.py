@@ -0,0 +1,17 @@
+import pytest
+
+from app import app
+from services.jwt_service import JWTService
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def auth_header():
+    token = JWTService().generate_token(user_id=1)
+    return {"Authorization": f"Bearer {token}"}
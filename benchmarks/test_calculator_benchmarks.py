@@ -0,0 +1,70 @@
+import random
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from services.calculator_service import CalculatorService
+
+
+OPERAND_COUNTS = [2, 100, 10_000]
+
+# Operation IDs, as used in the calculator's operation map
+NUMBER_OPERATIONS = {
+    "addition": 1,
+    "subtraction": 2,
+    "multiplication": 3,
+    "division": 4,
+}
+
+
+@pytest.fixture
+def calculator():
+    return CalculatorService()
+
+
+def make_operands(count):
+    rng = random.Random(count)  # seeded, so runs are comparable
+    return [rng.uniform(1, 2) for _ in range(count)]
+
+
+@pytest.mark.parametrize("operand_count", OPERAND_COUNTS)
+@pytest.mark.parametrize("operation", NUMBER_OPERATIONS)
+def test_number_operation(benchmark, calculator, operation, operand_count):
+
+    benchmark.group = f"calculator-{operation}"
+    operands = make_operands(operand_count)
+
+    benchmark(calculator.calculate, NUMBER_OPERATIONS[operation], operands)
+
+
+@pytest.mark.parametrize("operand", [2, 2**53, 10**300])
+def test_square_root(benchmark, calculator, operand):
+
+    benchmark.group = "calculator-square_root"
+
+    benchmark(calculator.calculate, 5, [operand])
+
+
+@pytest.mark.parametrize("string_length", [8, 20])
+def test_random_string(benchmark, calculator, string_length):
+
+    benchmark.group = "calculator-random_string"
+
+    # Only the calculator's own work is measured, not the random.org request
+    response = MagicMock(text="abcdefghijklmnopqrst"[:string_length] + "\n")
+    options = {
+        "string_length": string_length,
+        "include_digits": True,
+        "include_uppercase_letters": True,
+        "include_lowercase_letters": True,
+    }
+
+    with patch("services.calculator_service.requests.get", return_value=response):
+        benchmark(calculator.calculate, 6, [options])
+
+
+def test_operation_options(benchmark, calculator):
+
+    benchmark.group = "calculator-options"
+
+    benchmark(lambda: [calculator.get_operation_options(i) for i in range(1, 7)])
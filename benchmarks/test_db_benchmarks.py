@@ -0,0 +1,88 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from services.db_service import DBService, _build_select
+
+
+HISTORY_JOIN = [
+    {"table": "operation", "left": "record.operation_id", "right": "operation.id"},
+    {"table": "user", "left": "record.user_id", "right": "user.id"},
+]
+
+
+@pytest.fixture
+def db():
+    db = DBService()
+    db.connection = MagicMock()
+
+    cursor = db.connection.cursor.return_value.__enter__.return_value
+    cursor.mogrify.side_effect = lambda query, params: query % tuple(
+        repr(p) for p in params
+    )
+    cursor.execute.return_value = 1
+    cursor.fetchall.return_value = []
+
+    return db
+
+
+def test_build_select_uncached(benchmark):
+
+    benchmark.group = "db-sql-building"
+
+    # Bypass the statement cache to measure building the SQL itself
+    build_select = _build_select.__wrapped__
+
+    benchmark(
+        build_select,
+        "record",
+        ("record.id", "operation.type", "user.username"),
+        tuple((j["table"], j["left"], j["right"]) for j in HISTORY_JOIN),
+        ("record.user_id", "record.deleted"),
+        "record.date DESC",
+        True,
+        True,
+    )
+
+
+def test_fetch_records(benchmark, db):
+
+    benchmark.group = "db-sql-building"
+
+    benchmark(
+        db.fetch_records,
+        "record",
+        fields=["record.id", "operation.type", "user.username"],
+        join=HISTORY_JOIN,
+        conditions={"record.user_id": 1, "record.deleted": 0},
+        limit=10,
+        offset=0,
+        order_by="record.date DESC",
+    )
+
+
+def test_update_record(benchmark, db):
+
+    benchmark.group = "db-sql-building"
+
+    benchmark(db.update_record, "record", {"user_balance": "12.5", "deleted": 0}, 1)
+
+
+@pytest.mark.parametrize("row_count", [10, 1000])
+def test_insert_many(benchmark, db, row_count):
+
+    benchmark.group = "db-bulk"
+
+    rows = [{"type": f"op_{i}", "cost": i / 10} for i in range(row_count)]
+
+    benchmark(db.insert_many, "operation", rows)
+
+
+@pytest.mark.parametrize("row_count", [10, 1000])
+def test_update_many(benchmark, db, row_count):
+
+    benchmark.group = "db-bulk"
+
+    rows = [{"id": i, "user_balance": f"{i}.50"} for i in range(row_count)]
+
+    benchmark(db.update_many, "record", rows)
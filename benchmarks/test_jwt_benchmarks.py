@@ -0,0 +1,37 @@
+from unittest.mock import patch
+
+from services.jwt_service import JWTService
+
+
+def test_generate_token(benchmark):
+
+    benchmark.group = "jwt"
+
+    benchmark(JWTService().generate_token, user_id=1)
+
+
+def test_verify_token(benchmark):
+
+    benchmark.group = "jwt"
+
+    jwt_service = JWTService()
+    token = jwt_service.generate_token(user_id=1)
+
+    result = benchmark(jwt_service.verify_token, token)
+    assert result["user_id"] == 1
+
+
+@patch("services.jwt_service.DBService")
+def test_verify_admin_token(mock_db_service, benchmark):
+
+    benchmark.group = "jwt"
+
+    mock_db_service.return_value.__enter__.return_value.fetch_records.return_value = [
+        {"api_key_hash": "valid_api_key_hash"}
+    ]
+
+    jwt_service = JWTService()
+    token = jwt_service.generate_admin_token("BENCHMARK", "FAKE TOKEN FOR BENCHMARKS")
+
+    result = benchmark(jwt_service.verify_token, token)
+    assert result["role"] == "admin"
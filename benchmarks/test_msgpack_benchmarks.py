@@ -0,0 +1,84 @@
+import json
+import random
+from unittest.mock import patch
+
+import msgpack
+import orjson
+import pytest
+
+
+OPERAND_COUNT = 10_000
+
+
+def make_request(number_type):
+    rng = random.Random(OPERAND_COUNT)  # seeded, so runs are comparable
+
+    if number_type == "int":
+        operands = [rng.randint(-(10**9), 10**9) for _ in range(OPERAND_COUNT)]
+    else:
+        operands = [rng.uniform(-1e9, 1e9) for _ in range(OPERAND_COUNT)]
+
+    return {"operation": "addition", "operands": operands}
+
+
+# Serializers for the request body, as a client would send it
+ENCODERS = {
+    "json": lambda obj: json.dumps(obj).encode("utf-8"),
+    "orjson": orjson.dumps,
+    "msgpack": msgpack.packb,
+}
+
+# Parsers for the request body, as the server would read it
+DECODERS = {
+    "json": json.loads,
+    "orjson": orjson.loads,
+    "msgpack": lambda data: msgpack.unpackb(data, raw=False),
+}
+
+
+@pytest.mark.parametrize("number_type", ["int", "float"])
+@pytest.mark.parametrize("codec", ["json", "orjson", "msgpack"])
+def test_parse_operands(benchmark, codec, number_type):
+
+    benchmark.group = f"operands-parse-{number_type}"
+    body = ENCODERS[codec](make_request(number_type))
+    benchmark.extra_info["body_bytes"] = len(body)
+
+    result = benchmark(DECODERS[codec], body)
+    assert len(result["operands"]) == OPERAND_COUNT
+
+
+@pytest.mark.parametrize("number_type", ["int", "float"])
+@pytest.mark.parametrize("codec", ["json", "orjson", "msgpack"])
+def test_serialize_operands(benchmark, codec, number_type):
+
+    benchmark.group = f"operands-serialize-{number_type}"
+
+    benchmark(ENCODERS[codec], make_request(number_type))
+
+
+@pytest.mark.parametrize("codec", ["json", "msgpack"])
+@patch("routes.calculation.calculation_rate_limiter.capacity", 10**9)
+@patch("routes.calculation.DBService")
+def test_new_calculation_10k_operands(
+    mock_db_service, benchmark, client, auth_header, codec
+):
+
+    benchmark.group = "operands-route"
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.insert_record.return_value = 1
+    mock_db.execute_query.return_value = [{"balance": "18.35"}]
+    mock_db.fetch_records.return_value = [{"id": 1, "type": "addition", "cost": "0.1"}]
+
+    mimetype = "application/json" if codec == "json" else "application/msgpack"
+    body = ENCODERS[codec](make_request("float"))
+
+    response = benchmark(
+        client.post,
+        "/api/v1/calculations/new",
+        data=body,
+        content_type=mimetype,
+        headers=auth_header | {"Accept": mimetype},
+    )
+    assert response.status_code == 200
@@ -0,0 +1,149 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+
+# The database is mocked throughout, so these measure the Flask request
+# handling, auth, validation and serialization done by the app itself.
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit():
+    with patch("routes.calculation.calculation_rate_limiter.capacity", 10**9):
+        yield
+
+
+def history_row(record_id):
+    return {
+        "id": record_id,
+        "operation_id": 3,
+        "operation_type": "multiplication",
+        "operation_cost": "0.25",
+        "user_id": 1,
+        "username": "test.user@example.com",
+        "user_status": "active",
+        "calculation": json.dumps(
+            {"operation": "multiplication", "operands": [2, 2, 3], "result": 12}
+        ),
+        "user_balance": "24.65",
+        "date": "2024-11-02 12:45:00",
+    }
+
+
+@patch("routes.calculation.DBService")
+def test_new_calculation(mock_db_service, benchmark, client, auth_header):
+
+    benchmark.group = "routes"
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.insert_record.return_value = 1
+    mock_db.execute_query.return_value = [{"balance": "18.35"}]
+    mock_db.fetch_records.return_value = [{"id": 1, "type": "addition", "cost": "0.1"}]
+
+    calculation_request = {"operation": "addition", "operands": [1, 3, 2]}
+
+    response = benchmark(
+        client.post,
+        "/api/v1/calculations/new",
+        json=calculation_request,
+        headers=auth_header,
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("page_size", [10, 100])
+@patch("routes.calculation.DBService")
+def test_calculation_history(mock_db_service, benchmark, client, auth_header, page_size):
+
+    benchmark.group = "routes"
+
+    rows = [history_row(i) for i in range(page_size, 0, -1)]
+
+    def execute_query(query, params=None, **kwargs):
+        return [{"total": 1000}] if "COUNT(*)" in query else rows
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.execute_query.side_effect = execute_query
+
+    response = benchmark(
+        client.get,
+        f"/api/v1/calculations?page_size={page_size}",
+        headers=auth_header,
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("page_size", [10, 100])
+@patch("routes.calculation.DBService")
+def test_calculation_history_fields(
+    mock_db_service, benchmark, client, auth_header, page_size
+):
+
+    benchmark.group = "routes"
+
+    rows = [
+        {"id": i, "date": "2024-11-02 12:45:00", "result": "12"}
+        for i in range(page_size, 0, -1)
+    ]
+
+    def execute_query(query, params=None, **kwargs):
+        return [{"total": 1000}] if "COUNT(*)" in query else rows
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.execute_query.side_effect = execute_query
+
+    response = benchmark(
+        client.get,
+        f"/api/v1/calculations?page_size={page_size}&fields=id,date,result",
+        headers=auth_header,
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("page_size", [10, 100])
+@patch("routes.calculation.HISTORY_QUERY_MODE", "json")
+@patch("routes.calculation.DBService")
+def test_calculation_history_json_mode(
+    mock_db_service, benchmark, client, auth_header, page_size
+):
+
+    benchmark.group = "routes"
+
+    # The database returns the finished page, so only its size matters here
+    page = json.dumps(
+        {
+            "results": [history_row(i) for i in range(page_size, 0, -1)],
+            "metadata": {"total": 1000, "page": 1, "page_size": page_size},
+        }
+    )
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.execute_query.return_value = [{"page": page}]
+
+    response = benchmark(
+        client.get,
+        f"/api/v1/calculations?page_size={page_size}",
+        headers=auth_header,
+    )
+    assert response.status_code == 200
+
+
+@patch("routes.operation.DBService")
+def test_operations(mock_db_service, benchmark, client, auth_header):
+
+    benchmark.group = "routes"
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.count_records.return_value = 6
+    mock_db.fetch_records.return_value = [
+        {"id": 1, "type": "addition", "cost": "0.1"},
+        {"id": 2, "type": "subtraction", "cost": "0.1"},
+        {"id": 3, "type": "multiplication", "cost": "0.25"},
+        {"id": 4, "type": "division", "cost": "0.25"},
+        {"id": 5, "type": "square_root", "cost": "0.5"},
+        {"id": 6, "type": "random_string", "cost": "1.0"},
+    ]
+
+    response = benchmark(client.get, "/api/v1/operations", headers=auth_header)
+    assert response.status_code == 200
@@ -4,9 +4,32 @@ import os
 #       TO SET WHEN RUNNING THIS APP LOCALLY
 
 # JWT CONFIG
-JWT_SECRET = os.environ["JWT_SECRET"]
+# Tokens are signed with JWT_SECRET (HS256) unless JWT_KEYSET_PATH points to a
+# JSON key set of asymmetric keys (EdDSA / RS256), in which case they are
+# signed with the current key and carry its `kid`. Tokens without a `kid` are
+# still verified with JWT_SECRET when it is set.
+JWT_SECRET = os.environ.get("JWT_SECRET")
 JWT_ALGORITHM = "HS256"
+JWT_KEYSET_PATH = os.environ.get("JWT_KEYSET_PATH")
+
+# How long (in days) tokens signed with a rotated-out key are still accepted
+JWT_KEY_VERIFY_GRACE_DAYS = 30
 JWT_EXPIRATION_HOURS = 1
+JWT_REFRESH_EXPIRATION_DAYS = 30
+
+# PASSWORD HASHING CONFIG
+# bcrypt work factor for new password hashes. Stored hashes created with a
+# different work factor are re-hashed the next time the user logs in.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+
+# Number of threads verifying password hashes, and how many more verifications
+# may wait for a thread before new logins are turned away
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", 32))
+
+# How many users' login details are cached, and for how long (in seconds)
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL_SECONDS = int(os.environ.get("USER_CACHE_TTL_SECONDS", 30))
 
 # DATABASE CONNECTION CONFIG
 DB_HOST = os.environ["DB_HOST"]
@@ -16,5 +39,94 @@ DB_PASSWORD = os.environ["DB_PASSWORD"]
 DB_DATABASE = "calculator_service"
 DB_PORT = 3306
 
+# Optional comma-separated list of read replica hosts. Read-only queries are
+# spread across the replicas; when none are set everything uses DB_HOST.
+DB_REPLICA_HOSTS = [
+    host.strip()
+    for host in os.environ.get("DB_REPLICA_HOSTS", "").split(",")
+    if host.strip()
+]
+
+# How long (in seconds) an unreachable replica is skipped before retrying it
+DB_REPLICA_RETRY_SECONDS = 30
+
+# Upper bound (in bytes) for a single bulk statement built by DBService.
+# Keep this below the server's `max_allowed_packet` setting.
+DB_MAX_PACKET_BYTES = int(os.environ.get("DB_MAX_PACKET_BYTES", 1024 * 1024))
+
+# Maximum number of built SQL statements cached per query shape.
+DB_SQL_CACHE_SIZE = 256
+
+# Statements taking at least this long (in milliseconds) are written to the
+# slow query log.
+DB_SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", 200))
+
+# RATE LIMITING
+# Each user (or admin API key) may make a burst of this many calculation
+# requests, refilled at the given rate per second
+CALCULATION_RATE_LIMIT_BURST = int(os.environ.get("CALCULATION_RATE_LIMIT_BURST", 20))
+CALCULATION_RATE_LIMIT_PER_SECOND = float(
+    os.environ.get("CALCULATION_RATE_LIMIT_PER_SECOND", 5)
+)
+
+# IDEMPOTENCY CONFIG
+# Responses to calculation requests sent with an `Idempotency-Key` header are
+# kept in the `idempotency_key` table for this many seconds so retries can be
+# replayed
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", 24 * 60 * 60))
+
+# How long (in seconds, rounded up to a whole second) a retry waits for the
+# first request with its key to finish before giving up with a 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", 10))
+
+# JSON CONFIG
+# JSON provider used for responses: "orjson" (fast) or "default" (Flask's own)
+JSON_PROVIDER = os.environ.get("JSON_PROVIDER", "orjson")
+
+# RESPONSE COMPRESSION CONFIG
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+
+# gzip level (1-9) and brotli quality (0-11); higher compresses better but
+# takes more CPU
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+
+# CALCULATION HISTORY CONFIG
+# "python" fetches flat rows and builds the history page in Python; "json"
+# has the database build the finished page as a single JSON document
+# (requires MySQL 8.0.14+)
+HISTORY_QUERY_MODE = os.environ.get("HISTORY_QUERY_MODE", "python")
+
+# RECORD ARCHIVE CONFIG
+# Set once `record` is partitioned and `scripts/rotate_record_partitions.py`
+# moves old partitions to `record_archive`. History and balance lookups then
+# also read the archive when they need records older than what it holds.
+RECORD_ARCHIVE_ENABLED = os.environ.get("RECORD_ARCHIVE_ENABLED", "").lower() == "true"
+
+# How long (in seconds) the archive boundary is cached. The rotation script
+# waits at least this long after moving records before dropping them from
+# `record`.
+RECORD_ARCHIVE_CACHE_TTL_SECONDS = int(
+    os.environ.get("RECORD_ARCHIVE_CACHE_TTL_SECONDS", 60)
+)
+
+# CALCULATION REQUEST CONFIG
+# Calculation request bodies larger than this many bytes are rejected with a
+# 413 before being read
+CALCULATION_MAX_BODY_BYTES = int(
+    os.environ.get("CALCULATION_MAX_BODY_BYTES", 16 * 1024 * 1024)
+)
+
+# JSON calculation bodies of at least this many bytes (or of unknown size) are
+# parsed as they're read instead of being loaded whole
+CALCULATION_STREAM_MIN_BYTES = int(
+    os.environ.get("CALCULATION_STREAM_MIN_BYTES", 1024 * 1024)
+)
+
+# REQUEST TIMING
+# Report per-phase request timings in a `Server-Timing` header and log line
+SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING_ENABLED", "").lower() == "true"
+
 # OTHER SETTINGS
 USER_STARTING_BALANCE = 25.0
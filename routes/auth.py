@@ -1,14 +1,32 @@
-from bcrypt import checkpw
+from datetime import datetime, UTC
+
+import pymysql
 from flask import Blueprint, request, jsonify
 
+from config import USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS
 from services.db_service import DBService
+from services.cache_service import TTLCache
+from services.metrics_service import register_cache
 from services.jwt_service import JWTService
+from services.password_service import PasswordService, PasswordQueueFullError
 
 
 # Create a Blueprint for authentication routes. This blueprint will be registered
 # later to make these routes available to the app.
 auth_bp = Blueprint("auth", __name__)
 jwt_service = JWTService()
+password_service = PasswordService()
+
+# Short-lived cache of the fields needed to log a user in, keyed by username.
+# Entries must be invalidated whenever a user's password or status changes.
+login_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+register_cache("login_user", login_user_cache.stats)
+
+
+def invalidate_cached_user(username):
+    """Drop a user's cached login details after their password or status changes."""
+
+    login_user_cache.invalidate(username)
 
 
 @auth_bp.route("/login", methods=["POST"])
@@ -17,6 +35,7 @@ def login():
     
     Expects a JSON payload with 'username' and 'password' fields.
     Returns a JSON response with a JWT token if authentication is successful.
+    Password hashes stored with an outdated bcrypt work factor are upgraded.
 
     Returns:
         Response: JSON response with a JWT token if authentication is successful.
@@ -33,25 +52,139 @@ def login():
     except KeyError as e:
         return jsonify({"error": f"Field {e} is required."}), 409
 
-    # Fetch the user from the database
-    with DBService() as db:
-        users = db.fetch_records(
-            "user",
-            conditions={"username": username},
-        )
+    # Fetch the user from the cache, falling back to the database
+    user = login_user_cache.get(username)
+    if user is None:
+        with DBService() as db:
+            users = db.fetch_records(
+                "user",
+                fields=["id", "status", "password"],
+                conditions={"username": username},
+                limit=1,
+            )
 
         # If the user doesn't exist, return a 404 Not Found response
         try:
             user = users[0]
-        except IndexError:
+        except (IndexError, TypeError):
             return jsonify({"error": f"User '{username}' not found"}), 404
 
+        login_user_cache.set(username, user)
+
+    # Reject inactive users before paying for a password check
+    if user["status"] != "active":
+        return jsonify({"error": f"User '{username}' is inactive"}), 403
+
     # Check if the password matches the hashed password in the database
-    valid_pw = checkpw(password.encode("utf-8"), user["password"].encode("utf-8"))
+    try:
+        valid_pw = password_service.verify(password, user["password"])
+    except PasswordQueueFullError:
+        return (
+            jsonify({"error": "Too many login attempts in progress, please retry."}),
+            503,
+            {"Retry-After": "1"},
+        )
+
     if not valid_pw:
         return jsonify({"error": "Invalid password"}), 401
 
+    # Upgrade the stored hash if it was created with a different work factor
+    if password_service.needs_rehash(user["password"]):
+        try:
+            new_hash = password_service.hash(password)
+        except PasswordQueueFullError:
+            new_hash = None  # not urgent, try again on the next login
+
+        if new_hash:
+            with DBService() as db:
+                db.update_record("user", {"password": new_hash}, user["id"])
+
+            invalidate_cached_user(username)
+
     # Generate a JWT token and return it in the response
     token = jwt_service.generate_token(user_id=int(user["id"]))
+    refresh_token = jwt_service.generate_refresh_token(user_id=int(user["id"]))
+
+    return (
+        jsonify({"logged_in": True, "token": token, "refresh_token": refresh_token}),
+        200,
+    )
+
+
+@auth_bp.route("/refresh", methods=["POST"])
+def refresh():
+    """Exchange a refresh token for a new token and refresh token.
+
+    Expects a JSON payload with a 'refresh_token' field. Refresh tokens are
+    single-use: the token presented is revoked and a new one is returned
+    alongside the new token.
+
+    Returns:
+        Response: JSON response with a new JWT token and refresh token.
+        Response: JSON response with an error message and a 401 Unauthorized
+                  status code if the refresh token is invalid, expired or used.
+        Response: JSON response with an error message and a 403 Forbidden
+                  status code if the user is no longer active.
+    """
+
+    data = request.get_json()
+
+    try:
+        refresh_token = data["refresh_token"]
+    except KeyError as e:
+        return jsonify({"error": f"Field {e} is required."}), 409
+
+    decoded = jwt_service.verify_refresh_token(refresh_token)
+    if "error" in decoded:
+        return jsonify(decoded), 401
+
+    user_id = int(decoded["user_id"])
+
+    with DBService() as db:
+        # Users who were deactivated since logging in can't stay logged in
+        users = db.fetch_records(
+            "user",
+            fields=["status"],
+            conditions={"id": user_id},
+            limit=1,
+        )
+
+        if not users or users[0]["status"] != "active":
+            return jsonify({"error": "User is inactive"}), 403
+
+        # Revoke the refresh token being used. The token ID is the primary key
+        # of the revocation list, so a token can only ever be redeemed once,
+        # even by concurrent requests.
+        try:
+            db.insert_record(
+                "revoked_token",
+                {
+                    "jti": bytes.fromhex(decoded["jti"]),
+                    "expires_at": datetime.fromtimestamp(decoded["exp"], UTC),
+                },
+            )
+        except pymysql.IntegrityError:
+            return jsonify({"error": "Refresh token has already been used"}), 401
+
+    token = jwt_service.generate_token(user_id=user_id)
+    refresh_token = jwt_service.generate_refresh_token(user_id=user_id)
+
+    return jsonify({"token": token, "refresh_token": refresh_token}), 200
+
+
+@auth_bp.route("/jwks", methods=["GET"])
+def get_jwks():
+    """Get the public keys used to verify tokens, as a JSON Web Key Set.
+
+    Other services can use these keys to verify tokens issued by this service
+    without sharing a secret. The set is empty when tokens are signed with a
+    shared secret.
+
+    Returns:
+        Response: JSON response with the currently valid public keys.
+    """
+
+    if not jwt_service.keyset:
+        return jsonify({"keys": []}), 200
 
-    return jsonify({"logged_in": True, "token": token}), 200
+    return jsonify(jwt_service.keyset.jwks()), 200
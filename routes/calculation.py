@@ -1,36 +1,77 @@
-import json
-
 import pymysql
-from flask import Blueprint, jsonify, request
-
-from config import USER_STARTING_BALANCE
+from flask import Blueprint, current_app, g, jsonify, request
+
+from config import (
+    USER_STARTING_BALANCE,
+    HISTORY_QUERY_MODE,
+    CALCULATION_MAX_BODY_BYTES,
+    CALCULATION_STREAM_MIN_BYTES,
+    CALCULATION_RATE_LIMIT_BURST,
+    CALCULATION_RATE_LIMIT_PER_SECOND,
+    IDEMPOTENCY_TTL_SECONDS,
+    IDEMPOTENCY_WAIT_SECONDS,
+)
 from services.db_service import DBService
-from services.jwt_service import JWTService, jwt_required, admin_protected
+from services.jwt_service import jwt_required, admin_protected
 from services.calculator_service import CalculatorService
+from services.rate_limit_service import RateLimiter, rate_limited
+from services.idempotency_service import IdempotencyStore, idempotent
+from services.timing_service import timed
+from services.json_provider import RawJSON
+from services.operand_stream_service import (
+    StreamedCalculationRequest,
+    limit_request_body,
+)
+from services.record_archive_service import (
+    ARCHIVE_TABLE,
+    archived_before,
+    fetch_last_archived_record,
+    needs_archive,
+)
+from services.msgpack_service import (
+    get_request_data,
+    msgpack_response,
+    negotiated_response,
+    wants_msgpack,
+)
 
 
 # Create a Blueprint for calculation routes. This blueprint will be registered
 # later to make these routes available to the app.
 calculation_bp = Blueprint("calculation", __name__)
 
+# Calculation routes are rate limited per user (or per admin API key)
+calculation_rate_limiter = RateLimiter(
+    capacity=CALCULATION_RATE_LIMIT_BURST,
+    refill_rate=CALCULATION_RATE_LIMIT_PER_SECOND,
+)
+
+# New calculations may be retried with an `Idempotency-Key` without charging
+# the user twice
+calculation_idempotency_store = IdempotencyStore(
+    ttl=IDEMPOTENCY_TTL_SECONDS,
+    wait_timeout=IDEMPOTENCY_WAIT_SECONDS,
+)
+
 
 @calculation_bp.route("", methods=["GET"])
 @calculation_bp.route("/", methods=["GET"])
 @jwt_required
+@rate_limited(calculation_rate_limiter)
 def get_calculation_history():
     """Retrieve the calculation history for the authenticated user.
     
     This endpoint requires a valid user JWT token in the Authorization header.
     Supports filtering by operation type, start date, and end date.
     Supports pagination with 'page' and 'page_size' query parameters.
+    Responds with MessagePack instead of JSON if the client prefers it.
 
     Returns:
         Response: JSON response with the calculation history for the authenticated user.
     """
 
-    # Extract the user ID from the provided JWT token
-    user_token = request.headers["Authorization"].split(" ")[1]
-    user_id = JWTService().verify_token(user_token)["user_id"]
+    # Extract the user ID from the JWT token decoded by `jwt_required`
+    user_id = g.jwt_payload["user_id"]
 
     # Extract query parameters for filtering and pagination
     limit = int(request.args.get("page_size", 10))
@@ -40,12 +81,18 @@ def get_calculation_history():
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
 
+    # Only the requested fields are fetched and returned
+    try:
+        fields = _parse_history_fields(request.args.get("fields"))
+    except ValueError as e:
+        return negotiated_response({"error": str(e)}, 400)
+
     # Prepare the SQL query to retrieve the calculation history
-    where_clause = "WHERE u.id = %s AND r.deleted = 0"
+    where_clause = "WHERE r.user_id = %s AND r.deleted = 0"
     filters = [user_id]
 
     if operation_type:
-        where_clause += " AND o.`type` = %s"
+        where_clause += " AND r.operation_type = %s"
         filters.append(operation_type)
 
     if start_date:
@@ -56,27 +103,214 @@ def get_calculation_history():
         where_clause += " AND r.`date` <= %s"
         filters.append(end_date)
 
-    # Return dates from the database in this format:
-    date_format = "%Y-%m-%d %H:%i:%s"
+    # Fetch the requested page of the calculation history from the database,
+    # including archived records only if the requested dates may reach them
+    try:
+        with DBService() as db:
+            archive_boundary = archived_before(db)
+            if not needs_archive(archive_boundary, start_date):
+                archive_boundary = None
+
+            if HISTORY_QUERY_MODE == "json":
+                page_json = _fetch_history_page_json(
+                    db, where_clause, filters, limit, offset, fields, archive_boundary
+                )
+            else:
+                response = _fetch_history_page(
+                    db, where_clause, filters, limit, offset, fields, archive_boundary
+                )
+    except pymysql.MySQLError as e:
+        return negotiated_response({"error": f"{e.args[1]}"}, 400)
+
+    # The database returned the finished page, so it's sent out as is
+    if HISTORY_QUERY_MODE == "json":
+        if wants_msgpack():
+            return msgpack_response(RawJSON(page_json))
+
+        return current_app.response_class(page_json + "\n", mimetype="application/json")
+
+    return negotiated_response(response)
+
+
+# Return dates from the database in this format:
+HISTORY_DATE_FORMAT = "%Y-%m-%d %H:%i:%s"
+
+# The fields a history item can be projected to, in the order they're
+# returned. Each has the columns selected for it (by alias), the expression
+# building it in "json" mode, and the table (if any) that must be joined.
+# `result` is the calculation's result alone, without its operands. The
+# operation's type and cost are those it had when the calculation was made.
+HISTORY_FIELDS = {
+    "id": {
+        "columns": {"id": "r.id"},
+        "json": "'id', h.id",
+    },
+    "user_balance": {
+        "columns": {"user_balance": "r.user_balance"},
+        "json": "'user_balance', CAST(h.user_balance AS CHAR)",
+    },
+    "date": {
+        "columns": {"date": "DATE_FORMAT(r.`date`, %s)"},
+        "json": "'date', h.`date`",
+    },
+    "operation": {
+        "columns": {
+            "operation_id": "r.operation_id",
+            "operation_type": "r.operation_type",
+            "operation_cost": "r.charged_cost",
+        },
+        "json": """'operation', JSON_OBJECT(
+                                'id', h.operation_id,
+                                'type', h.operation_type,
+                                'cost', CAST(h.operation_cost AS CHAR)
+                            )""",
+    },
+    "user": {
+        "columns": {
+            "user_id": "u.id",
+            "username": "u.username",
+            "user_status": "u.status",
+        },
+        "json": """'user', JSON_OBJECT(
+                                'id', h.user_id,
+                                'username', h.username,
+                                'status', h.user_status
+                            )""",
+        "join": "LEFT JOIN user u ON u.id = r.user_id",
+    },
+    "calculation": {
+        "columns": {"calculation": "r.operation_response"},
+        "json": "'calculation', h.calculation",
+    },
+    "result": {
+        "columns": {"result": "JSON_EXTRACT(r.operation_response, '$.result')"},
+        "json": "'result', h.result",
+    },
+}
+
+# Fields returned when the request doesn't ask for specific ones
+DEFAULT_HISTORY_FIELDS = (
+    "id",
+    "user_balance",
+    "date",
+    "operation",
+    "user",
+    "calculation",
+)
+
+
+def _parse_history_fields(fields_param):
+    """Return the history fields requested by a comma-separated `fields` parameter.
+
+    Fields are returned in `HISTORY_FIELDS` order, whatever order they were
+    requested in. Raises a ValueError for unknown fields, or if a `fields`
+    parameter is given but names none.
+    """
+
+    if not fields_param:
+        return DEFAULT_HISTORY_FIELDS
+
+    requested = {field.strip() for field in fields_param.split(",") if field.strip()}
+    if not requested:
+        raise ValueError(
+            f"No fields given. Available fields: {', '.join(HISTORY_FIELDS)}"
+        )
+
+    unknown = requested - HISTORY_FIELDS.keys()
+    if unknown:
+        raise ValueError(
+            f"Unknown field(s): {', '.join(sorted(unknown))}. "
+            f"Available fields: {', '.join(HISTORY_FIELDS)}"
+        )
+
+    return tuple(field for field in HISTORY_FIELDS if field in requested)
+
+
+def _history_columns(fields):
+    """Return the select list and joins needed for the given history fields."""
+
+    columns = {}
+    joins = []
+    for field in fields:
+        columns.update(HISTORY_FIELDS[field]["columns"])
+        if "join" in HISTORY_FIELDS[field]:
+            joins.append(HISTORY_FIELDS[field]["join"])
+
+    return columns, joins
+
+
+def _format_select(columns, indent=8):
+    """Return the select list for columns given as {alias: expression}."""
+
+    return f",\n{' ' * indent}".join(
+        f"{expression:<25} AS '{alias}'" for alias, expression in columns.items()
+    )
+
+
+def _history_source(where_clause, filters, archive_boundary, row_limit=None):
+    """Return the records to read history from, with the WHERE clause and params.
+
+    Without an archive boundary, that's `record` alone. Otherwise it's the
+    union of `record` and the archive, split at the boundary so records
+    being archived are never read twice. `row_limit` caps the rows read
+    from each (newest first), for when only the first rows are needed.
+    """
+
+    if archive_boundary is None:
+        return "record", where_clause, list(filters)
+
+    limit_sql = ""
+    limit_params = []
+    if row_limit is not None:
+        limit_sql = " ORDER BY r.`date` DESC, r.id DESC LIMIT %s"
+        limit_params = [row_limit]
+
+    source = f"""(
+        (SELECT * FROM record r {where_clause} AND r.`date` >= %s{limit_sql})
+        UNION ALL
+        (SELECT * FROM {ARCHIVE_TABLE} r {where_clause} AND r.`date` < %s{limit_sql})
+    )"""
+
+    params = (
+        filters + [archive_boundary] + limit_params
+        + filters + [archive_boundary] + limit_params
+    )
+
+    return source, "", params
+
+
+def _fetch_history_page(
+    db,
+    where_clause,
+    filters,
+    limit,
+    offset,
+    fields=DEFAULT_HISTORY_FIELDS,
+    archive_boundary=None,
+):
+    """Fetch a page of calculation history as flat rows and format it in Python.
+
+    Only the columns and joins needed for the requested `fields` are queried.
+    Archived records are included if an `archive_boundary` is given.
+    """
+
+    columns, joins = _history_columns(fields)
+
+    page_source, page_where, page_params = _history_source(
+        where_clause, filters, archive_boundary, limit + offset
+    )
+    count_source, count_where, count_params = _history_source(
+        where_clause, filters, archive_boundary
+    )
 
     # Query for fetching the user's calculation history
     get_history_sql = f"""
     SELECT
-        r.id                      AS 'id',
-        o.id                      AS 'operation_id',
-        o.`type`                  AS 'operation_type',
-        o.cost                    AS 'operation_cost',
-        u.id                      AS 'user_id',
-        u.username                AS 'username',
-        u.status                  AS 'user_status',
-        r.user_balance            AS 'user_balance',
-        r.operation_response      AS 'calculation',
-        DATE_FORMAT(r.`date`, %s) AS 'date'
-    FROM record r
-    LEFT JOIN operation o ON o.id = r.operation_id
-    LEFT JOIN user u ON u.id = r.user_id
-    {where_clause}
-    ORDER BY r.`date` DESC
+        {_format_select(columns)}
+    FROM {page_source} r
+    {" ".join(joins)}
+    {page_where}
+    ORDER BY r.`date` DESC, r.id DESC
     LIMIT %s
     OFFSET %s;
     """
@@ -85,62 +319,57 @@ def get_calculation_history():
     get_history_count_sql = f"""
     SELECT
         COUNT(*) AS total
-    FROM record r
-    LEFT JOIN operation o ON o.id = r.operation_id
-    LEFT JOIN user u ON u.id = r.user_id
-    {where_clause}
+    FROM {count_source} r
+    {count_where}
     LIMIT 1;
     """
 
-    # Fetch the calculation history and total count from the database
-    try:
-        with DBService() as db:
-            total_count_results = db.execute_query(
-                get_history_count_sql,
-                tuple(filters),
-            )
-            total_count = total_count_results[0]["total"]
+    total_count_results = db.execute_query(
+        get_history_count_sql,
+        tuple(count_params),
+        read_only=True,
+    )
+    total_count = total_count_results[0]["total"]
 
-            results = db.execute_query(
-                get_history_sql,
-                tuple([date_format] + filters + [limit, offset]),
-            )
-    except pymysql.MySQLError as e:
-        return jsonify({"error": f"{e.args[1]}"}), 400
+    # The date format is only bound if the date is selected
+    date_params = [HISTORY_DATE_FORMAT] if "date" in fields else []
+
+    results = db.execute_query(
+        get_history_sql,
+        tuple(date_params + page_params + [limit, offset]),
+        read_only=True,
+    )
 
     # Format the results for the response
     user_history = []
     for result in results:
-        history_item = dict(result)  # making a copy, not modifying in-place
-
-        # Apply additional formatting for certain fields
-        del history_item["operation_id"]
-        del history_item["operation_type"]
-        del history_item["operation_cost"]
-        del history_item["user_id"]
-        del history_item["username"]
-        del history_item["user_status"]
-        del history_item["calculation"]
-
-        history_item["operation"] = {
-            "id": result["operation_id"],
-            "type": result["operation_type"],
-            "cost": result["operation_cost"],
-        }
-
-        history_item["user"] = {
-            "id": result["user_id"],
-            "username": result["username"],
-            "status": result["user_status"],
-        }
-
-        history_item["calculation"] = json.loads(result["calculation"])
+        history_item = {}
+
+        for field in fields:
+            if field == "operation":
+                history_item["operation"] = {
+                    "id": result["operation_id"],
+                    "type": result["operation_type"],
+                    "cost": result["operation_cost"],
+                }
+            elif field == "user":
+                history_item["user"] = {
+                    "id": result["user_id"],
+                    "username": result["username"],
+                    "status": result["user_status"],
+                }
+            elif field in ("calculation", "result"):
+                # These are already JSON, so they're embedded as is
+                history_item[field] = (
+                    RawJSON(result[field]) if result[field] is not None else None
+                )
+            else:
+                history_item[field] = result[field]
 
         user_history.append(history_item)
 
     # Construct the response with the calculation history and metadata
-
-    response = {
+    return {
         "results": user_history,
         "metadata": {
             "total": total_count,
@@ -149,16 +378,113 @@ def get_calculation_history():
         },
     }
 
-    return jsonify(response), 200
+
+def _fetch_history_page_json(
+    db,
+    where_clause,
+    filters,
+    limit,
+    offset,
+    fields=DEFAULT_HISTORY_FIELDS,
+    archive_boundary=None,
+):
+    """Fetch a page of calculation history as a single JSON document.
+
+    The database builds the same document as `_fetch_history_page`, with
+    decimals cast to strings as Flask would serialize them. The window form
+    of JSON_ARRAYAGG is used as it is the only way to guarantee the order of
+    the aggregated rows (requires MySQL 8.0.14+).
+    """
+
+    columns, joins = _history_columns(fields)
+
+    # The rows are always ordered by date and ID, whether or not they're returned
+    columns = {"id": "r.id", **columns, "sort_date": "r.`date`"}
+
+    page_source, page_where, page_params = _history_source(
+        where_clause, filters, archive_boundary, limit + offset
+    )
+    count_source, count_where, count_params = _history_source(
+        where_clause, filters, archive_boundary
+    )
+
+    history_item_json = ",\n                            ".join(
+        HISTORY_FIELDS[field]["json"] for field in fields
+    )
+
+    get_history_page_sql = f"""
+    SELECT JSON_OBJECT(
+        'results', IFNULL(
+            (
+                SELECT
+                    JSON_ARRAYAGG(
+                        JSON_OBJECT(
+                            {history_item_json}
+                        )
+                    ) OVER (
+                        ORDER BY h.sort_date DESC, h.id DESC
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                    )
+                FROM (
+                    SELECT
+                        {_format_select(columns, indent=24)}
+                    FROM {page_source} r
+                    {" ".join(joins)}
+                    {page_where}
+                    ORDER BY r.`date` DESC, r.id DESC
+                    LIMIT %s
+                    OFFSET %s
+                ) h
+                LIMIT 1
+            ),
+            JSON_ARRAY()
+        ),
+        'metadata', JSON_OBJECT(
+            'total', (
+                SELECT COUNT(*)
+                FROM {count_source} r
+                {count_where}
+            ),
+            'page', %s,
+            'page_size', %s
+        )
+    ) AS page;
+    """
+
+    params = (
+        ([HISTORY_DATE_FORMAT] if "date" in fields else [])
+        + page_params
+        + [limit, offset]
+        + count_params
+        + [offset // limit + 1, limit]
+    )
+
+    result = db.execute_query(get_history_page_sql, tuple(params), read_only=True)
+
+    return result[0]["page"]
 
 
 @calculation_bp.route("/new", methods=["POST"])
 @jwt_required
+# Bodies the route parses as they're read can't be read up front, so retries
+# with these are matched by key alone
+@idempotent(calculation_idempotency_store, CALCULATION_STREAM_MIN_BYTES - 1)
+@rate_limited(calculation_rate_limiter)
 def run_calculation():
     """Run a calculation operation for the authenticated user.
     
     Expects a JSON payload with 'operation' and 'operands' fields.
     Returns a JSON response with the calculation result and updated user balance.
+    Both the payload and the response may be MessagePack instead of JSON.
+
+    Requests sent with an 'Idempotency-Key' header are only handled once;
+    retries with the same key get the first response again, without being
+    charged twice.
+
+    Large JSON payloads are parsed as they're read, so their operands are
+    never held in memory together. The response (and stored record) always
+    contains an 'operand_count'; for these payloads 'operands' is null
+    instead of echoing the operands back.
 
     Returns:
         Response: JSON response with the calculation result and updated user balance.
@@ -166,18 +492,30 @@ def run_calculation():
                   if the operation is not known or the user has insufficient funds
     """
 
-    data = request.get_json()
+    # Reject oversized bodies, before reading them where their size is known
+    limit_request_body(CALCULATION_MAX_BODY_BYTES)
+
+    streamed_body = None
 
-    # Extract the operation type and operands from the request data
+    # Extract the operation type and operands from the request data. Large
+    # bodies are only read up to the operation here; their operands are
+    # parsed while the calculation runs
     try:
-        op_type = data["operation"]
-        operands = data["operands"]
+        if _should_stream_body():
+            streamed_body = StreamedCalculationRequest(
+                request.stream, CALCULATION_MAX_BODY_BYTES
+            )
+            op_type = streamed_body.read_operation()
+            operands = streamed_body.operands()
+        else:
+            data = get_request_data()
+            op_type = data["operation"]
+            operands = data["operands"]
     except KeyError as e:
-        return jsonify({"error": f"Field {e} is required"}), 400
+        return negotiated_response({"error": f"Field {e} is required"}, 400)
 
-    # Extract the user ID from the provided JWT token
-    user_token = request.headers["Authorization"].split(" ")[1]
-    user_id = JWTService().verify_token(user_token)["user_id"]
+    # Extract the user ID from the JWT token decoded by `jwt_required`
+    user_id = g.jwt_payload["user_id"]
 
     # Query to fetch the user's balance from the database
     user_balance_sql = f"""
@@ -191,58 +529,109 @@ def run_calculation():
 
     with DBService() as db:
 
-        # Fetch the user's balance from the database
+        # Fetch the user's balance from the database (always from the primary,
+        # as a stale balance could let a user overdraw)
         try:
             user_balance = db.execute_query(user_balance_sql)[0]["balance"]
         except pymysql.MySQLError as e:
-            return jsonify({"error": f"{e.args[1]}"})
+            return negotiated_response({"error": f"{e.args[1]}"})
         except IndexError:
-            user_balance = USER_STARTING_BALANCE
+            # The user's records may all have been archived
+            last_record = fetch_last_archived_record(db, user_id)
+            if last_record:
+                user_balance = last_record["user_balance"]
+            else:
+                user_balance = USER_STARTING_BALANCE
 
         # Fetch the operation details from the database
         try:
             op_info = db.fetch_records("operation", conditions={"type": op_type})[0]
         except IndexError:
-            return jsonify({"error": f"Operation '{op_type}' not known"}), 400
+            return negotiated_response(
+                {"error": f"Operation '{op_type}' not known"}, 400
+            )
 
         # Calculate the new user balance after the operation
         new_user_balance = round(float(user_balance) - float(op_info["cost"]), 2)
         # Check if the user has sufficient funds for the operation
         if new_user_balance <= 0:
-            return jsonify({"error": "Insufficient funds"}), 402
+            return negotiated_response({"error": "Insufficient funds"}, 402)
 
         # Perform the calculation operation
         try:
-            result = CalculatorService().calculate(op_info["id"], operands)
+            with timed("calc"):
+                if streamed_body is not None:
+                    result = CalculatorService().calculate_stream(
+                        op_info["id"], operands
+                    )
+                    streamed_body.finish()
+                else:
+                    result = CalculatorService().calculate(op_info["id"], operands)
         except ValueError as e:
-            return jsonify({"error": str(e)}), 400
+            return negotiated_response({"error": str(e)}, 400)
         except NotImplementedError as e:
-            return jsonify({"error": str(e)}), 500
+            return negotiated_response({"error": str(e)}, 500)
+
+        # Construct the response data with the operation details and result,
+        # serialized once for both storage and JSON responses
+        if streamed_body is not None:
+            operand_count, operands = streamed_body.operand_count, None
+        else:
+            operand_count = len(operands)
 
-        # Construct the response data with the operation details and result
-        response_data = {
+        calculation = {
             "operation": op_type,
             "operands": operands,
+            "operand_count": operand_count,
             "result": result,
         }
+        response_data = current_app.json.dumps(calculation)
+
+        if wants_msgpack():
+            response = msgpack_response(calculation)
+        else:
+            response = jsonify(RawJSON(response_data))
+
+        # Store the calculation record in the database, along with the
+        # response for the request's Idempotency-Key (if any), so a retry is
+        # either charged or replayed, never both
+        with db.transaction():
+            calculation_idempotency_store.claim(db, response)
+            db.insert_record(
+                "record",
+                {
+                    "operation_id": op_info["id"],
+                    "operation_type": op_info["type"],
+                    "user_id": user_id,
+                    "amount": 1,
+                    "charged_cost": op_info["cost"],
+                    "user_balance": new_user_balance,
+                    "operation_response": response_data,
+                },
+            )
 
-        # Store the calculation record in the database
-        db.insert_record(
-            "record",
-            {
-                "operation_id": op_info["id"],
-                "user_id": user_id,
-                "amount": 1,
-                "user_balance": new_user_balance,
-                "operation_response": json.dumps(response_data),
-            },
-        )
+    return response
 
-    return jsonify(response_data), 200
+
+def _should_stream_body():
+    """Return True if the request body should be parsed as it's read.
+
+    Only JSON bodies are streamed: those of at least
+    `CALCULATION_STREAM_MIN_BYTES`, and those of unknown size.
+    """
+
+    if request.mimetype != "application/json":
+        return False
+
+    return (
+        request.content_length is None
+        or request.content_length >= CALCULATION_STREAM_MIN_BYTES
+    )
 
 
 @calculation_bp.route("/<int:record_id>", methods=["DELETE"])
 @admin_protected
+@rate_limited(calculation_rate_limiter)
 def delete_record(record_id):
     """Delete a calculation record by ID.
     
@@ -263,14 +652,8 @@ def delete_record(record_id):
         # Fetch the calculation record to delete
         to_delete = db.fetch_records(
             "record",
-            join=[
-                {
-                    "table": "operation",
-                    "left": "operation.id",
-                    "right": "record.operation_id",
-                }
-            ],
-            conditions={"record.id": record_id, "record.deleted": 0},
+            conditions={"id": record_id, "deleted": 0},
+            primary=True,
         )
 
         # If the record was not found, return a 404 Not Found response
@@ -284,22 +667,24 @@ def delete_record(record_id):
 
         # Calculate the new user balance after deleting the record
         try:
-            new_user_balance = to_delete[0]["user_balance"] + to_delete[0]["cost"]
+            new_user_balance = (
+                to_delete[0]["user_balance"] + to_delete[0]["charged_cost"]
+            )
             db.update_record(
                 "record",
                 {"deleted": 1},
                 record_id,
             )
 
-            # We need to update the user balance on all subsequent records
+            # We need to update the user balance on all subsequent records,
+            # refunding exactly what was charged for the deleted one
             remaining_tx_sql = f"""
             SELECT
-                r.id   AS id,
-                o.cost AS cost
+                r.id           AS id,
+                r.charged_cost AS cost
             FROM record r
-            JOIN user u ON u.id = r.user_id
-            JOIN operation o ON o.id = r.operation_id
-            WHERE r.id > {record_id} AND u.id = {to_delete[0]['user_id']}  AND r.deleted = 0
+            WHERE r.id > {record_id} AND r.user_id = {to_delete[0]['user_id']} AND r.deleted = 0
+            ORDER BY r.id
             """
 
             to_update = db.execute_query(remaining_tx_sql)
@@ -307,14 +692,12 @@ def delete_record(record_id):
 
             # Update the user balance on all subsequent records
             if to_update:
+                rebalanced = []
                 for tx in to_update:
-                    db.update_record(
-                        "record",
-                        {"user_balance": prev_balance - tx["cost"]},
-                        tx["id"],
-                    )
-
                     prev_balance -= tx["cost"]
+                    rebalanced.append({"id": tx["id"], "user_balance": prev_balance})
+
+                db.update_many("record", rebalanced)
 
         except pymysql.MySQLError as e:
             return jsonify({"error": e.args[1]}), 400
@@ -0,0 +1,23 @@
+from flask import Blueprint
+
+from services.jwt_service import admin_protected
+from services.metrics_service import render_prometheus
+
+
+# Create a Blueprint for the metrics route. This blueprint will be registered
+# later to make this route available to the app.
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("", methods=["GET"])
+@admin_protected
+def get_metrics():
+    """Expose the service's metrics for Prometheus to scrape.
+
+    Requires an admin API key, which the scraper sends as a bearer token.
+
+    Returns:
+        Response: the metrics in the Prometheus text exposition format.
+    """
+
+    return render_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4"}
@@ -1,5 +1,6 @@
 from routes.auth import auth_bp
 from routes.user import user_bp
+from routes.metrics import metrics_bp
 from routes.operation import operation_bp
 from routes.calculation import calculation_bp
 
@@ -33,3 +34,9 @@ class Router:
             calculation_bp,
             url_prefix="/api/v1/calculations",
         )
+
+        # monitoring routes
+        self.flask_app.register_blueprint(
+            metrics_bp,
+            url_prefix="/metrics",
+        )
@@ -1,8 +1,9 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, g, jsonify
 
 from config import USER_STARTING_BALANCE
 from services.db_service import DBService
-from services.jwt_service import JWTService, jwt_required, admin_protected
+from services.jwt_service import jwt_required, admin_protected
+from services.record_archive_service import fetch_last_archived_record
 
 
 # Create a Blueprint for user-related routes. This blueprint will be registered
@@ -22,10 +23,8 @@ def get_user_balance_using_jwt():
         Response: JSON response with the user's balance.
     """
 
-    # Extract the user ID from the JWT token
-    token = request.headers["Authorization"].split(" ")[1]
-    decoded = JWTService().verify_token(token)
-    user_id = int(decoded["user_id"])
+    # Extract the user ID from the JWT token decoded by `jwt_required`
+    user_id = int(g.jwt_payload["user_id"])
 
     with DBService() as db:
         # Fetch the last calculation record for the user
@@ -34,13 +33,20 @@ def get_user_balance_using_jwt():
             conditions={"user_id": user_id, "deleted": 0},
             limit=1,
             order_by="`date` DESC",
+            primary=True,
         )
 
+        # The user's records may all have been archived
+        if last_calculation:
+            last_calculation = last_calculation[0]
+        else:
+            last_calculation = fetch_last_archived_record(db, user_id)
+
         # If no calculation record is found, return the starting balance
         if not last_calculation:
             return jsonify({"balance": USER_STARTING_BALANCE}), 200
 
-    return jsonify({"balance": last_calculation[0]["user_balance"]}), 200
+    return jsonify({"balance": last_calculation["user_balance"]}), 200
 
 
 @user_bp.route("/<int:user_id>/balance")
@@ -65,8 +71,15 @@ def get_user_balance(user_id):
             conditions={"user_id": user_id, "deleted": 0},
             limit=1,
             order_by="`date` DESC",
+            primary=True,
         )
 
+        # The user's records may all have been archived
+        if last_calculation:
+            last_calculation = last_calculation[0]
+        else:
+            last_calculation = fetch_last_archived_record(db, user_id)
+
         # If no calculation record is found, return the starting balance
         if not last_calculation:
             user = db.fetch_records(
@@ -80,4 +93,4 @@ def get_user_balance(user_id):
 
             return jsonify({"balance": USER_STARTING_BALANCE}), 200
 
-    return jsonify({"balance": last_calculation[0]["user_balance"]}), 200
+    return jsonify({"balance": last_calculation["user_balance"]}), 200
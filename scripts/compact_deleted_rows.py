@@ -0,0 +1,227 @@
+"""Move soft-deleted records and operations out of the hot tables.
+
+Deleting a calculation record or an operation only marks it `deleted = 1`,
+so deleted rows stay in `record` and `operation` for good. Run this
+regularly (e.g. nightly) once sql/migrations/004_add_tombstone_tables.sql
+has been applied:
+
+    $ python scripts/compact_deleted_rows.py --retention-days 30
+
+Rows deleted more than `--retention-days` days ago (going by `updated_at`,
+which is set when a row is deleted) are moved to `record_tombstone` and
+`operation_tombstone`. Each chunk of `--batch-size` rows is moved in its own
+short transaction, so locks are never held for long. Pause between chunks
+with `--pause-seconds` to leave headroom for the app.
+
+Used refresh tokens whose expiry has passed are also deleted from
+`revoked_token`, since an expired token is rejected without checking it, and
+expired idempotency keys from `idempotency_key`.
+
+A moved row is gone from its hot table, so an interrupted run is resumed by
+running the script again. Pass `--dry-run` to only count the rows that
+would be moved.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import pymysql
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_DATABASE
+
+
+# Tables that are compacted, and the tombstone table each is moved to
+TOMBSTONE_TABLES = {
+    "record": "record_tombstone",
+    "operation": "operation_tombstone",
+}
+
+# Tables whose rows are deleted once their `expires_at` has passed
+EXPIRING_TABLES = ("revoked_token", "idempotency_key")
+
+
+class Compactor:
+    """Moves soft-deleted rows to tombstone tables in small transactions."""
+
+    def __init__(self, connection, retention_days, batch_size, pause_seconds):
+
+        self.connection = connection
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+
+    def count(self, table):
+        """Return how many rows of `table` are ready to be moved."""
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) AS total FROM {table} "
+                "WHERE deleted = 1 AND updated_at < NOW() - INTERVAL %s DAY",
+                (self.retention_days,),
+            )
+            total = cursor.fetchone()["total"]
+
+        self.connection.commit()
+
+        return total
+
+    def move_batch(self, table):
+        """Move the next batch of deleted rows to the tombstone table; return how many."""
+
+        tombstone = TOMBSTONE_TABLES[table]
+
+        try:
+            with self.connection.cursor() as cursor:
+                # Lock the batch so it can't change while it's being moved
+                cursor.execute(
+                    f"SELECT id FROM {table} "
+                    "WHERE deleted = 1 AND updated_at < NOW() - INTERVAL %s DAY "
+                    "ORDER BY updated_at LIMIT %s FOR UPDATE",
+                    (self.retention_days, self.batch_size),
+                )
+                ids = [row["id"] for row in cursor.fetchall()]
+
+                if ids:
+                    placeholders = ", ".join(["%s"] * len(ids))
+                    cursor.execute(
+                        f"INSERT INTO {tombstone} "
+                        f"SELECT * FROM {table} WHERE id IN ({placeholders})",
+                        ids,
+                    )
+                    cursor.execute(
+                        f"DELETE FROM {table} WHERE id IN ({placeholders})",
+                        ids,
+                    )
+
+            self.connection.commit()
+        except pymysql.MySQLError:
+            self.connection.rollback()
+            raise
+
+        return len(ids)
+
+    def compact(self, table):
+        """Move every deleted row of `table` past the retention window; return how many."""
+
+        total = self.count(table)
+        moved = 0
+        started = time.perf_counter()
+
+        while True:
+            batch = self.move_batch(table)
+            if not batch:
+                break
+
+            moved += batch
+            report_progress(table, moved, total, started)
+
+            time.sleep(self.pause_seconds)
+
+        report_progress(table, moved, total, started)
+        print()
+
+        return moved
+
+    def count_expired(self, table):
+        """Return how many rows of `table` have expired."""
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) AS total FROM {table} WHERE expires_at < NOW()"
+            )
+            total = cursor.fetchone()["total"]
+
+        self.connection.commit()
+
+        return total
+
+    def purge_expired(self, table):
+        """Delete the rows of `table` that have expired; return how many."""
+
+        purged = 0
+        while True:
+            with self.connection.cursor() as cursor:
+                deleted = cursor.execute(
+                    f"DELETE FROM {table} WHERE expires_at < NOW() LIMIT %s",
+                    (self.batch_size,),
+                )
+
+            self.connection.commit()
+
+            purged += deleted
+            if deleted < self.batch_size:
+                return purged
+
+            time.sleep(self.pause_seconds)
+
+
+def report_progress(table, moved, total, started):
+
+    elapsed = time.perf_counter() - started
+    rate = moved / elapsed if elapsed else 0
+
+    # Rows deleted while the job runs can push the count past the total
+    percent = min(moved / total, 1) if total else 1
+
+    print(
+        f"\r  {table}: {moved}/{total} rows ({percent:.0%}), {rate:,.0f} rows/s",
+        end="",
+        flush=True,
+    )
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--retention-days", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--pause-seconds", type=float, default=0.1)
+    parser.add_argument(
+        "--tables",
+        default=",".join(TOMBSTONE_TABLES),
+        help="Comma-separated tables to compact",
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    tables = [table.strip() for table in args.tables.split(",") if table.strip()]
+    unknown = set(tables) - TOMBSTONE_TABLES.keys()
+    if unknown:
+        sys.exit(f"Unknown tables: {', '.join(sorted(unknown))}")
+
+    connection = pymysql.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_DATABASE,
+        cursorclass=pymysql.cursors.DictCursor,
+    )
+
+    compactor = Compactor(
+        connection, args.retention_days, args.batch_size, args.pause_seconds
+    )
+
+    for table in tables:
+        if args.dry_run:
+            print(f"{table}: {compactor.count(table)} rows would be moved")
+        else:
+            moved = compactor.compact(table)
+            print(f"Moved {moved} deleted rows from {table} to {TOMBSTONE_TABLES[table]}")
+
+    for table in EXPIRING_TABLES:
+        if args.dry_run:
+            print(f"{table}: {compactor.count_expired(table)} rows would be deleted")
+        else:
+            purged = compactor.purge_expired(table)
+            print(f"Deleted {purged} expired rows from {table}")
+
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
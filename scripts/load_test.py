@@ -0,0 +1,521 @@
+"""Provision a local database with realistic data and drive load against the app.
+
+The script has three steps, run in order:
+
+    # 1. Create the schema, operations, load test users and an admin key
+    $ python scripts/load_test.py setup --users 10000
+
+    # 2. Bulk-generate calculation records, skewed towards a few heavy users
+    $ python scripts/load_test.py generate --users 10000 --records 2000000
+
+    # 3. Drive concurrent mixed traffic against a running instance of the app
+    $ python scripts/load_test.py run --users 10000 --records 2000000 \\
+          --admin-key <key printed by setup> --concurrency 32 --duration 60
+
+`setup` and `generate` connect to the database configured with DB_HOST,
+DB_USER and DB_PASSWORD, and `setup` DROPS AND RECREATES every table, so only
+point them at a throwaway database. Any MySQL-compatible server works; a
+local MariaDB container is the easiest stand-in:
+
+    $ docker run -d -p 3306:3306 -e MARIADB_ROOT_PASSWORD=loadtest mariadb:11
+    $ export DB_HOST=127.0.0.1 DB_USER=root DB_PASSWORD=loadtest
+
+The app under test should use the same database and JWT_SECRET, and should
+be started with a high CALCULATION_RATE_LIMIT_BURST unless rate limiting is
+part of what is being measured (limited requests are reported as 429s).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import string
+import argparse
+import threading
+from datetime import datetime, timedelta
+from collections import defaultdict
+
+import pymysql
+import requests
+from bcrypt import gensalt, hashpw
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_DATABASE, BCRYPT_ROUNDS
+from services.db_service import DBService
+from services.jwt_service import JWTService, hash_api_key
+from services.calculator_service import CalculatorService
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "sql", "schema.sql")
+
+# The same operations as sql/seed.sql, with how often each is used
+OPERATIONS = [
+    # (type, cost, share of calculations)
+    ("addition", 0.1, 0.35),
+    ("subtraction", 0.1, 0.2),
+    ("multiplication", 0.25, 0.2),
+    ("division", 0.25, 0.12),
+    ("square_root", 0.75, 0.08),
+    ("random_string", 1.0, 0.05),
+]
+
+# record.id is a MEDIUMINT
+MAX_RECORDS = 2**23 - 1
+
+DEFAULT_PASSWORD = "load-test-password"
+DEFAULT_MIX = "login=5,calculate=40,history=50,delete=5"
+
+
+def username(user_index):
+    return f"loadtest.user.{user_index}@example.com"
+
+
+def user_weights(users, skew):
+    """Zipf-like weights: the user at rank `r` is weighted 1 / r^skew."""
+
+    return [1 / (rank**skew) for rank in range(1, users + 1)]
+
+
+# SETUP
+
+
+def setup(args):
+    """Create the schema, operations, load test users and an admin key."""
+
+    # The schema expects the database to exist already
+    connection = pymysql.connect(
+        host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASSWORD
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_DATABASE}")
+
+        for statement in schema_statements():
+            cursor.execute(statement)
+
+    connection.commit()
+    connection.close()
+    print("Created schema")
+
+    # All users share one password, hashed once with the app's work factor so
+    # logins don't trigger a rehash
+    hashed = hashpw(args.password.encode("utf-8"), gensalt(BCRYPT_ROUNDS)).decode()
+
+    with DBService() as db:
+        db.insert_many(
+            "operation",
+            [{"type": op_type, "cost": cost} for op_type, cost, _ in OPERATIONS],
+        )
+
+        for start in range(0, args.users, args.batch_size):
+            end = min(start + args.batch_size, args.users)
+            db.insert_many(
+                "user",
+                [
+                    {"username": username(i), "password": hashed, "status": "active"}
+                    for i in range(start, end)
+                ],
+            )
+
+        admin_key = JWTService().generate_admin_token("load_test.py", "Load testing")
+        db.insert_record(
+            "admin_key",
+            {
+                "api_key_hash": hash_api_key(admin_key),
+                "created_by": "load_test.py",
+                "description": "Load testing",
+            },
+        )
+
+    print(f"Created {len(OPERATIONS)} operations and {args.users} users")
+    print(f"\nAdmin key for `run --admin-key`:\n{admin_key}")
+
+
+def schema_statements():
+    """Return the statements in sql/schema.sql, without comments."""
+
+    with open(SCHEMA_PATH) as f:
+        lines = [line for line in f if not line.strip().startswith("--")]
+
+    statements = "".join(lines).split(";")
+
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+# RECORD GENERATION
+
+
+def generate(args):
+    """Bulk-insert calculation records with a skewed number per user."""
+
+    if args.records > MAX_RECORDS:
+        sys.exit(f"--records can be at most {MAX_RECORDS} (record.id is a MEDIUMINT)")
+
+    rng = random.Random(args.seed)
+    calculator = CalculatorService()
+
+    # Users are inserted in order by `setup`, so user IDs are 1..users
+    weights = user_weights(args.users, args.skew)
+    total_weight = sum(weights)
+    counts = [int(args.records * weight / total_weight) for weight in weights]
+
+    # Hand out the records lost to rounding down to the heaviest users
+    for i in range(args.records - sum(counts)):
+        counts[i % args.users] += 1
+
+    op_ids = list(range(1, len(OPERATIONS) + 1))
+    op_shares = [share for _, _, share in OPERATIONS]
+
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=args.days)
+
+    inserted = 0
+    started = time.perf_counter()
+    batch = []
+
+    with DBService() as db:
+        for user_index, count in enumerate(counts):
+            user_id = user_index + 1
+            balance = args.starting_balance
+
+            # Calculations are spread over the period, oldest first, so the
+            # balance goes down over time as it would in the app
+            offsets = sorted(rng.randrange(args.days * 86400) for _ in range(count))
+
+            for offset in offsets:
+                op_id = rng.choices(op_ids, op_shares)[0]
+                op_type, cost, _ = OPERATIONS[op_id - 1]
+                balance -= cost
+
+                batch.append(
+                    {
+                        "operation_id": op_id,
+                        "operation_type": op_type,
+                        "user_id": user_id,
+                        "amount": 1,
+                        "charged_cost": cost,
+                        "user_balance": round(balance, 2),
+                        "operation_response": json.dumps(
+                            calculation(rng, calculator, op_id, op_type)
+                        ),
+                        "date": start + timedelta(seconds=offset),
+                    }
+                )
+
+                if len(batch) >= args.batch_size:
+                    inserted += db.insert_many("record", batch)
+                    batch = []
+                    report_progress(inserted, args.records, started)
+
+        if batch:
+            inserted += db.insert_many("record", batch)
+
+    report_progress(inserted, args.records, started)
+    print()
+
+
+def calculation(rng, calculator, op_id, op_type):
+    """Return a plausible calculation as stored in `record.operation_response`."""
+
+    if op_type == "random_string":
+        length = rng.randint(4, 20)
+        operands = [
+            {
+                "string_length": length,
+                "include_digits": True,
+                "include_uppercase_letters": True,
+                "include_lowercase_letters": True,
+            }
+        ]
+        result = "".join(rng.choices(string.ascii_letters + string.digits, k=length))
+
+    elif op_type == "square_root":
+        operands = [rng.randint(0, 10_000)]
+        result = calculator.calculate(op_id, operands)
+
+    else:
+        operands = [rng.randint(1, 1000) for _ in range(rng.randint(2, 5))]
+        result = calculator.calculate(op_id, operands)
+
+    return {"operation": op_type, "operands": operands, "result": result}
+
+
+def report_progress(inserted, total, started):
+
+    rate = inserted / max(time.perf_counter() - started, 1e-9)
+    print(f"\rInserted {inserted}/{total} records ({rate:,.0f}/s)", end="", flush=True)
+
+
+# TRAFFIC
+
+
+class LoadWorker(threading.Thread):
+    """Sends a weighted mix of requests until the deadline passes."""
+
+    def __init__(self, args, mix, user_cum_weights, results, deadline, seed):
+
+        super().__init__(daemon=True)
+
+        self.args = args
+        self.mix = mix
+        self.user_cum_weights = user_cum_weights
+        self.results = results
+        self.deadline = deadline
+
+        self.rng = random.Random(seed)
+        self.session = requests.Session()
+        self.tokens = {}
+
+        self.api = args.base_url.rstrip("/") + "/api/v1"
+
+    def run(self):
+
+        actions = list(self.mix)
+        weights = list(self.mix.values())
+
+        while time.monotonic() < self.deadline:
+            action = self.rng.choices(actions, weights)[0]
+            getattr(self, action)()
+
+    def request(self, action, method, url, **kwargs):
+        """Send a request, recording its latency and status under `action`."""
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, timeout=30, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, "error"
+
+        self.results.record(action, time.perf_counter() - start, status)
+
+        return response
+
+    def pick_user(self):
+
+        users = range(self.args.users)
+        return self.rng.choices(users, cum_weights=self.user_cum_weights)[0]
+
+    def token_for(self, user_index):
+        """Return a token for the user, logging in the first time it's used."""
+
+        if user_index not in self.tokens:
+            self.login(user_index)
+
+        return self.tokens.get(user_index)
+
+    def login(self, user_index=None):
+
+        user_index = self.pick_user() if user_index is None else user_index
+
+        response = self.request(
+            "login",
+            "POST",
+            f"{self.api}/auth/login",
+            json={"username": username(user_index), "password": self.args.password},
+        )
+
+        if response is not None and response.status_code == 200:
+            self.tokens[user_index] = response.json()["token"]
+
+    def calculate(self):
+
+        token = self.token_for(self.pick_user())
+        if not token:
+            return
+
+        op_type, _, _ = self.rng.choices(OPERATIONS[:5], [s for *_, s in OPERATIONS[:5]])[0]
+        if op_type == "square_root":
+            operands = [self.rng.randint(0, 10_000)]
+        else:
+            operands = [self.rng.randint(1, 1000) for _ in range(self.rng.randint(2, 5))]
+
+        self.request(
+            "calculate",
+            "POST",
+            f"{self.api}/calculations/new",
+            json={"operation": op_type, "operands": operands},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    def history(self):
+
+        token = self.token_for(self.pick_user())
+        if not token:
+            return
+
+        # Most users only look at the first few pages of their history
+        page = min(int(self.rng.expovariate(0.5)) + 1, 100)
+
+        self.request(
+            "history",
+            "GET",
+            f"{self.api}/calculations",
+            params={"page": page, "page_size": 10},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    def delete(self):
+
+        record_id = self.rng.randint(1, self.args.records)
+
+        self.request(
+            "delete",
+            "DELETE",
+            f"{self.api}/calculations/{record_id}",
+            headers={"Authorization": f"Bearer {self.args.admin_key}"},
+        )
+
+
+class LoadResults:
+    """Latencies and status codes collected from every worker, by action."""
+
+    def __init__(self):
+
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def record(self, action, seconds, status):
+
+        with self._lock:
+            self.latencies[action].append(seconds)
+            self.statuses[action][status] += 1
+
+    def report(self, elapsed):
+
+        all_latencies = [s for latencies in self.latencies.values() for s in latencies]
+
+        print(f"\n{'action':<10} {'requests':>9} {'req/s':>9}", end="")
+        print("".join(f" {p:>9}" for p in ["p50 ms", "p90 ms", "p95 ms", "p99 ms", "max ms"]))
+
+        rows = sorted(self.latencies.items()) + [("total", all_latencies)]
+        for action, latencies in rows:
+            print(
+                f"{action:<10} {len(latencies):>9} {len(latencies) / elapsed:>9.1f}",
+                end="",
+            )
+            print(
+                "".join(
+                    f" {percentile(latencies, p) * 1000:>9.1f}"
+                    for p in [50, 90, 95, 99, 100]
+                )
+            )
+
+        print("\nStatus codes:")
+        for action, statuses in sorted(self.statuses.items()):
+            counts = ", ".join(f"{s}: {n}" for s, n in sorted(statuses.items(), key=str))
+            print(f"  {action:<10} {counts}")
+
+
+def percentile(values, p):
+    """Return the `p`th percentile of `values` (nearest rank)."""
+
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(int(round(p / 100 * len(ordered))), 1)
+
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def parse_mix(mix):
+    """Parse a traffic mix like "login=5,calculate=40" into {action: weight}."""
+
+    weights = {}
+    for part in mix.split(","):
+        action, _, weight = part.partition("=")
+        if action not in {"login", "calculate", "history", "delete"}:
+            raise argparse.ArgumentTypeError(f"Unknown action '{action}' in --mix")
+
+        weights[action] = float(weight)
+
+    return {action: weight for action, weight in weights.items() if weight > 0}
+
+
+def run(args):
+    """Drive concurrent mixed traffic against the app and report the results."""
+
+    if "delete" in args.mix and not args.admin_key:
+        sys.exit("--admin-key is required when the mix includes deletes")
+
+    cum_weights = []
+    total = 0.0
+    for weight in user_weights(args.users, args.skew):
+        total += weight
+        cum_weights.append(total)
+
+    results = LoadResults()
+    started = time.monotonic()
+    deadline = started + args.duration
+
+    workers = [
+        LoadWorker(args, args.mix, cum_weights, results, deadline, args.seed + i)
+        for i in range(args.concurrency)
+    ]
+
+    print(f"Running {args.concurrency} workers for {args.duration}s...")
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    results.report(time.monotonic() - started)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # Options shared by every step, which must agree between steps
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--users", type=int, default=10_000)
+    common.add_argument("--password", default=DEFAULT_PASSWORD)
+    common.add_argument(
+        "--skew",
+        type=float,
+        default=1.1,
+        help="Zipf exponent for how activity is spread across users",
+    )
+    common.add_argument("--seed", type=int, default=42)
+
+    setup_parser = subparsers.add_parser(
+        "setup", parents=[common], help="Create the schema, operations and users"
+    )
+    setup_parser.add_argument("--batch-size", type=int, default=5_000)
+    setup_parser.set_defaults(func=setup)
+
+    generate_parser = subparsers.add_parser(
+        "generate", parents=[common], help="Bulk-generate calculation records"
+    )
+    generate_parser.add_argument("--records", type=int, default=1_000_000)
+    generate_parser.add_argument("--days", type=int, default=365)
+    generate_parser.add_argument("--starting-balance", type=float, default=1_000_000)
+    generate_parser.add_argument("--batch-size", type=int, default=5_000)
+    generate_parser.set_defaults(func=generate)
+
+    run_parser = subparsers.add_parser(
+        "run", parents=[common], help="Drive mixed traffic against the app"
+    )
+    run_parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    run_parser.add_argument(
+        "--records",
+        type=int,
+        default=1_000_000,
+        help="Number of generated records; deletes target IDs up to this",
+    )
+    run_parser.add_argument("--admin-key", default=os.environ.get("LOAD_TEST_ADMIN_KEY"))
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--duration", type=float, default=60)
+    run_parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    run_parser.set_defaults(func=run)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from services.db_service import DBService
-from services.jwt_service import JWTService
+from services.jwt_service import JWTService, hash_api_key
 
 created_by = input('\nEnter a value for "created_by" >> ')
 description = input('\nEnter a value for "description" >> ')
@@ -15,13 +15,14 @@ print()
 token = JWTService().generate_admin_token(created_by, description)
 
 print(f"\nYour new admin key:\n{token}")
+print("\nOnly its hash is stored, so keep a copy of the key somewhere safe.")
 print("\nStoring your key in the database...\n")
 
 with DBService() as db:
     db.insert_record(
         "admin_key",
         {
-            "api_key": token,
+            "api_key_hash": hash_api_key(token),
             "created_by": created_by or None,
             "description": description or None,
         },
@@ -0,0 +1,74 @@
+"""Generate a new Ed25519 JWT signing key and add it to the key set file.
+
+The new key starts signing tokens at the time given (now by default). The
+previous signing key stops signing at that time, but tokens signed with it
+are still accepted until its verification window closes.
+"""
+
+import os
+import sys
+import json
+from datetime import datetime, UTC
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+keyset_path = input('\nEnter the path of the key set file >> ')
+not_before = input('\nEnter when the key starts signing (ISO 8601, blank for now) >> ')
+print()
+
+not_before = not_before or datetime.now(UTC).isoformat(timespec="seconds")
+kid = datetime.fromisoformat(not_before).strftime("%Y%m%d%H%M%S")
+
+keyset = {"keys": []}
+if os.path.exists(keyset_path):
+    with open(keyset_path) as f:
+        keyset = json.load(f)
+
+if any(key["kid"] == kid for key in keyset["keys"]):
+    sys.exit(f"A key with ID '{kid}' already exists.")
+
+# Write the new key pair next to the key set file
+private_key = Ed25519PrivateKey.generate()
+key_dir = os.path.dirname(os.path.abspath(keyset_path))
+
+private_key_path = f"{kid}.private.pem"
+with open(os.path.join(key_dir, private_key_path), "wb") as f:
+    f.write(
+        private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+os.chmod(os.path.join(key_dir, private_key_path), 0o600)
+
+public_key_path = f"{kid}.public.pem"
+with open(os.path.join(key_dir, public_key_path), "wb") as f:
+    f.write(
+        private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    )
+
+# Retire the current signing key(s) once the new key takes over
+for key in keyset["keys"]:
+    if not key.get("not_after") or key["not_after"] > not_before:
+        key["not_after"] = not_before
+
+keyset["keys"].append(
+    {
+        "kid": kid,
+        "alg": "EdDSA",
+        "private_key_path": private_key_path,
+        "public_key_path": public_key_path,
+        "not_before": not_before,
+    }
+)
+
+with open(keyset_path, "w") as f:
+    json.dump(keyset, f, indent=4)
+
+print(f"Added key '{kid}' to {keyset_path}")
+print("Done!")
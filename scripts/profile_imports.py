@@ -0,0 +1,91 @@
+"""Report which modules take the longest to import when the app cold starts.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter and prints
+the slowest imports, which is where Lambda cold start time goes. Modules
+imported by the interpreter itself before the app (e.g. `site`) are left out.
+
+    $ python scripts/profile_imports.py
+    $ python scripts/profile_imports.py --sort self --top 40
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Required by config.py at import; the values don't matter for profiling
+PLACEHOLDER_ENV = {
+    "JWT_SECRET": "profile",
+    "DB_HOST": "localhost",
+    "DB_USER": "profile",
+    "DB_PASSWORD": "profile",
+}
+
+
+def profile_imports(module):
+    """Import `module` in a fresh interpreter and return its import timings.
+
+    Returns a list of (module name, self microseconds, cumulative
+    microseconds, nesting depth) tuples, in import order.
+    """
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=PLACEHOLDER_ENV | os.environ,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        timings.append((name.strip(), int(self_us), int(cumulative_us), depth))
+
+    # Imports are reported children first, so everything the app pulled in
+    # comes after the last top-level import made before it
+    start = 0
+    for i, (name, _, _, depth) in enumerate(timings):
+        if depth == 0 and name != module:
+            start = i + 1
+        elif name == module:
+            break
+
+    return timings[start:]
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app", help="Module to import")
+    parser.add_argument("--top", type=int, default=25, help="Number of modules to show")
+    parser.add_argument(
+        "--sort",
+        choices=["cumulative", "self"],
+        default="cumulative",
+        help="Sort by time including (cumulative) or excluding (self) sub-imports",
+    )
+    args = parser.parse_args()
+
+    timings = profile_imports(args.module)
+    key = 2 if args.sort == "cumulative" else 1
+
+    total_us = next(t[2] for t in reversed(timings) if t[0] == args.module)
+    print(f"Importing {args.module} took {total_us / 1000:.1f} ms\n")
+
+    slowest = sorted(timings, key=lambda t: t[key], reverse=True)[: args.top]
+
+    print(f"{'self ms':>9} {'cumulative ms':>14}  module")
+    for name, self_us, cumulative_us, _ in slowest:
+        print(f"{self_us / 1000:>9.1f} {cumulative_us / 1000:>14.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Add monthly partitions to `record` ahead of time and archive old ones.
+
+Run it regularly (e.g. daily) once sql/migrations/003_partition_record.sql
+and sql/migrations/004_add_tombstone_tables.sql have been applied:
+
+    $ python scripts/rotate_record_partitions.py --retention-months 12
+
+Each run:
+
+ 1. Splits `p_future` so that monthly partitions exist up to
+    `--months-ahead` months from now. On the first run, they start at the
+    month of the oldest record.
+ 2. Copies every partition older than `--retention-months` months to
+    `record_archive`. The copy is done in batches of `--batch-size` rows, so
+    no single statement holds locks for long. Each copy is then verified.
+ 3. Moves the boundary in `record_archive_state` forward, so the app reads
+    those months from the archive (with RECORD_ARCHIVE_ENABLED set).
+ 4. Waits for every app instance to pick up the new boundary. Records can
+    still change in `record` until then (e.g. be deleted), so with both
+    tables locked, records changed since the copy started (going by
+    `updated_at`) are copied again and the archived partitions are dropped.
+
+Every step can be repeated safely, so a run that fails part way through is
+resumed by running the script again. Partitions are by month in UTC. Pass
+`--dry-run` to print what would change without changing anything.
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timezone
+
+import pymysql
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config import (
+    DB_HOST,
+    DB_PORT,
+    DB_USER,
+    DB_PASSWORD,
+    DB_DATABASE,
+    RECORD_ARCHIVE_CACHE_TTL_SECONDS,
+)
+from services.record_archive_service import ARCHIVE_TABLE, ARCHIVE_STATE_TABLE
+
+
+# Holds every record newer than the monthly partitions
+FUTURE_PARTITION = "p_future"
+
+
+def month_start(dt):
+    """Return the first moment of the month `dt` falls in, in UTC."""
+
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month, months):
+    """Return the first moment of the month `months` after `month`."""
+
+    index = month.year * 12 + month.month - 1 + months
+
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month):
+    """Return the name of the partition holding the given month's records."""
+
+    return f"p{month:%Y%m}"
+
+
+class PartitionRotator:
+    """Adds, archives and drops the monthly partitions of `record`."""
+
+    def __init__(self, connection, batch_size, dry_run=False):
+
+        self.connection = connection
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+
+    def execute(self, sql, params=None, change=True):
+        """Run a statement and return its rows.
+
+        In a dry run, statements that change the database are only printed.
+        """
+
+        if change and self.dry_run:
+            print(f"[dry run] {' '.join(sql.split())}", params or "")
+            return []
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+        self.connection.commit()
+
+        return rows
+
+    def partitions(self):
+        """Return the monthly partitions as (name, upper bound) pairs, oldest first."""
+
+        rows = self.execute(
+            """
+            SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS bound
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'record'
+            ORDER BY PARTITION_ORDINAL_POSITION
+            """,
+            (DB_DATABASE,),
+            change=False,
+        )
+
+        if not rows or rows[0]["name"] is None:
+            sys.exit(
+                "`record` isn't partitioned; apply "
+                "sql/migrations/003_partition_record.sql first"
+            )
+
+        return [
+            (row["name"], datetime.fromtimestamp(int(row["bound"]), timezone.utc))
+            for row in rows
+            if row["name"] != FUTURE_PARTITION
+        ]
+
+    def add_partitions(self, partitions, now, months_ahead):
+        """Split monthly partitions off `p_future` up to `months_ahead` months from now."""
+
+        if partitions:
+            next_bound = partitions[-1][1]
+        else:
+            oldest = self.execute(
+                "SELECT MIN(`date`) AS oldest FROM record", change=False
+            )[0]["oldest"]
+            first_month = month_start(oldest) if oldest else month_start(now)
+            next_bound = add_months(first_month, 1)
+
+        last_bound = add_months(month_start(now), months_ahead + 1)
+
+        added = []
+        while next_bound <= last_bound:
+            added.append((partition_name(add_months(next_bound, -1)), next_bound))
+            next_bound = add_months(next_bound, 1)
+
+        if not added:
+            return []
+
+        # Bounds are given as Unix timestamps, so they don't depend on the
+        # session's time zone
+        definitions = [
+            f"PARTITION {name} VALUES LESS THAN ({int(bound.timestamp())})"
+            for name, bound in added
+        ]
+        definitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+
+        self.execute(
+            f"ALTER TABLE record REORGANIZE PARTITION {FUTURE_PARTITION} "
+            f"INTO ({', '.join(definitions)})"
+        )
+
+        return added
+
+    def copy_partition(self, name):
+        """Copy a partition's records to the archive in batches; return how many."""
+
+        # The partition may only be planned, so there's nothing to read yet
+        if self.dry_run:
+            print(f"[dry run] copy partition {name} to {ARCHIVE_TABLE}")
+            return 0
+
+        stats = self.execute(
+            f"SELECT MIN(id) AS low, MAX(id) AS high, COUNT(*) AS total "
+            f"FROM record PARTITION ({name})",
+            change=False,
+        )[0]
+
+        if not stats["total"]:
+            return 0
+
+        # REPLACE makes copying again after an interrupted run safe
+        for start in range(stats["low"], stats["high"] + 1, self.batch_size):
+            self.execute(
+                f"REPLACE INTO {ARCHIVE_TABLE} "
+                f"SELECT * FROM record PARTITION ({name}) WHERE id BETWEEN %s AND %s",
+                (start, start + self.batch_size - 1),
+            )
+
+            done = min(start + self.batch_size - 1, stats["high"]) - stats["low"] + 1
+            span = stats["high"] - stats["low"] + 1
+            print(f"\r  {name}: {done / span:.0%}", end="", flush=True)
+
+        print()
+
+        copied = self.execute(
+            f"SELECT COUNT(*) AS copied FROM record PARTITION ({name}) r "
+            f"JOIN {ARCHIVE_TABLE} a ON a.id = r.id AND a.`date` = r.`date`",
+            change=False,
+        )[0]["copied"]
+
+        if copied != stats["total"]:
+            sys.exit(
+                f"Only {copied} of {stats['total']} records in {name} were "
+                "archived; nothing was dropped. Run the script again to retry."
+            )
+
+        return stats["total"]
+
+    def move_boundary(self, archived_before):
+        """Have the app read records before `archived_before` from the archive."""
+
+        self.execute(
+            f"""
+            INSERT INTO {ARCHIVE_STATE_TABLE} (id, archived_before)
+            VALUES (1, FROM_UNIXTIME(%s))
+            ON DUPLICATE KEY UPDATE
+                archived_before = GREATEST(archived_before, VALUES(archived_before))
+            """,
+            (int(archived_before.timestamp()),),
+        )
+
+    def now(self):
+        """Return the database's current time."""
+
+        return self.execute("SELECT NOW() AS now", change=False)[0]["now"]
+
+    def copy_changed(self, names, since):
+        """Copy the partitions' records changed since `since` to the archive again."""
+
+        for name in names:
+            self.execute(
+                f"REPLACE INTO {ARCHIVE_TABLE} "
+                f"SELECT * FROM record PARTITION ({name}) WHERE updated_at >= %s",
+                (since,),
+            )
+
+    def drop_partitions(self, names, copied_since):
+        """Drop archived partitions, first copying records changed since `copied_since`.
+
+        Records are copied once without locks, so that few are left to copy
+        while `record` is locked against writes.
+        """
+
+        resynced_since = self.now()
+        self.copy_changed(names, copied_since)
+
+        self.execute(f"LOCK TABLES record WRITE, {ARCHIVE_TABLE} WRITE")
+        try:
+            self.copy_changed(names, resynced_since)
+            self.execute(f"ALTER TABLE record DROP PARTITION {', '.join(names)}")
+        finally:
+            self.execute("UNLOCK TABLES")
+
+
+def rotate(args):
+
+    connection = pymysql.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_DATABASE,
+        cursorclass=pymysql.cursors.DictCursor,
+        # Dates read back (e.g. the oldest record's) are then in UTC too
+        init_command="SET time_zone = '+00:00'",
+    )
+
+    rotator = PartitionRotator(connection, args.batch_size, args.dry_run)
+    now = datetime.now(timezone.utc)
+
+    partitions = rotator.partitions()
+
+    added = rotator.add_partitions(partitions, now, args.months_ahead)
+    print(f"Added {len(added)} partitions: {', '.join(n for n, _ in added) or '-'}")
+    partitions += added
+
+    cutoff = add_months(month_start(now), -args.retention_months)
+    to_archive = [(name, bound) for name, bound in partitions if bound <= cutoff]
+
+    if not to_archive:
+        print(f"No partitions before {cutoff:%Y-%m-%d} to archive")
+        connection.close()
+        return
+
+    # Records changed from here on are copied again before the drop
+    copy_started = rotator.now()
+
+    archived = 0
+    for name, _ in to_archive:
+        archived += rotator.copy_partition(name)
+
+    rotator.move_boundary(to_archive[-1][1])
+    print(f"Archived {archived} records from before {to_archive[-1][1]:%Y-%m-%d}")
+
+    # App instances cache the boundary, so the records stay in `record` until
+    # every instance reads them from the archive instead
+    if not args.dry_run:
+        print(f"Waiting {args.grace_seconds}s for the app to use the archive...")
+        time.sleep(args.grace_seconds)
+
+    rotator.drop_partitions([name for name, _ in to_archive], copy_started)
+    print(f"Dropped {len(to_archive)} partitions: {', '.join(n for n, _ in to_archive)}")
+
+    connection.close()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--retention-months",
+        type=int,
+        default=12,
+        help="Full months kept in `record` before the current one",
+    )
+    parser.add_argument("--months-ahead", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument(
+        "--grace-seconds",
+        type=float,
+        default=RECORD_ARCHIVE_CACHE_TTL_SECONDS + 5,
+        help="How long to wait between archiving and dropping partitions",
+    )
+    parser.add_argument("--dry-run", action="store_true")
+
+    rotate(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
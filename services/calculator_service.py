@@ -1,7 +1,12 @@
 import math
+import time
 from functools import reduce
 
-import requests
+from services.lazy_import import LazyModule
+from services.metrics_service import calculator_operations, random_source_seconds
+
+# Only needed for random strings, so imported on first use
+requests = LazyModule("requests")
 
 
 class CalculatorService:
@@ -29,6 +34,26 @@ class CalculatorService:
             6: self._random_string_options,
         }
 
+        # Operations that can also consume their operands as a stream, without
+        # holding them all in memory (see `calculate_stream`)
+        self.stream_operation_map = {
+            1: self._add_stream,
+            2: self._subtract_stream,
+            3: self._multiply_stream,
+            4: self._divide_stream,
+        }
+
+    def _numbers(self, operands, operation_name):
+        """Yield the operands, raising a ValueError at the first non-number."""
+
+        for operand in operands:
+            if not (isinstance(operand, int) or isinstance(operand, float)):
+                raise ValueError(
+                    f"'{operation_name}' operation accepts only number-type operands."
+                )
+
+            yield operand
+
     def _add(self, *args):
         """Add any number of operands together."""
 
@@ -37,6 +62,11 @@ class CalculatorService:
 
         return sum(args)
     
+    def _add_stream(self, operands):
+        """Add an iterable of operands together, as they arrive."""
+
+        return sum(self._numbers(operands, "Addition"))
+
     def _add_options(self):
         """Return the options/settings for the 'Addition' operation."""
 
@@ -56,6 +86,11 @@ class CalculatorService:
 
         return reduce(lambda a, b: a - b, args)
     
+    def _subtract_stream(self, operands):
+        """Subtract the rest of an iterable of operands from the first."""
+
+        return reduce(lambda a, b: a - b, self._numbers(operands, "Subtraction"))
+
     def _subtract_options(self):
         """Return the options/settings for the 'Subtraction' operation."""
 
@@ -75,6 +110,11 @@ class CalculatorService:
 
         return reduce(lambda a, b: a * b, args)
     
+    def _multiply_stream(self, operands):
+        """Multiply an iterable of operands together, as they arrive."""
+
+        return reduce(lambda a, b: a * b, self._numbers(operands, "Multiplication"))
+
     def _multiply_options(self):
         """Return the options/settings for the 'Multiplication' operation."""
 
@@ -92,6 +132,11 @@ class CalculatorService:
 
         return reduce(lambda a, b: a / b, args)
     
+    def _divide_stream(self, operands):
+        """Divide the first of an iterable of operands by the rest, as they arrive."""
+
+        return reduce(lambda a, b: a / b, self._numbers(operands, "Division"))
+
     def _divide_options(self):
         """Return the options/settings for the 'Division' operation."""
 
@@ -160,8 +205,13 @@ class CalculatorService:
             "rnd": "new",
         }
 
-        # Make the API request and check for errors
-        result = requests.get(vendor_url, params=params)
+        # Make the API request (timing it) and check for errors
+        start = time.perf_counter()
+        try:
+            result = requests.get(vendor_url, params=params)
+        finally:
+            random_source_seconds.observe(time.perf_counter() - start)
+
         if "Error:" in result.text:
             raise ValueError(result.text.split(":")[1].strip())
 
@@ -202,7 +252,39 @@ class CalculatorService:
                 f"Operation with ID '{operation_key}' not yet implemented"
             )
 
-        return self.operation_map[operation_key](*operands)
+        operation = self.operation_map[operation_key]
+
+        return self._count(operation.__name__.lstrip("_"), operation, *operands)
+
+    def calculate_stream(self, operation_key: int, operands):
+        """Perform the requested calculation over an iterable of operands.
+
+        The operands are consumed one at a time, so they never need to be held
+        in memory together. Gives the same result as `calculate` with the
+        same operands. Operations not in `stream_operation_map` take only a
+        few operands, so these are collected and passed to `calculate`.
+        """
+
+        if operation_key not in self.stream_operation_map:
+            return self.calculate(operation_key, list(operands))
+
+        operation = self.stream_operation_map[operation_key]
+        operation_name = operation.__name__.lstrip("_").removesuffix("_stream")
+
+        return self._count(operation_name, operation, operands)
+
+    def _count(self, operation_name, operation, *args):
+        """Run the operation, counting it by outcome."""
+
+        try:
+            result = operation(*args)
+        except Exception:
+            calculator_operations.inc((operation_name, "error"))
+            raise
+
+        calculator_operations.inc((operation_name, "ok"))
+
+        return result
     
     def get_operation_options(self, operation_key: int):
         """Return the options/settings for the requested operation."""
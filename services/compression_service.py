@@ -0,0 +1,166 @@
+import zlib
+
+from flask import request
+
+from config import (
+    COMPRESSION_MIN_SIZE,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_BROTLI_QUALITY,
+)
+from services.timing_service import timed
+
+try:
+    import brotli
+except ImportError:  # gzip is still available without the brotli package
+    brotli = None
+
+
+# Only text-like responses are worth compressing
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "application/msgpack",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+def supported_encodings():
+    """Return the content encodings we can produce, most preferred first."""
+
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+class _GzipCompressor:
+
+    def __init__(self, level):
+
+        # wbits=31 writes a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+
+        return self._compressor.compress(data)
+
+    def flush(self):
+        """Return everything compressed so far, keeping the stream open."""
+
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor:
+
+    def __init__(self, quality):
+
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+
+        return self._compressor.process(data)
+
+    def flush(self):
+        """Return everything compressed so far, keeping the stream open."""
+
+        return self._compressor.flush()
+
+    def finish(self):
+
+        return self._compressor.finish()
+
+
+def new_compressor(encoding, gzip_level, brotli_quality):
+    """Return a streaming compressor for the given content encoding."""
+
+    if encoding == "br":
+        return _BrotliCompressor(brotli_quality)
+
+    return _GzipCompressor(gzip_level)
+
+
+def compress_stream(chunks, compressor):
+    """Compress an iterable of response chunks, flushing after each chunk.
+
+    Flushing means each chunk reaches the client as soon as it's produced,
+    as it would uncompressed, at some cost in compression ratio.
+    """
+
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def init_response_compression(
+    app,
+    min_size=COMPRESSION_MIN_SIZE,
+    gzip_level=COMPRESSION_GZIP_LEVEL,
+    brotli_quality=COMPRESSION_BROTLI_QUALITY,
+):
+    """Register a hook that compresses responses the client accepts compressed.
+
+    The encoding is negotiated from the request's `Accept-Encoding` header,
+    preferring brotli over gzip when both are equally acceptable. Responses
+    smaller than `min_size` bytes are sent uncompressed, as compressing them
+    saves too little to be worth it. Streamed responses are always
+    compressed, chunk by chunk, as their size isn't known up front.
+    """
+
+    @app.after_request
+    def compress_response(response):
+
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or not _is_compressible(response.mimetype)
+        ):
+            return response
+
+        # The response now depends on the request's Accept-Encoding header
+        response.vary.add("Accept-Encoding")
+
+        encoding = request.accept_encodings.best_match(supported_encodings())
+        if encoding is None:
+            return response
+
+        compressor = new_compressor(encoding, gzip_level, brotli_quality)
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, compressor)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+
+            with timed("compress"):
+                response.set_data(compressor.compress(data) + compressor.finish())
+
+        response.headers["Content-Encoding"] = encoding
+
+        return response
+
+
+def _is_compressible(mimetype):
+
+    mimetype = mimetype or ""
+
+    return (
+        mimetype.startswith("text/")
+        or mimetype in COMPRESSIBLE_MIMETYPES
+        or mimetype.endswith("+json")
+    )
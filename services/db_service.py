@@ -1,10 +1,246 @@
+import re
+import json
+import time
+import logging
+import threading
+import functools
+import contextlib
+
 import pymysql
+from flask import g, has_request_context, request
+
+from config import (
+    DB_HOST,
+    DB_PORT,
+    DB_USER,
+    DB_PASSWORD,
+    DB_DATABASE,
+    DB_MAX_PACKET_BYTES,
+    DB_SQL_CACHE_SIZE,
+    DB_SLOW_QUERY_MS,
+    DB_REPLICA_HOSTS,
+    DB_REPLICA_RETRY_SECONDS,
+)
+from services.metrics_service import (
+    Counter,
+    db_query_seconds,
+    db_query_rows,
+    register,
+    register_cache,
+    register_gauge,
+)
+from services.timing_service import add_timing
+
+
+slow_query_logger = logging.getLogger("db.slow_query")
+
+
+# SQL statement builders
+#
+# The query helpers on DBService build their SQL text from the shape of the
+# request (table, fields, joins, condition keys, ...) and never from the
+# values themselves, so the built statements are cached and reused across
+# calls. Values are always passed separately as query parameters.
+
+
+@functools.lru_cache(maxsize=DB_SQL_CACHE_SIZE)
+def _build_select(table, fields, join, condition_keys, order_by, has_limit, has_offset):
+    """Build a SELECT statement; `join` is a tuple of (table, left, right) tuples."""
+
+    fields_str = ", ".join(f"`{f}`" if f != "*" else f for f in fields)
+
+    join_str = "".join(
+        f" JOIN {join_table} ON {left} = {right}" for join_table, left, right in join
+    )
+
+    condition_str = ""
+    if condition_keys:
+        condition_str = " WHERE " + " AND ".join(f"{k}=%s" for k in condition_keys)
+
+    query = f"SELECT {fields_str} FROM {table}{join_str}{condition_str}"
+
+    if order_by:
+        query += f" ORDER BY {order_by}"
+
+    if has_limit:
+        query += " LIMIT %s"
+
+    if has_offset:
+        query += " OFFSET %s"
+
+    return query
+
+
+@functools.lru_cache(maxsize=DB_SQL_CACHE_SIZE)
+def _build_count(table, condition_keys):
+    """Build a SELECT COUNT(*) statement."""
+
+    query = f"SELECT COUNT(*) FROM {table}"
+
+    if condition_keys:
+        query += " WHERE " + " AND ".join(f"{k}=%s" for k in condition_keys)
+
+    return query
+
+
+@functools.lru_cache(maxsize=DB_SQL_CACHE_SIZE)
+def _build_insert(table, columns):
+    """Build a single-row INSERT statement."""
+
+    columns_str = ", ".join(f"`{c}`" for c in columns)
+    placeholders = ", ".join(["%s"] * len(columns))
+
+    return f"INSERT INTO {table} ({columns_str}) VALUES ({placeholders})"
+
+
+@functools.lru_cache(maxsize=DB_SQL_CACHE_SIZE)
+def _build_update(table, columns):
+    """Build a single-row UPDATE statement matching on `id`."""
+
+    set_str = ", ".join(f"{column} = %s" for column in columns)
+
+    return f"UPDATE {table} SET {set_str} WHERE id = %s"
+
+
+_SQL_BUILDERS = (_build_select, _build_count, _build_insert, _build_update)
+
+
+def _byte_len(sql):
+    """Return the size of a statement fragment as sent to the server, in bytes.
+
+    `max_allowed_packet` is measured in bytes, and non-ASCII values take more
+    than one byte per character (connections use utf8mb4).
+    """
+
+    return len(sql.encode("utf-8"))
+
+
+# Statement fingerprinting
+#
+# Statements are normalized so that queries differing only by their literal
+# values (or by the number of rows in a bulk statement) share a fingerprint.
 
-from config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_DATABASE
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER_RE = re.compile(r"(?<![\w`])-?\d+(?:\.\d+)?\b")
+_LIST_RE = re.compile(r"\(\s*(?:\?|NULL)(?:\s*,\s*(?:\?|NULL))*\s*\)")
+_REPEATED_LIST_RE = re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+")
+_REPEATED_CASE_RE = re.compile(r"WHEN \? THEN \?(?: WHEN \? THEN \?)+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Statements longer than this are fingerprinted without caching (bulk statements)
+_MAX_CACHED_FINGERPRINT_LENGTH = 2048
+
+
+def fingerprint_query(query):
+    """Return the normalized fingerprint of a SQL statement."""
+
+    if len(query) <= _MAX_CACHED_FINGERPRINT_LENGTH:
+        return _cached_fingerprint(query)
+
+    return _fingerprint(query)
+
+
+def _fingerprint(query):
+
+    fingerprint = query.replace("%s", "?")
+    fingerprint = _STRING_RE.sub("?", fingerprint)
+    fingerprint = _NUMBER_RE.sub("?", fingerprint)
+    fingerprint = _WHITESPACE_RE.sub(" ", fingerprint).strip().rstrip(";").strip()
+    fingerprint = _LIST_RE.sub("(?+)", fingerprint)
+    fingerprint = _REPEATED_LIST_RE.sub("(?+)", fingerprint)
+    fingerprint = _REPEATED_CASE_RE.sub("WHEN ? THEN ?", fingerprint)
+
+    return fingerprint
+
+
+_cached_fingerprint = functools.lru_cache(maxsize=DB_SQL_CACHE_SIZE)(_fingerprint)
+
+
+def record_query(query, seconds, rows):
+    """Record the timing of an executed statement and log it if it was slow."""
+
+    fingerprint = fingerprint_query(query)
+
+    add_timing("db", seconds)
+    db_query_seconds.observe(fingerprint, seconds)
+    if rows is not None:
+        db_query_rows.observe(fingerprint, rows)
+
+    duration_ms = seconds * 1000
+    if duration_ms >= DB_SLOW_QUERY_MS:
+        entry = {
+            "event": "slow_query",
+            "fingerprint": fingerprint,
+            "duration_ms": round(duration_ms, 3),
+            "rows": rows,
+            "route": None,
+        }
+
+        if has_request_context():
+            entry["route"] = request.endpoint
+            entry["method"] = request.method
+            entry["path"] = request.path
+
+        slow_query_logger.warning(json.dumps(entry))
+
+
+class ReplicaPool:
+    """Round-robin selection of healthy read replica hosts.
+
+    A replica that fails to connect is skipped for `retry_seconds` before
+    being tried again.
+    """
+
+    def __init__(self, hosts, retry_seconds=DB_REPLICA_RETRY_SECONDS):
+
+        self.hosts = list(hosts)
+        self.retry_seconds = retry_seconds
+
+        self._next = 0
+        self._down_until = {}
+        self._lock = threading.Lock()
+
+    def candidates(self):
+        """Return the healthy replica hosts, starting with the next host in turn."""
+
+        if not self.hosts:
+            return []
+
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.hosts)
+
+        now = time.monotonic()
+        ordered = self.hosts[start:] + self.hosts[:start]
+
+        return [h for h in ordered if self._down_until.get(h, 0) <= now]
+
+    def mark_down(self, host):
+        """Skip the given host until its retry window has passed."""
+
+        self._down_until[host] = time.monotonic() + self.retry_seconds
+
+
+replica_pool = ReplicaPool(DB_REPLICA_HOSTS)
+
+# Connections opened and closed by DBService, for connection metrics
+connections_opened = register(
+    "db_connections_opened_total",
+    "Database connections opened.",
+    Counter(),
+)
+connections_closed = Counter()
 
 
 class DBService:
-    """Service class for interacting with the database."""
+    """Service class for interacting with the database.
+
+    Writes always go to the primary. Read-only helpers (`fetch_records`,
+    `count_records` and `execute_query(..., read_only=True)`) go to a read
+    replica when any are configured, unless `primary=True` is passed or a
+    write has already been made during the current request, in which case
+    the primary is used so callers read their own writes.
+    """
 
     def __init__(self):
 
@@ -16,6 +252,11 @@ class DBService:
 
         self.connection = None
 
+        self.replica_connection = None
+        self.replica_host = None
+        self.wrote_to_primary = False
+        self.in_transaction = False
+
     def __enter__(self):
         """Establish a connection to the database when entering a context."""
 
@@ -32,53 +273,164 @@ class DBService:
         """Establish a connection to the database."""
 
         try:
-            self.connection = pymysql.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.db,
-                cursorclass=pymysql.cursors.DictCursor,
-            )
+            self.connection = self._open_connection(self.host)
         except pymysql.MySQLError as e:
             print(f"Error connecting to the database: {e}")
             self.connection = None
 
+    def _open_connection(self, host):
+        """Open a new connection to the given database host."""
+
+        connection = pymysql.connect(
+            host=host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.db,
+            cursorclass=pymysql.cursors.DictCursor,
+        )
+        connections_opened.inc()
+
+        return connection
+
     def close_connection(self):
         """Close the database connection."""
 
         if self.connection:
             self.connection.close()
+            connections_closed.inc()
+
+        self._close_replica_connection()
+
+    def _close_replica_connection(self):
+
+        if self.replica_connection:
+            try:
+                self.replica_connection.close()
+            except pymysql.MySQLError:
+                pass
+
+            connections_closed.inc()
+
+        self.replica_connection = None
+        self.replica_host = None
+
+    def _mark_write(self):
+        """Pin the rest of this request's reads to the primary after a write."""
+
+        self.wrote_to_primary = True
+        if has_request_context():
+            g.db_sticky_primary = True
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Run the statements made on the primary inside the block as one transaction.
+
+        The helpers don't commit on their own inside the block; everything is
+        committed when it exits, or rolled back if it raises.
+        """
+
+        self._mark_write()
+        self.in_transaction = True
+        try:
+            yield self
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+        finally:
+            self.in_transaction = False
+
+    def _commit(self, connection):
+        """Commit on `connection`, unless it's the primary and a transaction is open."""
 
-    def execute_query(self, query, params=None):
-        """Execute a query and return the results."""
+        if connection is not self.connection or not self.in_transaction:
+            connection.commit()
 
-        if not self.connection:
+    def _read_connection(self, primary=False):
+        """Return the connection to use for a read-only query."""
+
+        if primary or self.wrote_to_primary or not replica_pool.hosts:
+            return self.connection
+
+        if has_request_context() and g.get("db_sticky_primary"):
+            return self.connection
+
+        if self.replica_connection:
+            return self.replica_connection
+
+        for host in replica_pool.candidates():
+            try:
+                self.replica_connection = self._open_connection(host)
+                self.replica_host = host
+                return self.replica_connection
+            except pymysql.MySQLError as e:
+                print(f"Error connecting to read replica {host}: {e}")
+                replica_pool.mark_down(host)
+
+        # No healthy replica is available; fall back to the primary
+        return self.connection
+
+    def execute_query(self, query, params=None, read_only=False, primary=False):
+        """Execute a query and return the results.
+
+        Set `read_only` to allow the query to be routed to a read replica.
+        """
+
+        if read_only:
+            connection = self._read_connection(primary)
+        else:
+            connection = self.connection
+            if not query.lstrip().upper().startswith("SELECT"):
+                self._mark_write()
+
+        if not connection:
             print("No database connection")
             return
-        
-        with self.connection.cursor() as cursor:
+
+        with connection.cursor() as cursor:
             try:
-                cursor.execute(query, params)
-                self.connection.commit()
+                self._execute(cursor, query, params)
+                self._commit(connection)
                 result = cursor.fetchall()
                 return result
+            except pymysql.OperationalError as e:
+                if connection is not self.replica_connection:
+                    print(f"Error executing query: {e}")
+                    return
+
+                # The replica went away; skip it for a while and retry on the primary
+                print(f"Error executing query on read replica {self.replica_host}: {e}")
+                replica_pool.mark_down(self.replica_host)
+                self._close_replica_connection()
             except pymysql.MySQLError as e:
                 print(f"Error executing query: {e}")
                 return
 
+        return self.execute_query(query, params, read_only=True, primary=True)
+
+    def _execute(self, cursor, query, params=None):
+        """Execute a statement on the cursor, recording its timing and row count."""
+
+        rows = None
+        start = time.perf_counter()
+        try:
+            rows = cursor.execute(query, params)
+            return rows
+        finally:
+            record_query(query, time.perf_counter() - start, rows)
+
     def insert_record(self, table, data):
         """Insert a record into the given table with the data provided."""
 
         # Create the SQL query string with placeholders for the data
-        columns = ", ".join(f"`{k}`" for k in data.keys())
-        placeholders = ", ".join(["%s"] * len(data))
-        sql = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+        sql = _build_insert(table, tuple(data.keys()))
 
         # Execute the query and commit the transaction
+        self._mark_write()
         with self.connection.cursor() as cursor:
-            cursor.execute(sql, tuple(data.values()))
-            self.connection.commit()
+            self._execute(cursor, sql, tuple(data.values()))
+            self._commit(self.connection)
 
             return cursor.lastrowid
 
@@ -86,18 +438,141 @@ class DBService:
         """Update the requested record with the data provided."""
 
         # Create the SQL query string with placeholders for the data
-        set_str = ", ".join(f"{key} = %s" for key in data.keys())
-        sql = f"UPDATE {table} SET {set_str} WHERE id = %s"
+        sql = _build_update(table, tuple(data.keys()))
 
         params = tuple(data.values()) + (record_id,)
 
         # Execute the query and commit the transaction
+        self._mark_write()
         with self.connection.cursor() as cursor:
-            cursor.execute(sql, params)
-            self.connection.commit()
+            self._execute(cursor, sql, params)
+            self._commit(self.connection)
 
             return cursor.lastrowid
 
+    def insert_many(self, table, rows, max_packet_bytes=DB_MAX_PACKET_BYTES):
+        """Insert many records into the given table using multi-row INSERT statements.
+
+        Rows are split into chunks so that no single statement grows past
+        `max_packet_bytes`. Every row must provide the same columns.
+        Returns the total number of affected rows.
+        """
+
+        if not rows:
+            return 0
+
+        columns = list(rows[0].keys())
+        column_str = ", ".join(f"`{c}`" for c in columns)
+        sql_prefix = f"INSERT INTO {table} ({column_str}) VALUES "
+        row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+
+        affected = 0
+        self._mark_write()
+        with self.connection.cursor() as cursor:
+            # Escape each row once; the escaped fragments are joined directly
+            # into the final statements
+            values = []
+            for row in rows:
+                if list(row.keys()) != columns:
+                    raise ValueError("All rows must have the same columns.")
+                values.append(cursor.mogrify(row_placeholder, tuple(row.values())))
+
+            for chunk in self._chunk_fragments(
+                values, _byte_len(sql_prefix), max_packet_bytes
+            ):
+                affected += self._execute(cursor, sql_prefix + ", ".join(chunk))
+
+            self._commit(self.connection)
+
+        return affected
+
+    def update_many(self, table, rows, key="id", max_packet_bytes=DB_MAX_PACKET_BYTES):
+        """Update many records in the given table using CASE-based UPDATE statements.
+
+        Each row is a dictionary holding the `key` column (used to match the
+        record) along with the columns to update. Every row must provide the
+        same columns. Returns the total number of affected rows.
+        """
+
+        if not rows:
+            return 0
+
+        columns = [c for c in rows[0].keys() if c != key]
+        if not columns:
+            raise ValueError("Rows must contain at least one column to update.")
+
+        affected = 0
+        self._mark_write()
+        with self.connection.cursor() as cursor:
+            # Each fragment holds the escaped key followed by the escaped
+            # values for every updated column
+            fragments = []
+            for row in rows:
+                if set(row.keys()) != set(columns) | {key}:
+                    raise ValueError("All rows must have the same columns.")
+                fragments.append(
+                    [cursor.mogrify("%s", (row[key],))]
+                    + [cursor.mogrify("%s", (row[c],)) for c in columns]
+                )
+
+            # Size of a single row within the statement: one `WHEN k THEN v`
+            # per updated column plus the key in the `IN (...)` list
+            sizes = [
+                sum(_byte_len(frag[0]) + _byte_len(v) + 12 for v in frag[1:])
+                + _byte_len(frag[0])
+                + 2
+                for frag in fragments
+            ]
+            base_size = _byte_len(f"UPDATE {table} SET  WHERE `{key}` IN ()") + sum(
+                2 * _byte_len(c) + _byte_len(key) + 32 for c in columns
+            )
+
+            for chunk in self._chunk_fragments(
+                fragments, base_size, max_packet_bytes, sizes=sizes
+            ):
+                set_strs = []
+                for i, column in enumerate(columns, start=1):
+                    cases = " ".join(f"WHEN {frag[0]} THEN {frag[i]}" for frag in chunk)
+                    set_strs.append(
+                        f"`{column}` = CASE `{key}` {cases} ELSE `{column}` END"
+                    )
+
+                keys_str = ", ".join(frag[0] for frag in chunk)
+                sql = (
+                    f"UPDATE {table} SET {', '.join(set_strs)} "
+                    f"WHERE `{key}` IN ({keys_str})"
+                )
+                affected += self._execute(cursor, sql)
+
+            self._commit(self.connection)
+
+        return affected
+
+    @staticmethod
+    def _chunk_fragments(fragments, base_size, max_packet_bytes, sizes=None):
+        """Group statement fragments into chunks that fit within `max_packet_bytes`.
+
+        A fragment larger than the limit on its own is still emitted in its own
+        chunk; the server will reject it if it really is too large.
+        """
+
+        if sizes is None:
+            sizes = [_byte_len(f) + 2 for f in fragments]  # fragment plus separator
+
+        chunk = []
+        chunk_size = base_size
+        for fragment, size in zip(fragments, sizes):
+            if chunk and chunk_size + size > max_packet_bytes:
+                yield chunk
+                chunk = []
+                chunk_size = base_size
+
+            chunk.append(fragment)
+            chunk_size += size
+
+        if chunk:
+            yield chunk
+
     def fetch_records(
         self,
         table,
@@ -107,55 +582,75 @@ class DBService:
         limit=None,
         offset=None,
         order_by=None,
+        primary=False,
     ):
-        """Fetch records from a specified table with optional conditions."""
+        """Fetch records from a specified table with optional conditions.
 
-        condition_str = ""
-        params = []
+        Reads go to a read replica when one is configured; pass `primary=True`
+        when the caller must see its own recent writes.
+        """
 
-        # Construct the query string based on the provided parameters
-        if conditions:
-            condition_str = " WHERE " + " AND ".join(
-                f"{k}=%s" for k in conditions.keys()
-            )
-            params.extend(conditions.values())
-
-        fields_str = ", ".join(f"`{f}`" if f != "*" else f for f in fields)
-
-        join_str = ""
-        if len(join):
-            for to_join in join:
-                join_str += f" JOIN {to_join['table']} ON {to_join['left']} = {to_join['right']}"
-
-        query = f"SELECT {fields_str} FROM {table}{join_str}{condition_str}"
+        params = list(conditions.values()) if conditions else []
 
-        if order_by:
-            query += f" ORDER BY {order_by}"
+        # Construct the query string based on the provided parameters
+        query = _build_select(
+            table,
+            tuple(fields),
+            tuple((j["table"], j["left"], j["right"]) for j in join),
+            tuple(conditions.keys()) if conditions else (),
+            order_by,
+            limit is not None,
+            offset is not None,
+        )
 
         if limit is not None:
-            query += " LIMIT %s"
             params.append(limit)
 
         if offset is not None:
-            query += " OFFSET %s"
             params.append(offset)
 
         # Execute the query and return the results
-        return self.execute_query(query, tuple(params))
+        return self.execute_query(query, tuple(params), read_only=True, primary=primary)
 
-    def count_records(self, table, conditions=None):
+    def count_records(self, table, conditions=None, primary=False):
         """Count the number of records in the specified table with optional conditions."""
-    
-        query = f"SELECT COUNT(*) FROM {table}"
-        params = []
-
-        if conditions:
-            condition_str = " WHERE " + " AND ".join(
-                f"{k}=%s" for k in conditions.keys()
-            )
-            params.extend(conditions.values())
 
-            query += condition_str
+        query = _build_count(table, tuple(conditions.keys()) if conditions else ())
+        params = list(conditions.values()) if conditions else []
 
-        result = self.execute_query(query, tuple(params))
+        result = self.execute_query(
+            query, tuple(params), read_only=True, primary=primary
+        )
         return result[0]["COUNT(*)"] if result else 0
+
+    @staticmethod
+    def sql_cache_stats():
+        """Return hit/miss statistics for the cache of built SQL statements."""
+
+        hits = misses = size = 0
+        for builder in _SQL_BUILDERS:
+            info = builder.cache_info()
+            hits += info.hits
+            misses += info.misses
+            size += info.currsize
+
+        lookups = hits + misses
+
+        return {
+            "hits": hits,
+            "misses": misses,
+            "size": size,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+register_cache("sql_statements", DBService.sql_cache_stats)
+
+# DBService has no connection pool: each `with DBService()` opens its own
+# connection(s), so this counts connections held by requests in flight
+register_gauge(
+    "db_connections_in_use",
+    "Database connections currently held open by DBService.",
+    (),
+    lambda: connections_opened.value - connections_closed.value,
+)
@@ -0,0 +1,205 @@
+import math
+import hashlib
+import functools
+from datetime import datetime, timedelta, UTC
+
+import pymysql
+from pymysql.constants import ER
+from flask import current_app, g, jsonify, request
+
+from services.db_service import DBService
+
+
+# Idempotency keys longer than this are rejected
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(Exception):
+    """Raised when a request with the same key is still being handled."""
+
+
+class IdempotencyReplay(Exception):
+    """Raised by `IdempotencyStore.claim` when another request already used the key."""
+
+    def __init__(self, stored):
+
+        super().__init__(stored)
+        self.stored = stored
+
+
+class IdempotencyStore:
+    """Stores responses by idempotency key in the `idempotency_key` table.
+
+    Keys are stored per user, so retries are recognised whichever process
+    handles them. A key is claimed by inserting its row, holding the request
+    fingerprint and response, in the same transaction as the work the request
+    does (e.g. charging the user), so the key is only ever stored together
+    with that work. A request claiming a key that is in flight waits on the
+    row's lock for up to `wait_timeout` seconds, then replays the response if
+    the first request committed, or claims the key itself if it rolled back.
+    Keys expire after `ttl` seconds.
+    """
+
+    def __init__(self, ttl, wait_timeout):
+
+        self.ttl = ttl
+
+        # InnoDB waits for locks in whole seconds
+        self.lock_wait_seconds = max(1, math.ceil(wait_timeout))
+
+    def get(self, db, user_id, key):
+        """Return the stored response for the user's key, or None."""
+
+        rows = db.execute_query(
+            """
+            SELECT fingerprint, status, content_type, body
+            FROM idempotency_key
+            WHERE user_id = %s AND idempotency_key = %s AND expires_at > %s
+            """,
+            (user_id, key, datetime.now(UTC)),
+        )
+
+        return rows[0] if rows else None
+
+    def claim(self, db, response):
+        """Store `response` for the current request's key, inside `db.transaction()`.
+
+        Does nothing for requests without a key. Raises an
+        `IdempotencyReplay` if another request with the key committed first,
+        and an `IdempotencyConflict` if it is still in flight after
+        `wait_timeout` seconds; either way the transaction must be rolled back.
+        """
+
+        pending = g.get("idempotency_key")
+        if pending is None:
+            return
+
+        user_id, key, fingerprint = pending
+        now = datetime.now(UTC)
+
+        db.execute_query(
+            "SET SESSION innodb_lock_wait_timeout = %s", (self.lock_wait_seconds,)
+        )
+
+        # An expired key keeps its row until it's purged, so it's replaced here
+        db.execute_query(
+            """
+            DELETE FROM idempotency_key
+            WHERE user_id = %s AND idempotency_key = %s AND expires_at <= %s
+            """,
+            (user_id, key, now),
+        )
+
+        try:
+            db.insert_record(
+                "idempotency_key",
+                {
+                    "user_id": user_id,
+                    "idempotency_key": key,
+                    "fingerprint": fingerprint,
+                    "status": response.status_code,
+                    "content_type": response.content_type,
+                    "body": response.get_data(),
+                    "expires_at": now + timedelta(seconds=self.ttl),
+                },
+            )
+        except pymysql.IntegrityError:
+            stored = self.get(db, user_id, key)
+            if stored is None:
+                raise IdempotencyConflict(key)
+
+            raise IdempotencyReplay(stored)
+        except pymysql.OperationalError as e:
+            if e.args[0] in (ER.LOCK_WAIT_TIMEOUT, ER.LOCK_DEADLOCK):
+                raise IdempotencyConflict(key)
+            raise
+
+
+def _fingerprint(max_body_bytes):
+    """Return a digest of the request body, or None if it's too large to read here.
+
+    Large bodies may be parsed as they're read by the view, so they aren't
+    read up front; requests with these are matched by key alone.
+    """
+
+    if request.content_length is None or request.content_length > max_body_bytes:
+        return None
+
+    return hashlib.sha256(request.get_data(cache=True)).hexdigest()
+
+
+def _replay(stored, fingerprint):
+    """Return the stored response, or a 422 if it was for a different request body."""
+
+    if stored["fingerprint"] != fingerprint:
+        return (
+            jsonify(
+                {"error": "Idempotency-Key was already used for a different request"}
+            ),
+            422,
+        )
+
+    response = current_app.response_class(
+        stored["body"],
+        status=stored["status"],
+        content_type=stored["content_type"],
+    )
+    response.headers["Idempotent-Replayed"] = "true"
+
+    return response
+
+
+def idempotent(store, max_body_bytes):
+    """Decorator to make a route idempotent for requests with an `Idempotency-Key`.
+
+    A retry of a request whose response is stored gets that response instead
+    of being handled again, and reusing a key for a different request body is
+    an error. The view stores its response by calling `store.claim` in the
+    transaction that does its work; responses it doesn't claim (e.g. errors
+    returned before any work was done) aren't stored, so retrying those
+    handles the request again. Must be used after `jwt_required`.
+    """
+
+    def decorator(f):
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            idempotency_key = request.headers.get("Idempotency-Key")
+            if not idempotency_key:
+                return f(*args, **kwargs)
+
+            if len(idempotency_key) > MAX_KEY_LENGTH:
+                return (
+                    jsonify(
+                        {
+                            "error": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"
+                        }
+                    ),
+                    400,
+                )
+
+            user_id = g.jwt_payload["user_id"]
+            fingerprint = _fingerprint(max_body_bytes)
+
+            with DBService() as db:
+                stored = store.get(db, user_id, idempotency_key)
+
+            if stored is not None:
+                return _replay(stored, fingerprint)
+
+            g.idempotency_key = (user_id, idempotency_key, fingerprint)
+            try:
+                return f(*args, **kwargs)
+            except IdempotencyReplay as e:
+                return _replay(e.stored, fingerprint)
+            except IdempotencyConflict:
+                return (
+                    jsonify(
+                        {"error": "A request with this Idempotency-Key is in progress"}
+                    ),
+                    409,
+                )
+
+        return wrapper
+
+    return decorator
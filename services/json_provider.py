@@ -0,0 +1,119 @@
+import json
+import math
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+from services.timing_service import timed
+
+
+class RawJSON:
+    """Already-serialized JSON (str or bytes) to embed in a response as is.
+
+    Used for JSON that is stored serialized, such as a record's
+    `operation_response`, so it doesn't need to be parsed only to be
+    serialized again.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+
+        self.data = data
+
+
+def _null_non_finite(obj):
+    """Return `obj` with NaN and infinite floats replaced by None, as orjson does."""
+
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _null_non_finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_null_non_finite(value) for value in obj]
+
+    return obj
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's default JSON provider, recording serialization time per request."""
+
+    @staticmethod
+    def default(o):
+
+        # The standard library can't embed raw JSON, so it's parsed instead
+        if isinstance(o, RawJSON):
+            return json.loads(o.data)
+
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+
+        with timed("serialize"):
+            return super().dumps(obj, **kwargs)
+
+
+class OrjsonJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, recording serialization time per request.
+
+    Produces the same output as Flask's default provider (sorted keys,
+    Decimals as strings, dates as HTTP dates), but serializes several times
+    faster and writes `RawJSON` into responses without re-parsing it.
+
+    orjson only handles 64-bit integers, so anything it can't serialize
+    (e.g. a very large multiplication result) falls back to the standard
+    library, configured to match orjson's output (UTF-8 rather than
+    escaped, NaN and infinities as null). Parsing is left to the standard library too, as orjson reads
+    large integers as floats.
+    """
+
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    @staticmethod
+    def default(o):
+
+        if isinstance(o, RawJSON):
+            return orjson.Fragment(o.data)
+
+        return DefaultJSONProvider.default(o)
+
+    def _dumps_bytes(self, obj, indent=False):
+
+        option = self.OPTIONS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+
+        with timed("serialize"):
+            try:
+                return orjson.dumps(obj, default=self.default, option=option)
+            except orjson.JSONEncodeError:
+                return json.dumps(
+                    _null_non_finite(obj),
+                    default=lambda o: _null_non_finite(TimedJSONProvider.default(o)),
+                    ensure_ascii=False,
+                    sort_keys=self.sort_keys,
+                    indent=2 if indent else None,
+                    separators=None if indent else (",", ":"),
+                ).encode("utf-8")
+
+    def dumps(self, obj, **kwargs):
+
+        return self._dumps_bytes(obj, indent=bool(kwargs.get("indent"))).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+
+        return self._app.response_class(
+            self._dumps_bytes(obj, indent) + b"\n", mimetype=self.mimetype
+        )
+
+
+# Providers that can be selected with JSON_PROVIDER
+JSON_PROVIDERS = {
+    "orjson": OrjsonJSONProvider,
+    "default": TimedJSONProvider,
+}
@@ -0,0 +1,187 @@
+import json
+import os
+import functools
+from datetime import datetime, timedelta, UTC
+
+from jwt.algorithms import get_default_algorithms
+
+from config import JWT_KEYSET_PATH, JWT_KEY_VERIFY_GRACE_DAYS
+
+
+class JWTKey:
+    """A single signing/verification key from a JWT key set.
+
+    The key objects are parsed once, when the key set is loaded, and reused
+    for every token signed or verified with this key.
+    """
+
+    def __init__(
+        self,
+        kid,
+        algorithm,
+        verifying_key,
+        signing_key=None,
+        not_before=None,
+        not_after=None,
+        verify_until=None,
+    ):
+        self.kid = kid
+        self.algorithm = algorithm
+        self.verifying_key = verifying_key
+        self.signing_key = signing_key
+        self.not_before = not_before
+        self.not_after = not_after
+
+        # Tokens signed with this key stay valid for a while after the key
+        # stops being used for signing, so rotation never invalidates them
+        if verify_until is None and not_after is not None:
+            verify_until = not_after + timedelta(days=JWT_KEY_VERIFY_GRACE_DAYS)
+        self.verify_until = verify_until
+
+    def can_sign(self, now):
+        """Return True if new tokens may be signed with this key at `now`."""
+
+        return (
+            self.signing_key is not None
+            and (self.not_before is None or self.not_before <= now)
+            and (self.not_after is None or now < self.not_after)
+        )
+
+    def can_verify(self, now):
+        """Return True if tokens signed with this key are still accepted at `now`."""
+
+        return (self.not_before is None or self.not_before <= now) and (
+            self.verify_until is None or now < self.verify_until
+        )
+
+    def to_jwk(self):
+        """Return the public part of the key as a JWK dictionary."""
+
+        jwk = get_default_algorithms()[self.algorithm].to_jwk(
+            self.verifying_key, as_dict=True
+        )
+
+        return jwk | {"kid": self.kid, "alg": self.algorithm, "use": "sig"}
+
+
+class JWTKeySet:
+    """A set of asymmetric JWT keys supporting rotation.
+
+    New tokens are signed with the newest key currently in its signing window
+    and carry that key's ID in the `kid` header. Tokens are verified with the
+    key named by their `kid`, for as long as that key's verification window
+    (which overlaps the next key's signing window) is open.
+    """
+
+    def __init__(self, keys):
+
+        self.keys = {key.kid: key for key in keys}
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a key set from a JSON file.
+
+        The file holds a list of keys under "keys". Each key has a "kid", an
+        "alg" (e.g. "EdDSA" or "RS256"), a "public_key_path", and optionally a
+        "private_key_path" (keys without one are only used for verification)
+        and "not_before"/"not_after"/"verify_until" ISO 8601 timestamps.
+        Key paths are relative to the key set file.
+        """
+
+        base_dir = os.path.dirname(os.path.abspath(path))
+        with open(path) as f:
+            config = json.load(f)
+
+        keys = []
+        for key_config in config["keys"]:
+            algorithm = get_default_algorithms()[key_config["alg"]]
+
+            signing_key = None
+            if key_config.get("private_key_path"):
+                signing_key = algorithm.prepare_key(
+                    _read_file(base_dir, key_config["private_key_path"])
+                )
+
+            keys.append(
+                JWTKey(
+                    kid=key_config["kid"],
+                    algorithm=key_config["alg"],
+                    verifying_key=algorithm.prepare_key(
+                        _read_file(base_dir, key_config["public_key_path"])
+                    ),
+                    signing_key=signing_key,
+                    not_before=_parse_timestamp(key_config.get("not_before")),
+                    not_after=_parse_timestamp(key_config.get("not_after")),
+                    verify_until=_parse_timestamp(key_config.get("verify_until")),
+                )
+            )
+
+        return cls(keys)
+
+    def signing_key(self, now=None):
+        """Return the key to sign new tokens with."""
+
+        now = now or datetime.now(UTC)
+        candidates = [key for key in self.keys.values() if key.can_sign(now)]
+
+        if not candidates:
+            raise LookupError("No JWT signing key is currently valid")
+
+        return max(
+            candidates,
+            key=lambda key: key.not_before or datetime.min.replace(tzinfo=UTC),
+        )
+
+    def verifying_key(self, kid, now=None, include_retired=False):
+        """Return the key for verifying tokens with the given `kid`, if still valid.
+
+        With `include_retired`, keys whose verification window has closed are
+        returned too, for credentials (like admin API keys) that stay valid
+        for as long as they are stored.
+        """
+
+        key = self.keys.get(kid)
+        if key is None:
+            return None
+
+        if not include_retired and not key.can_verify(now or datetime.now(UTC)):
+            return None
+
+        return key
+
+    def jwks(self, now=None):
+        """Return the currently valid public keys as a JWK set."""
+
+        now = now or datetime.now(UTC)
+
+        return {
+            "keys": [key.to_jwk() for key in self.keys.values() if key.can_verify(now)]
+        }
+
+
+def _read_file(base_dir, path):
+
+    with open(os.path.join(base_dir, path), "rb") as f:
+        return f.read()
+
+
+def _parse_timestamp(value):
+
+    if value is None:
+        return None
+
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=UTC)
+
+    return timestamp
+
+
+@functools.cache
+def default_keyset():
+    """Return the key set configured with JWT_KEYSET_PATH, loaded once per process."""
+
+    if not JWT_KEYSET_PATH:
+        return None
+
+    return JWTKeySet.from_file(JWT_KEYSET_PATH)
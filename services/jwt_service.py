@@ -1,11 +1,20 @@
+import uuid
+import hashlib
 import functools
 from datetime import datetime, timedelta, UTC
 
 import jwt
-from flask import request, jsonify
+from flask import g, request, jsonify
 
 from services.db_service import DBService
-from config import JWT_SECRET, JWT_ALGORITHM, JWT_EXPIRATION_HOURS
+from services.timing_service import timed
+from services.jwt_key_service import default_keyset
+from config import (
+    JWT_SECRET,
+    JWT_ALGORITHM,
+    JWT_EXPIRATION_HOURS,
+    JWT_REFRESH_EXPIRATION_DAYS,
+)
 
 
 class JWTService:
@@ -16,10 +25,31 @@ class JWTService:
         secret_key=JWT_SECRET,
         algorithm=JWT_ALGORITHM,
         expiration_hours=JWT_EXPIRATION_HOURS,
+        refresh_expiration_days=JWT_REFRESH_EXPIRATION_DAYS,
+        keyset=None,
     ):
         self.secret_key = secret_key
         self.algorithm = algorithm
         self.expiration_hours = expiration_hours
+        self.refresh_expiration_days = refresh_expiration_days
+        self.keyset = keyset or default_keyset()
+
+        if not self.secret_key and not self.keyset:
+            raise ValueError("Either JWT_SECRET or JWT_KEYSET_PATH must be set.")
+
+    def _encode(self, payload):
+        """Sign the payload with the current key set key, or the shared secret."""
+
+        if self.keyset:
+            key = self.keyset.signing_key()
+            return jwt.encode(
+                payload,
+                key.signing_key,
+                algorithm=key.algorithm,
+                headers={"kid": key.kid},
+            )
+
+        return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
 
     def generate_token(self, user_id):
         """Generate a JWT token for the provided user ID."""
@@ -29,10 +59,31 @@ class JWTService:
             "exp": datetime.now(UTC) + timedelta(hours=self.expiration_hours),
         }
 
-        return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+        return self._encode(payload)
+
+    def generate_refresh_token(self, user_id):
+        """Generate a long-lived refresh token for the provided user ID.
+
+        Refresh tokens can only be exchanged for new tokens at `/auth/refresh`.
+        Each carries a unique ID (`jti`) so it can be revoked once used.
+        """
+
+        payload = {
+            "user_id": user_id,
+            "type": "refresh",
+            "jti": uuid.uuid4().hex,
+            "exp": datetime.now(UTC) + timedelta(days=self.refresh_expiration_days),
+        }
+
+        return self._encode(payload)
 
     def generate_admin_token(self, created_by, description):
-        """Generate a JWT token for an admin API key."""
+        """Generate a JWT token for an admin API key.
+
+        Admin keys don't expire. They are valid for as long as their hash is
+        stored in `admin_key`, even after the key that signed them is rotated
+        out (as long as its public key stays in the key set).
+        """
 
         payload = {
             "role": "admin",
@@ -40,18 +91,56 @@ class JWTService:
             "description": description,
         }
 
-        return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+        return self._encode(payload)
+
+    def verify_token(self, token, include_retired_keys=False):
+        """Verify the provided token and return the decoded payload.
 
-    def verify_token(self, token):
-        """Verify the provided token and return the decoded payload."""
+        Tokens signed with a key set key are rejected once the key's
+        verification window has closed, unless `include_retired_keys` is set.
+        """
         
         try:
+            kid = jwt.get_unverified_header(token).get("kid")
+
+            if kid is not None:
+                # Signed with a key from the key set
+                key = (
+                    self.keyset.verifying_key(
+                        kid, include_retired=include_retired_keys
+                    )
+                    if self.keyset
+                    else None
+                )
+                if key is None:
+                    return {"error": "Invalid token"}
+
+                return jwt.decode(token, key.verifying_key, algorithms=[key.algorithm])
+
+            if not self.secret_key:
+                return {"error": "Invalid token"}
+
             return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
         except jwt.ExpiredSignatureError:
             return {"error": "Token has expired"}
         except jwt.InvalidTokenError:
             return {"error": "Invalid token"}
 
+    def verify_refresh_token(self, token):
+        """Verify the provided refresh token and return the decoded payload."""
+
+        decoded = self.verify_token(token)
+        if "error" not in decoded and decoded.get("type") != "refresh":
+            return {"error": "Invalid token"}
+
+        return decoded
+
+
+def hash_api_key(api_key):
+    """Return the hash an admin API key is stored and looked up by."""
+
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
 
 def jwt_required(f):
     """Decorator to require a valid user JWT token for a route."""
@@ -64,10 +153,18 @@ def jwt_required(f):
 
         token = auth_header.split(" ")[1]
 
-        decoded = JWTService().verify_token(token)
+        with timed("auth"):
+            decoded = JWTService().verify_token(token)
+
         if "error" in decoded:
             return jsonify(decoded), 401
 
+        # Refresh tokens may only be used to obtain new tokens
+        if decoded.get("type") == "refresh":
+            return jsonify({"error": "Invalid token"}), 401
+
+        g.jwt_payload = decoded
+
         return f(*args, **kwargs)
 
     return wrapper
@@ -84,10 +181,20 @@ def admin_protected(f):
 
         token = auth_header.split(" ")[1]
 
-        decoded = JWTService().verify_token(token)
+        # Admin keys are checked against `admin_key` below, so they are still
+        # accepted after the key that signed them is retired
+        with timed("auth"):
+            decoded = JWTService().verify_token(token, include_retired_keys=True)
+
         if "error" in decoded:
             return jsonify(decoded), 401
 
+        # Refresh tokens may only be used to obtain new tokens
+        if decoded.get("type") == "refresh":
+            return jsonify({"error": "Invalid token"}), 401
+
+        g.jwt_payload = decoded
+
         if "role" not in decoded or decoded["role"] != "admin":
             return (
                 jsonify(
@@ -98,14 +205,14 @@ def admin_protected(f):
                 403,
             )
 
-        with DBService() as db:
+        with timed("admin_key"), DBService() as db:
             results = db.fetch_records(
                 "admin_key",
-                conditions={"api_key": token, "deleted": False},
+                conditions={"api_key_hash": hash_api_key(token), "deleted": False},
             )
 
-            if not results:
-                return jsonify({"error": "Invalid or inactive API key."}), 401
+        if not results:
+            return jsonify({"error": "Invalid or inactive API key."}), 401
 
         return f(*args, **kwargs)
 
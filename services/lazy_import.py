@@ -0,0 +1,47 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """A stand-in for a module that is only imported when first used.
+
+    Heavy dependencies that only some routes need (e.g. `requests` for
+    random strings) are imported through this so they don't add to the cold
+    start of every Lambda invocation:
+
+        requests = LazyModule("requests")
+
+    The real module is imported on the first attribute access.
+    """
+
+    def __init__(self, name):
+
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+
+        module = self.__dict__["_module"]
+        if module is None:
+            with self.__dict__["_lock"]:
+                module = self.__dict__["_module"]
+                if module is None:
+                    module = importlib.import_module(self.__dict__["_name"])
+                    self.__dict__["_module"] = module
+
+        return module
+
+    @property
+    def is_loaded(self):
+
+        return self.__dict__["_module"] is not None
+
+    def __getattr__(self, attr):
+
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<LazyModule '{self.__dict__['_name']}' ({state})>"
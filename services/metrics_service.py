@@ -0,0 +1,418 @@
+import abc
+import math
+import time
+import bisect
+import weakref
+import threading
+
+from flask import g, request
+
+
+# Default histogram buckets, in seconds
+DEFAULT_LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Default histogram buckets for row counts
+DEFAULT_ROW_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000)
+
+
+class _ShardOwner:
+    """Held only by a thread's thread-local, so it is freed when the thread exits."""
+
+
+class _Sharded:
+    """Base class for metrics whose values are kept in per-thread shards.
+
+    Each thread updates its own list of values, so recording a metric never
+    takes a lock or contends with other threads. Shards are only summed when
+    the metric is read. When a thread exits its shard is folded into a base
+    total, so short-lived threads don't leave shards behind.
+    """
+
+    def __init__(self, size):
+
+        self._size = size
+        self._local = threading.local()
+        self._base = [0] * size
+        self._shards = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = [0] * self._size
+            owner = _ShardOwner()
+            with self._lock:
+                self._shards[id(owner)] = shard
+
+            weakref.finalize(owner, self._retire, id(owner))
+            self._local.owner = owner
+            self._local.shard = shard
+            return shard
+
+    def _retire(self, key):
+
+        with self._lock:
+            shard = self._shards.pop(key)
+            for i, value in enumerate(shard):
+                self._base[i] += value
+
+    def _totals(self):
+
+        with self._lock:
+            totals = list(self._base)
+            shards = list(self._shards.values())
+
+        for shard in shards:
+            for i, value in enumerate(shard):
+                totals[i] += value
+
+        return totals
+
+
+class Counter(_Sharded):
+    """A monotonically increasing count."""
+
+    def __init__(self):
+
+        super().__init__(1)
+
+    def inc(self, amount=1):
+        """Increase the counter by `amount`."""
+
+        self._shard()[0] += amount
+
+    @property
+    def value(self):
+
+        return self._totals()[0]
+
+
+class Histogram(_Sharded):
+    """A fixed-bucket histogram of observed values."""
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+
+        self.buckets = tuple(sorted(buckets))
+
+        # One count per bucket, plus a final overflow (+Inf) bucket, the sum
+        # of observed values and the number of observations
+        super().__init__(len(self.buckets) + 3)
+
+    def observe(self, value):
+        """Record a single observed value."""
+
+        shard = self._shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    def snapshot(self):
+        """Return the cumulative bucket counts, sum and count of the histogram."""
+
+        totals = self._totals()
+
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip(self.buckets + ("+Inf",), totals):
+            running += bucket_count
+            cumulative[bound] = running
+
+        return {"buckets": cumulative, "sum": totals[-2], "count": totals[-1]}
+
+
+class _Family(abc.ABC):
+    """A set of metrics of the same kind, keyed by label value(s)."""
+
+    def __init__(self, labels):
+
+        # A single label name, or a tuple of label names
+        self.label = labels
+        self.metrics = {}
+
+        self._lock = threading.Lock()
+
+    @property
+    def label_names(self):
+
+        return self.label if isinstance(self.label, tuple) else (self.label,)
+
+    @abc.abstractmethod
+    def _new_metric(self):
+        """Return a new, empty metric for a label value."""
+
+    def labels(self, value):
+        """Return the metric for the given label value(s), creating it if needed."""
+
+        metric = self.metrics.get(value)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.get(value)
+                if metric is None:
+                    metric = self._new_metric()
+                    self.metrics = self.metrics | {value: metric}
+
+        return metric
+
+    def clear(self):
+        """Drop every metric in the family."""
+
+        with self._lock:
+            self.metrics = {}
+
+
+class CounterFamily(_Family):
+    """A set of counters keyed by label value(s)."""
+
+    def _new_metric(self):
+
+        return Counter()
+
+    def inc(self, value, amount=1):
+        """Increase the counter for the given label value(s)."""
+
+        self.labels(value).inc(amount)
+
+    def snapshot(self):
+        """Return the value of every counter in the family, keyed by label value(s)."""
+
+        return {value: counter.value for value, counter in self.metrics.items()}
+
+
+class HistogramFamily(_Family):
+    """A set of histograms sharing buckets, keyed by label value(s)."""
+
+    def __init__(self, label, buckets=DEFAULT_LATENCY_BUCKETS):
+
+        super().__init__(label)
+        self.buckets = buckets
+
+    @property
+    def histograms(self):
+
+        return self.metrics
+
+    def _new_metric(self):
+
+        return Histogram(self.buckets)
+
+    def observe(self, value, amount):
+        """Record an observation against the histogram for the given label value(s)."""
+
+        self.labels(value).observe(amount)
+
+    def snapshot(self):
+        """Return a snapshot of every histogram in the family, keyed by label value(s)."""
+
+        return {value: histogram.snapshot() for value, histogram in self.metrics.items()}
+
+
+# METRICS REGISTRY
+#
+# Metrics exposed at `/metrics`. Gauges are read from callbacks at scrape
+# time, returning either a single value or a dict of {label value(s): value}.
+
+_registry = []
+_caches = {}
+
+
+def register(name, help_text, metric):
+    """Expose a counter or histogram (or a family of them) under `name`."""
+
+    _registry.append((name, help_text, metric))
+
+    return metric
+
+
+def register_gauge(name, help_text, labels, callback):
+    """Expose the value(s) returned by `callback` as a gauge under `name`."""
+
+    _registry.append((name, help_text, _Gauge(labels, callback)))
+
+
+def register_cache(name, stats):
+    """Expose hit/miss statistics for a cache; `stats` returns hits, misses and size."""
+
+    _caches[name] = stats
+
+
+class _Gauge:
+
+    def __init__(self, labels, callback):
+
+        self.label = labels
+        self.callback = callback
+
+
+def _cache_stat(stat):
+
+    return lambda: {name: stats()[stat] for name, stats in _caches.items()}
+
+
+def _format_labels(names, values, extra=None):
+
+    if not isinstance(values, tuple):
+        values = (values,)
+
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+
+    if not pairs:
+        return ""
+
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _render_histogram(lines, name, labels, values, snapshot):
+
+    for bound, count in snapshot["buckets"].items():
+        le = bound if bound == "+Inf" else _format_value(float(bound))
+        lines.append(f"{name}_bucket{_format_labels(labels, values, ('le', le))} {count}")
+
+    lines.append(f"{name}_sum{_format_labels(labels, values)} {_format_value(snapshot['sum'])}")
+    lines.append(f"{name}_count{_format_labels(labels, values)} {snapshot['count']}")
+
+
+def render_prometheus():
+    """Render every registered metric in the Prometheus text exposition format."""
+
+    lines = []
+    for name, help_text, metric in _registry:
+
+        if isinstance(metric, (Histogram, HistogramFamily)):
+            kind = "histogram"
+        elif isinstance(metric, (Counter, CounterFamily)):
+            kind = "counter"
+        else:
+            kind = "gauge"
+
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+        if isinstance(metric, Histogram):
+            _render_histogram(lines, name, (), (), metric.snapshot())
+
+        elif isinstance(metric, HistogramFamily):
+            for values, snapshot in metric.snapshot().items():
+                _render_histogram(lines, name, metric.label_names, values, snapshot)
+
+        elif isinstance(metric, Counter):
+            lines.append(f"{name} {metric.value}")
+
+        elif isinstance(metric, CounterFamily):
+            for values, value in metric.snapshot().items():
+                lines.append(f"{name}{_format_labels(metric.label_names, values)} {value}")
+
+        else:
+            result = metric.callback()
+            if not isinstance(result, dict):
+                lines.append(f"{name} {_format_value(result)}")
+                continue
+
+            names = metric.label if isinstance(metric.label, tuple) else (metric.label,)
+            for values, value in result.items():
+                lines.append(f"{name}{_format_labels(names, values)} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def init_request_metrics(app):
+    """Register hooks that count and time every request, by blueprint."""
+
+    @app.before_request
+    def start_request_metrics():
+
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+
+        if "metrics_start" in g:
+            blueprint = request.blueprint or "app"
+
+            http_request_seconds.observe(blueprint, time.perf_counter() - g.metrics_start)
+            http_requests.inc((blueprint, str(response.status_code)))
+
+        return response
+
+
+# HTTP METRICS, keyed by blueprint (e.g. "auth", "calculation")
+http_requests = register(
+    "http_requests_total",
+    "Requests handled, by blueprint and status code.",
+    CounterFamily(("blueprint", "status")),
+)
+http_request_seconds = register(
+    "http_request_duration_seconds",
+    "Request latency, by blueprint.",
+    HistogramFamily("blueprint"),
+)
+
+# DATABASE METRICS, keyed by normalized statement fingerprint
+db_query_seconds = register(
+    "db_query_duration_seconds",
+    "Database statement latency, by statement fingerprint.",
+    HistogramFamily("fingerprint"),
+)
+db_query_rows = register(
+    "db_query_rows",
+    "Rows returned or affected per statement, by statement fingerprint.",
+    HistogramFamily("fingerprint", buckets=DEFAULT_ROW_BUCKETS),
+)
+
+# AUTH METRICS
+password_verify_seconds = register(
+    "password_verify_duration_seconds",
+    "Time spent verifying password hashes, including time queued.",
+    Histogram(),
+)
+
+# CALCULATOR METRICS
+calculator_operations = register(
+    "calculator_operations_total",
+    "Calculations run, by operation and outcome.",
+    CounterFamily(("operation", "outcome")),
+)
+random_source_seconds = register(
+    "random_source_duration_seconds",
+    "Latency of requests to the random string source (random.org).",
+    Histogram(),
+)
+
+# CACHE METRICS
+register_gauge("cache_hits", "Cache hits, by cache.", "cache", _cache_stat("hits"))
+register_gauge("cache_misses", "Cache misses, by cache.", "cache", _cache_stat("misses"))
+register_gauge("cache_size", "Entries held, by cache.", "cache", _cache_stat("size"))
+register_gauge(
+    "cache_hit_ratio",
+    "Cache hit ratio, by cache.",
+    "cache",
+    _cache_stat("hit_rate"),
+)
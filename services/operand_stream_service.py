@@ -0,0 +1,184 @@
+from flask import request
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+from services.lazy_import import LazyModule
+
+# Only needed for large calculation bodies, so imported on first use
+ijson = LazyModule("ijson")
+
+
+class LimitedReader:
+    """File-like wrapper that fails once more than `max_bytes` have been read.
+
+    Unlike checking the Content-Length header, this also limits bodies sent
+    without one (e.g. with chunked transfer encoding).
+    """
+
+    def __init__(self, stream, max_bytes):
+
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+
+        # Some streams treat an empty read as the client disconnecting
+        if size == 0:
+            return b""
+
+        # Never read more than one byte past the limit
+        remaining = self.max_bytes + 1 - self.bytes_read
+        data = self.stream.read(remaining if size < 0 else min(size, remaining))
+
+        self.bytes_read += len(data)
+        if self.bytes_read > self.max_bytes:
+            raise RequestEntityTooLarge()
+
+        return data
+
+
+def limit_request_body(max_bytes):
+    """Reject the current request with a 413 if its body is over `max_bytes`.
+
+    Bodies declaring a larger Content-Length are rejected straight away.
+    Others are rejected once more than `max_bytes` of them have been read,
+    however they're read (`request.get_json()`, `request.get_data()` or
+    `request.stream`).
+    """
+
+    if (request.content_length or 0) > max_bytes:
+        raise RequestEntityTooLarge()
+
+    request.stream = LimitedReader(request.stream, max_bytes)
+
+
+class StreamedCalculationRequest:
+    """A calculation request body that is parsed as it is read.
+
+    The body is only read as far as needed: `read_operation` stops at the
+    "operation" field, and `operands` then yields the operands one at a time
+    as they are parsed, so they never need to be in memory together and
+    invalid input is rejected without reading the rest of the body.
+
+    Operands sent before the "operation" field have to be kept until the
+    operation is known, so clients sending very large bodies should send
+    "operation" first. `finish` then reads the rest of the body, so a body
+    with trailing data is rejected like it would be if parsed whole.
+    """
+
+    def __init__(self, stream, max_bytes):
+
+        self.operation = None
+        self.operand_count = 0
+
+        # Numbers are parsed as floats and ints (not Decimals), so integers
+        # must fit in 64 bits: larger ones fail with an "integer overflow"
+        # parse error (a 400), unlike in bodies parsed whole
+        self._fields = self._parse_fields(
+            ijson.parse(LimitedReader(stream, max_bytes), use_float=True)
+        )
+        self._buffered = []
+        self._has_operands = False
+        self._operands_done = False
+
+    def _parse_fields(self, events):
+        """Yield ("operation", value), ("operand", value) and ("operands_end", None)."""
+
+        seen = set()
+        try:
+            for prefix, event, value in events:
+                # A body parsed whole keeps the last of repeated fields, which
+                # can't be done once the first has been used, so they're refused
+                if prefix == "" and event == "map_key":
+                    if value in seen and value in ("operation", "operands"):
+                        raise BadRequest(f"Field '{value}' is given more than once")
+                    seen.add(value)
+
+                elif prefix == "operation":
+                    yield "operation", value
+
+                elif prefix == "operands":
+                    if event == "start_array":
+                        self._has_operands = True
+                    elif event == "end_array":
+                        yield "operands_end", None
+                    else:
+                        raise BadRequest("Field 'operands' must be an array")
+
+                elif prefix == "operands.item":
+                    # Objects and arrays (e.g. random string options) are
+                    # built whole, so only numbers are streamed one at a time
+                    if event in ("start_map", "start_array"):
+                        yield "operand", self._build_item(events, event, value)
+                    else:
+                        yield "operand", value
+
+        except ijson.JSONError as e:
+            raise BadRequest(f"Failed to decode JSON body: {e}")
+
+    @staticmethod
+    def _build_item(events, event, value):
+        """Build an object or array operand from the events that make it up."""
+
+        builder = ijson.ObjectBuilder()
+        builder.event(event, value)
+
+        depth = 1
+        for _, event, value in events:
+            builder.event(event, value)
+
+            if event in ("start_map", "start_array"):
+                depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+                if not depth:
+                    break
+
+        return builder.value
+
+    def read_operation(self):
+        """Read the body up to the "operation" field and return its value.
+
+        Raises a KeyError if the body has no "operation" field.
+        """
+
+        for field, value in self._fields:
+            if field == "operation":
+                self.operation = value
+                return value
+
+            if field == "operand":
+                self._buffered.append(value)
+            elif field == "operands_end":
+                self._operands_done = True
+
+        raise KeyError("operation")
+
+    def operands(self):
+        """Yield the operands as they are parsed, counting them.
+
+        Raises a ValueError once exhausted if the body has no "operands" field.
+        """
+
+        buffered, self._buffered = self._buffered, []
+        for value in buffered:
+            self.operand_count += 1
+            yield value
+
+        if not self._operands_done:
+            for field, value in self._fields:
+                if field == "operand":
+                    self.operand_count += 1
+                    yield value
+                elif field == "operands_end":
+                    self._operands_done = True
+                    break
+
+        if not self._has_operands:
+            raise ValueError("Field 'operands' is required")
+
+    def finish(self):
+        """Read the rest of the body, rejecting it if anything after the operands is invalid."""
+
+        for _ in self._fields:
+            pass
@@ -0,0 +1,88 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE
+from services.metrics_service import password_verify_seconds
+
+
+class PasswordQueueFullError(Exception):
+    """Raised when too many password hashing operations are already waiting."""
+
+
+class PasswordService:
+    """Service class for hashing and verifying passwords with bcrypt.
+
+    Hashing runs on a small, bounded pool of worker threads rather than on
+    the request thread. This caps how much CPU a burst of logins can use, and
+    once `max_queue` operations are waiting for a worker, further requests
+    are turned away with a `PasswordQueueFullError` instead of piling up.
+    """
+
+    def __init__(
+        self,
+        rounds=BCRYPT_ROUNDS,
+        max_workers=PASSWORD_HASH_WORKERS,
+        max_queue=PASSWORD_HASH_MAX_QUEUE,
+    ):
+        self.rounds = rounds
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="password-hash",
+        )
+
+        # One slot per running or waiting operation
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def _run(self, fn, *args):
+        """Run `fn` on the worker pool and wait for its result."""
+
+        if not self._slots.acquire(blocking=False):
+            raise PasswordQueueFullError("Too many password operations in progress")
+
+        def run_and_release():
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        try:
+            future = self.executor.submit(run_and_release)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        return future.result()
+
+    def verify(self, password, hashed):
+        """Check a plain-text password against a stored bcrypt hash."""
+
+        start = time.perf_counter()
+        try:
+            return self._run(
+                bcrypt.checkpw, password.encode("utf-8"), hashed.encode("utf-8")
+            )
+        finally:
+            password_verify_seconds.observe(time.perf_counter() - start)
+
+    def hash(self, password):
+        """Hash a plain-text password with the configured work factor."""
+
+        hashed = self._run(
+            bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt(self.rounds)
+        )
+
+        return hashed.decode("utf-8")
+
+    def needs_rehash(self, hashed):
+        """Return True if the hash was created with a different work factor.
+
+        bcrypt hashes look like `$2b$<rounds>$<salt and hash>`.
+        """
+
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
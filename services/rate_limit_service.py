@@ -0,0 +1,153 @@
+import math
+import time
+import hashlib
+import threading
+import functools
+from collections import OrderedDict
+
+from flask import g, jsonify, request
+
+
+class InMemoryBucketStore:
+    """Token bucket storage kept in process memory.
+
+    Each active key costs a single small entry. Keys that have been idle long
+    enough for their bucket to refill completely are evicted, since a full
+    bucket is indistinguishable from a missing one. A store shared between
+    processes only needs to provide the same `take` method.
+    """
+
+    # Smallest store size at which every bucket is checked for eviction
+    MIN_SWEEP_KEYS = 1024
+
+    def __init__(self, max_keys=100_000):
+
+        self.max_keys = max_keys
+
+        # key -> [tokens, last refill time, time at which the bucket is full],
+        # least recently used first
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Every bucket is checked once the store grows to this many keys
+        self._sweep_at = self.MIN_SWEEP_KEYS
+
+    def take(self, key, capacity, refill_rate, cost=1, now=None):
+        """Take `cost` tokens from the bucket for `key`.
+
+        Returns a tuple of (allowed, retry_after), where `retry_after` is the
+        number of seconds until enough tokens are available when not allowed.
+        """
+
+        now = time.monotonic() if now is None else now
+
+        with self._lock:
+            self._evict_idle(now)
+
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+
+            if tokens >= cost:
+                tokens -= cost
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (cost - tokens) / refill_rate
+
+            full_at = now + (capacity - tokens) / refill_rate
+            self._buckets[key] = [tokens, now, full_at]
+            self._buckets.move_to_end(key)
+
+            if len(self._buckets) >= self._sweep_at:
+                self._sweep(now)
+
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed, retry_after
+
+    def _evict_idle(self, now):
+        """Drop full buckets from the least recently used end of the store."""
+
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket[2] > now:
+                break
+
+            del self._buckets[key]
+
+    def _sweep(self, now):
+        """Drop every full bucket, including those behind buckets still refilling.
+
+        `_evict_idle` stops at the first bucket that isn't full, so idle
+        buckets used after it would otherwise stay. Sweeps run each time the
+        store doubles in size, so they cost O(1) per request on average.
+        """
+
+        idle = [key for key, bucket in self._buckets.items() if bucket[2] <= now]
+        for key in idle:
+            del self._buckets[key]
+
+        self._sweep_at = max(self.MIN_SWEEP_KEYS, 2 * len(self._buckets))
+
+    def __len__(self):
+
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """Token bucket rate limiter.
+
+    Every key may make `capacity` requests in a burst, refilled at
+    `refill_rate` requests per second.
+    """
+
+    def __init__(self, capacity, refill_rate, store=None):
+
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.store = store if store is not None else InMemoryBucketStore()
+
+    def acquire(self, key, cost=1):
+        """Try to take `cost` tokens for `key`; returns (allowed, retry_after)."""
+
+        return self.store.take(key, self.capacity, self.refill_rate, cost)
+
+
+def rate_limit_key():
+    """Return the rate limiting key for the authenticated caller.
+
+    Users are limited by user ID and admin API keys by a digest of the key.
+    Must be used after `jwt_required` or `admin_protected`.
+    """
+
+    payload = g.jwt_payload
+    if "user_id" in payload:
+        return f"user:{payload['user_id']}"
+
+    token = request.headers["Authorization"].split(" ")[1]
+    return f"admin:{hashlib.sha256(token.encode('utf-8')).hexdigest()[:32]}"
+
+
+def rate_limited(limiter):
+    """Decorator to rate limit a route per authenticated caller."""
+
+    def decorator(f):
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            allowed, retry_after = limiter.acquire(rate_limit_key())
+            if not allowed:
+                return (
+                    jsonify({"error": "Too many requests"}),
+                    429,
+                    {"Retry-After": str(math.ceil(retry_after))},
+                )
+
+            return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
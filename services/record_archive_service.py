@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+from config import RECORD_ARCHIVE_ENABLED, RECORD_ARCHIVE_CACHE_TTL_SECONDS
+from services.cache_service import TTLCache
+from services.metrics_service import register_cache
+
+
+# Records older than the retention window are moved here, a month at a time,
+# by `scripts/rotate_record_partitions.py`
+ARCHIVE_TABLE = "record_archive"
+
+# Holds a single row with the boundary date: records before it are read from
+# the archive, and records from it on from `record`
+ARCHIVE_STATE_TABLE = "record_archive_state"
+
+_boundary_cache = TTLCache(maxsize=1, ttl=RECORD_ARCHIVE_CACHE_TTL_SECONDS)
+register_cache("record_archive_boundary", _boundary_cache.stats)
+
+_NOT_CACHED = object()
+
+# The furthest any time zone is from UTC
+_MAX_UTC_OFFSET = timedelta(hours=14)
+
+
+def archived_before(db):
+    """Return the date before which records are read from the archive.
+
+    Returns None if the archive is disabled or nothing has been archived yet.
+    """
+
+    if not RECORD_ARCHIVE_ENABLED:
+        return None
+
+    boundary = _boundary_cache.get("archived_before", _NOT_CACHED)
+    if boundary is not _NOT_CACHED:
+        return boundary
+
+    rows = db.execute_query(
+        f"SELECT archived_before FROM {ARCHIVE_STATE_TABLE} LIMIT 1;",
+        read_only=True,
+    )
+    boundary = rows[0]["archived_before"] if rows else None
+
+    _boundary_cache.set("archived_before", boundary)
+
+    return boundary
+
+
+def needs_archive(boundary, start_date=None):
+    """Return True if records from `start_date` on may be in the archive.
+
+    `start_date` is a date string as accepted by MySQL; with no start date,
+    or one that can't be parsed, the archive is always needed.
+    """
+
+    if boundary is None:
+        return False
+
+    if not start_date:
+        return True
+
+    try:
+        start = datetime.fromisoformat(start_date)
+    except ValueError:
+        return True
+
+    # The boundary is naive, in the database session's time zone. A start
+    # date with an offset is compared in UTC, allowing for the session being
+    # in any time zone
+    if start.tzinfo is not None:
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+        return start - _MAX_UTC_OFFSET < boundary
+
+    return start < boundary
+
+
+def fetch_last_archived_record(db, user_id):
+    """Return the user's most recent archived calculation record, or None.
+
+    Used when the user has no records left in `record`, so that a user whose
+    records were all archived keeps their balance.
+    """
+
+    if archived_before(db) is None:
+        return None
+
+    records = db.fetch_records(
+        ARCHIVE_TABLE,
+        conditions={"user_id": user_id, "deleted": 0},
+        limit=1,
+        order_by="`date` DESC",
+        primary=True,
+    )
+
+    return records[0] if records else None
@@ -0,0 +1,92 @@
+import json
+import time
+import logging
+
+from flask import g, has_request_context, request
+
+from config import SERVER_TIMING_ENABLED
+
+
+timing_logger = logging.getLogger("request.timing")
+
+
+class timed:
+    """Context manager adding the time spent in its block to a request phase.
+
+    Time for the same phase is summed across a request (e.g. every database
+    query adds to "db"). Does nothing when request timing is disabled.
+    """
+
+    __slots__ = ("phase", "start")
+
+    def __init__(self, phase):
+
+        self.phase = phase
+        self.start = None
+
+    def __enter__(self):
+
+        if SERVER_TIMING_ENABLED:
+            self.start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, _, __, ___):
+
+        if self.start is not None:
+            add_timing(self.phase, time.perf_counter() - self.start)
+
+
+def add_timing(phase, seconds):
+    """Add `seconds` to the given phase of the current request's timings."""
+
+    if not SERVER_TIMING_ENABLED or not has_request_context():
+        return
+
+    timings = g.setdefault("server_timing", {})
+    timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+def init_request_timing(app):
+    """Register hooks that report per-phase request timings.
+
+    When SERVER_TIMING_ENABLED is set, every response gets a `Server-Timing`
+    header with the time spent in each phase (plus the request total) and a
+    structured log line is written to the `request.timing` logger.
+    """
+
+    @app.before_request
+    def start_request_timer():
+
+        if SERVER_TIMING_ENABLED:
+            g.request_start = time.perf_counter()
+
+    @app.after_request
+    def report_request_timing(response):
+
+        if not SERVER_TIMING_ENABLED or "request_start" not in g:
+            return response
+
+        timings = dict(g.get("server_timing", {}))
+        timings["total"] = time.perf_counter() - g.request_start
+
+        timings_ms = {phase: round(s * 1000, 3) for phase, s in timings.items()}
+
+        response.headers["Server-Timing"] = ", ".join(
+            f"{phase};dur={ms}" for phase, ms in timings_ms.items()
+        )
+
+        timing_logger.info(
+            json.dumps(
+                {
+                    "event": "request_timing",
+                    "route": request.endpoint,
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "timings_ms": timings_ms,
+                }
+            )
+        )
+
+        return response
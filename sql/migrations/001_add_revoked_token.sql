@@ -0,0 +1,9 @@
+-- Adds the refresh token revocation list used by `POST /auth/refresh`.
+USE calculator_service;
+
+CREATE TABLE IF NOT EXISTS revoked_token (
+    `jti` BINARY(16) NOT NULL,
+    `expires_at` TIMESTAMP NOT NULL,
+    PRIMARY KEY (jti),
+    INDEX `expires_at` (`expires_at`)
+);
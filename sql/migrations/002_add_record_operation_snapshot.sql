@@ -0,0 +1,21 @@
+-- Snapshots the operation type and the cost charged onto each record, so
+-- reading the calculation history and rebalancing after a deletion no
+-- longer need to join `operation` (whose cost may have changed since).
+USE calculator_service;
+
+ALTER TABLE record
+    ADD COLUMN `operation_type` VARCHAR(32) NULL AFTER `operation_id`,
+    ADD COLUMN `charged_cost` DECIMAL(15, 2) NULL AFTER `amount`;
+
+-- Backfill existing records. The cost actually charged wasn't stored, so
+-- the operation's current cost is the best available.
+UPDATE record r
+JOIN operation o ON o.id = r.operation_id
+SET
+    r.operation_type = o.`type`,
+    r.charged_cost = o.cost
+WHERE r.operation_type IS NULL;
+
+ALTER TABLE record
+    MODIFY COLUMN `operation_type` VARCHAR(32) NOT NULL,
+    MODIFY COLUMN `charged_cost` DECIMAL(15, 2) NOT NULL;
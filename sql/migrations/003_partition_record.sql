@@ -0,0 +1,34 @@
+-- Partitions `record` by month of `date` and adds the archive that
+-- `scripts/rotate_record_partitions.py` moves old partitions to.
+--
+-- Rebuilding `record` copies the whole table, so run this during a quiet
+-- period. Then run the rotation script, which splits `p_future` into
+-- monthly partitions.
+USE calculator_service;
+
+-- Partitioned tables can't have foreign keys, and every unique key must
+-- include the partitioning column
+ALTER TABLE record
+    DROP FOREIGN KEY `user_id`,
+    DROP FOREIGN KEY `operation_id`;
+
+ALTER TABLE record
+    MODIFY COLUMN `date` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (`id`, `date`),
+    ADD INDEX `user_date` (`user_id`, `date`),
+    DROP INDEX `user_id`;
+
+ALTER TABLE record
+    PARTITION BY RANGE (UNIX_TIMESTAMP(`date`)) (
+        PARTITION p_future VALUES LESS THAN MAXVALUE
+    );
+
+CREATE TABLE IF NOT EXISTS record_archive LIKE record;
+ALTER TABLE record_archive REMOVE PARTITIONING;
+
+CREATE TABLE IF NOT EXISTS record_archive_state (
+    `id` TINYINT NOT NULL,
+    `archived_before` TIMESTAMP NOT NULL,
+    PRIMARY KEY (id)
+);
@@ -0,0 +1,23 @@
+-- Adds the tombstone tables that `scripts/compact_deleted_rows.py` moves
+-- soft-deleted records and operations to, and the `updated_at` columns it
+-- uses to tell how long ago they were deleted.
+USE calculator_service;
+
+-- Rows already deleted get the time this migration runs, so they're only
+-- compacted once the retention window has passed from now
+ALTER TABLE record
+    ADD COLUMN `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP AFTER `deleted`,
+    ADD INDEX `deleted_updated_at` (`deleted`, `updated_at`);
+
+-- The archive must keep the same columns as `record`
+ALTER TABLE record_archive
+    ADD COLUMN `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP AFTER `deleted`;
+
+ALTER TABLE operation
+    ADD COLUMN `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP AFTER `deleted`;
+
+CREATE TABLE IF NOT EXISTS record_tombstone LIKE record_archive;
+
+-- An operation type may be deleted more than once
+CREATE TABLE IF NOT EXISTS operation_tombstone LIKE operation;
+ALTER TABLE operation_tombstone DROP INDEX `type`;
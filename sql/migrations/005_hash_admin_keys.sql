@@ -0,0 +1,16 @@
+-- Stores admin API keys by their SHA-256 hash instead of in full. Keys
+-- signed with asymmetric keys (e.g. RS256) don't fit in VARCHAR(255), and a
+-- leaked copy of the table no longer exposes usable keys.
+USE calculator_service;
+
+ALTER TABLE admin_key
+    ADD COLUMN `api_key_hash` CHAR(64) NULL AFTER `id`;
+
+UPDATE admin_key
+SET api_key_hash = SHA2(api_key, 256)
+WHERE api_key_hash IS NULL;
+
+ALTER TABLE admin_key
+    MODIFY COLUMN `api_key_hash` CHAR(64) NOT NULL,
+    ADD UNIQUE INDEX `api_key_hash` (`api_key_hash`),
+    DROP COLUMN `api_key`;
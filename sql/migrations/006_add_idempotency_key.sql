@@ -0,0 +1,16 @@
+-- Stores responses to calculation requests by `Idempotency-Key`, so retries
+-- are recognised by every instance of the app. Rows can be removed once
+-- `expires_at` has passed.
+USE calculator_service;
+
+CREATE TABLE IF NOT EXISTS idempotency_key (
+    `user_id` MEDIUMINT NOT NULL,
+    `idempotency_key` VARCHAR(255) NOT NULL,
+    `fingerprint` CHAR(64) NULL,
+    `status` SMALLINT NOT NULL,
+    `content_type` VARCHAR(255) NOT NULL,
+    `body` MEDIUMBLOB NOT NULL,
+    `expires_at` TIMESTAMP NOT NULL,
+    PRIMARY KEY (`user_id`, `idempotency_key`),
+    INDEX `expires_at` (`expires_at`)
+);
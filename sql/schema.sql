@@ -3,9 +3,15 @@
 USE calculator_service;
 
 DROP TABLE IF EXISTS record;
+DROP TABLE IF EXISTS record_archive;
+DROP TABLE IF EXISTS record_archive_state;
+DROP TABLE IF EXISTS record_tombstone;
 DROP TABLE IF EXISTS `user`;
 DROP TABLE IF EXISTS operation;
+DROP TABLE IF EXISTS operation_tombstone;
 DROP TABLE IF EXISTS admin_key;
+DROP TABLE IF EXISTS revoked_token;
+DROP TABLE IF EXISTS idempotency_key;
 
 -- user stores users with their login information
 CREATE TABLE `user` (
@@ -22,31 +28,93 @@ CREATE TABLE operation (
     `type` VARCHAR(32) UNIQUE NOT NULL,
     `cost` DECIMAL(15, 2) NOT NULL,
     `deleted` BOOLEAN DEFAULT FALSE,
+    `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     PRIMARY KEY (id)
 );
 
--- record stores a calculation made by a user
+-- operation_tombstone stores soft-deleted operations moved out of
+-- `operation` by `scripts/compact_deleted_rows.py`. A type may be deleted
+-- more than once, so it isn't unique here.
+CREATE TABLE operation_tombstone LIKE operation;
+ALTER TABLE operation_tombstone DROP INDEX `type`;
+
+-- record stores a calculation made by a user. The operation's type and the
+-- cost charged for it are copied onto the record when it is made.
+--
+-- It is partitioned by month of `date`, and
+-- `scripts/rotate_record_partitions.py` adds partitions ahead of time and
+-- moves old ones to `record_archive`. Partitioned tables can't have foreign
+-- keys, and their primary key must include the partitioning column.
 CREATE TABLE record (
     `id` MEDIUMINT NOT NULL AUTO_INCREMENT,
     `operation_id` MEDIUMINT NOT NULL,
+    `operation_type` VARCHAR(32) NOT NULL,
     `user_id` MEDIUMINT NOT NULL,
     `amount` SMALLINT NOT NULL,
+    `charged_cost` DECIMAL(15, 2) NOT NULL,
     `user_balance` DECIMAL(15, 2) NOT NULL,
     `operation_response` JSON NOT NULL,
-    `date` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    `date` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     `deleted` BOOLEAN DEFAULT FALSE,
-    PRIMARY KEY (id),
-    CONSTRAINT `user_id` FOREIGN KEY (`user_id`) REFERENCES `user`(`id`) ON DELETE RESTRICT ON UPDATE CASCADE,
-    CONSTRAINT `operation_id` FOREIGN KEY (`operation_id`) REFERENCES `operation`(`id`) ON DELETE RESTRICT ON UPDATE CASCADE
+    `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (`id`, `date`),
+    INDEX `user_date` (`user_id`, `date`),
+    INDEX `operation_id` (`operation_id`),
+    INDEX `deleted_updated_at` (`deleted`, `updated_at`)
+)
+PARTITION BY RANGE (UNIX_TIMESTAMP(`date`)) (
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+-- record_archive stores records moved out of `record` once they are older
+-- than the retention window. It has the same columns as `record`.
+CREATE TABLE record_archive LIKE record;
+ALTER TABLE record_archive REMOVE PARTITIONING;
+
+-- record_tombstone stores soft-deleted records moved out of `record` by
+-- `scripts/compact_deleted_rows.py`
+CREATE TABLE record_tombstone LIKE record_archive;
+
+-- record_archive_state stores (in a single row) the date before which
+-- records are read from `record_archive` instead of `record`
+CREATE TABLE record_archive_state (
+    `id` TINYINT NOT NULL,
+    `archived_before` TIMESTAMP NOT NULL,
+    PRIMARY KEY (id)
 );
 
--- admin_key stores administrator API keys
+-- admin_key stores the SHA-256 hashes of administrator API keys
 CREATE TABLE admin_key (
     `id` MEDIUMINT NOT NULL AUTO_INCREMENT,
-    `api_key` VARCHAR(255) NOT NULL UNIQUE,
+    `api_key_hash` CHAR(64) NOT NULL UNIQUE,
     `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     `created_by` VARCHAR(255),
     `description` VARCHAR(255),
     `deleted` BOOLEAN DEFAULT FALSE,
     PRIMARY KEY (id)
 );
+
+-- revoked_token stores the IDs of refresh tokens that have already been used.
+-- Rows can be removed once `expires_at` has passed.
+CREATE TABLE revoked_token (
+    `jti` BINARY(16) NOT NULL,
+    `expires_at` TIMESTAMP NOT NULL,
+    PRIMARY KEY (jti),
+    INDEX `expires_at` (`expires_at`)
+);
+
+-- idempotency_key stores the response to each calculation request sent with
+-- an `Idempotency-Key` header, per user, along with a SHA-256 digest of the
+-- request body. A row is inserted in the same transaction as the record it
+-- charged for. Rows can be removed once `expires_at` has passed.
+CREATE TABLE idempotency_key (
+    `user_id` MEDIUMINT NOT NULL,
+    `idempotency_key` VARCHAR(255) NOT NULL,
+    `fingerprint` CHAR(64) NULL,
+    `status` SMALLINT NOT NULL,
+    `content_type` VARCHAR(255) NOT NULL,
+    `body` MEDIUMBLOB NOT NULL,
+    `expires_at` TIMESTAMP NOT NULL,
+    PRIMARY KEY (`user_id`, `idempotency_key`),
+    INDEX `expires_at` (`expires_at`)
+);
@@ -32,8 +32,10 @@ VALUES
 -- Seed some dummy transactions for user ID 1
 INSERT INTO record (
     `operation_id`,
+    `operation_type`,
     `user_id`,
     `amount`,
+    `charged_cost`,
     `user_balance`,
     `operation_response`,
     `date`
@@ -41,24 +43,30 @@ INSERT INTO record (
 VALUES
     (
         6,
+        'random_string',
         1,
         1,
+        1.0,
         24.0,
         JSON_OBJECT('operation', 'random_string', 'operands', JSON_ARRAY(), 'result', 'ABC123'),
         TIMESTAMP('2024-11-02 12:30')
     ),
     (
         1,
+        'addition',
         1,
         1,
+        0.1,
         23.9,
         JSON_OBJECT('operation', 'addition', 'operands', JSON_ARRAY(1, 2), 'result', 3),
         TIMESTAMP('2024-11-02 12:33')
     ),
     (
         3,
+        'multiplication',
         1,
         1,
+        0.25,
         23.65,
         JSON_OBJECT('operation', 'multiplication', 'operands', JSON_ARRAY(21, 2), 'result', 42),
         TIMESTAMP('2024-11-02 13:17')
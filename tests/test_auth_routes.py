@@ -1,8 +1,13 @@
 from unittest.mock import patch
 
+import pymysql
 import pytest
+from bcrypt import checkpw, gensalt, hashpw
 
 from app import app
+from routes.auth import login_user_cache
+from services.jwt_service import JWTService
+from services.password_service import PasswordQueueFullError
 
 
 @pytest.fixture
@@ -12,19 +17,32 @@ def client():
         yield client
 
 
+@pytest.fixture(autouse=True)
+def clear_user_cache():
+    login_user_cache.clear()
+
+
 @patch("routes.auth.DBService")
-@patch("routes.auth.checkpw")
+@patch("services.password_service.bcrypt.checkpw")
 @patch("routes.auth.jwt_service.generate_token")
-def test_login_success(mock_generate_token, mock_checkpw, mock_db_service, client):
+@patch("routes.auth.jwt_service.generate_refresh_token")
+def test_login_success(
+    mock_generate_refresh_token,
+    mock_generate_token,
+    mock_checkpw,
+    mock_db_service,
+    client,
+):
 
     # mock various functions which are called when a user is logged in
     mock_db_service.return_value.__enter__.return_value.fetch_records.return_value = [
-        {"id": 1, "username": "user", "password": "$2b$12$somethinghashed"}
+        {"id": 1, "status": "active", "password": "$2b$12$somethinghashed"}
     ]
 
     mock_checkpw.return_value = True
 
     mock_generate_token.return_value = "mocked_token"
+    mock_generate_refresh_token.return_value = "mocked_refresh_token"
 
     # perform a login request
     response = client.post(
@@ -35,7 +53,11 @@ def test_login_success(mock_generate_token, mock_checkpw, mock_db_service, clien
     # check the response returned
     assert response.status_code == 200
     json_data = response.get_json()
-    assert json_data == {"logged_in": True, "token": "mocked_token"}
+    assert json_data == {
+        "logged_in": True,
+        "token": "mocked_token",
+        "refresh_token": "mocked_refresh_token",
+    }
     mock_checkpw.assert_called_once_with(b"password", b"$2b$12$somethinghashed")
 
 
@@ -55,11 +77,11 @@ def test_login_invalid_user(mock_db_service, client):
 
 
 @patch("routes.auth.DBService")
-@patch("routes.auth.checkpw")
+@patch("services.password_service.bcrypt.checkpw")
 def test_login_invalid_password(mock_checkpw, mock_db_service, client):
 
     mock_db_service.return_value.__enter__.return_value.fetch_records.return_value = [
-        {"id": 1, "username": "user", "password": "$2b$12$somethinghashed"}
+        {"id": 1, "status": "active", "password": "$2b$12$somethinghashed"}
     ]
 
     mock_checkpw.return_value = False
@@ -99,3 +121,166 @@ def test_login_missing_fields(mock_db_service, client):
     )
     assert response.status_code == 409
     assert response.get_json() == {"error": "Field 'password' is required."}
+
+
+@patch("routes.auth.DBService")
+@patch("routes.auth.password_service.rounds", 4)
+def test_login_rehashes_outdated_password(mock_db_service, client):
+
+    hashed = hashpw(b"password", gensalt(5)).decode("utf-8")
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.fetch_records.return_value = [{"id": 1, "status": "active", "password": hashed}]
+
+    response = client.post(
+        "/api/v1/auth/login",
+        json={"username": "user", "password": "password"},
+    )
+
+    assert response.status_code == 200
+
+    table, data, user_id = mock_db.update_record.call_args.args
+    assert (table, user_id) == ("user", 1)
+    assert data["password"].startswith("$2b$04$")
+    assert checkpw(b"password", data["password"].encode("utf-8"))
+
+
+@patch("routes.auth.DBService")
+@patch("routes.auth.password_service.verify")
+def test_login_hash_queue_full(mock_verify, mock_db_service, client):
+
+    mock_db_service.return_value.__enter__.return_value.fetch_records.return_value = [
+        {"id": 1, "status": "active", "password": "$2b$12$somethinghashed"}
+    ]
+    mock_verify.side_effect = PasswordQueueFullError()
+
+    response = client.post(
+        "/api/v1/auth/login",
+        json={"username": "user", "password": "password"},
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+@patch("routes.auth.DBService")
+@patch("services.password_service.bcrypt.checkpw")
+def test_login_inactive_user(mock_checkpw, mock_db_service, client):
+
+    mock_db_service.return_value.__enter__.return_value.fetch_records.return_value = [
+        {"id": 1, "status": "inactive", "password": "$2b$12$somethinghashed"}
+    ]
+
+    response = client.post(
+        "/api/v1/auth/login",
+        json={"username": "user", "password": "password"},
+    )
+
+    assert response.status_code == 403
+    assert response.get_json() == {"error": "User 'user' is inactive"}
+    mock_checkpw.assert_not_called()
+
+
+@patch("routes.auth.DBService")
+@patch("services.password_service.bcrypt.checkpw")
+def test_login_uses_user_cache(mock_checkpw, mock_db_service, client):
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.fetch_records.return_value = [
+        {"id": 1, "status": "active", "password": "$2b$12$somethinghashed"}
+    ]
+    mock_checkpw.return_value = True
+
+    for _ in range(3):
+        response = client.post(
+            "/api/v1/auth/login",
+            json={"username": "user", "password": "password"},
+        )
+        assert response.status_code == 200
+
+    mock_db.fetch_records.assert_called_once_with(
+        "user",
+        fields=["id", "status", "password"],
+        conditions={"username": "user"},
+        limit=1,
+    )
+
+
+@patch("routes.auth.DBService")
+def test_refresh(mock_db_service, client):
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.fetch_records.return_value = [{"status": "active"}]
+
+    jwt_service = JWTService()
+    refresh_token = jwt_service.generate_refresh_token(user_id=1)
+    jti = jwt_service.verify_refresh_token(refresh_token)["jti"]
+
+    response = client.post(
+        "/api/v1/auth/refresh",
+        json={"refresh_token": refresh_token},
+    )
+
+    assert response.status_code == 200
+    json_data = response.get_json()
+    assert jwt_service.verify_token(json_data["token"])["user_id"] == 1
+    assert jwt_service.verify_refresh_token(json_data["refresh_token"])["jti"] != jti
+
+    # the used refresh token is added to the revocation list
+    table, data = mock_db.insert_record.call_args.args
+    assert table == "revoked_token"
+    assert data["jti"] == bytes.fromhex(jti)
+
+
+@patch("routes.auth.DBService")
+def test_refresh_token_reuse(mock_db_service, client):
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.fetch_records.return_value = [{"status": "active"}]
+    mock_db.insert_record.side_effect = pymysql.IntegrityError(1062, "Duplicate entry")
+
+    response = client.post(
+        "/api/v1/auth/refresh",
+        json={"refresh_token": JWTService().generate_refresh_token(user_id=1)},
+    )
+
+    assert response.status_code == 401
+    assert response.get_json() == {"error": "Refresh token has already been used"}
+
+
+@patch("routes.auth.DBService")
+def test_refresh_inactive_user(mock_db_service, client):
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.fetch_records.return_value = [{"status": "inactive"}]
+
+    response = client.post(
+        "/api/v1/auth/refresh",
+        json={"refresh_token": JWTService().generate_refresh_token(user_id=1)},
+    )
+
+    assert response.status_code == 403
+    assert response.get_json() == {"error": "User is inactive"}
+    mock_db.insert_record.assert_not_called()
+
+
+def test_refresh_rejects_access_token(client):
+
+    response = client.post(
+        "/api/v1/auth/refresh",
+        json={"refresh_token": JWTService().generate_token(user_id=1)},
+    )
+
+    assert response.status_code == 401
+    assert response.get_json() == {"error": "Invalid token"}
+
+
+def test_refresh_token_is_not_an_access_token(client):
+
+    refresh_token = JWTService().generate_refresh_token(user_id=1)
+    response = client.get(
+        "/api/v1/calculations",
+        headers={"Authorization": f"Bearer {refresh_token}"},
+    )
+
+    assert response.status_code == 401
+    assert response.get_json() == {"error": "Invalid token"}
@@ -0,0 +1,51 @@
+from unittest.mock import patch
+
+from services.cache_service import TTLCache
+
+
+def test_get_and_set():
+
+    cache = TTLCache(maxsize=2, ttl=30)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("b", "default") == "default"
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 1, "hit_rate": 1 / 3}
+
+
+def test_entries_expire():
+
+    cache = TTLCache(maxsize=2, ttl=30)
+
+    with patch("services.cache_service.time.monotonic", return_value=100):
+        cache.set("a", 1)
+
+    with patch("services.cache_service.time.monotonic", return_value=129):
+        assert cache.get("a") == 1
+
+    with patch("services.cache_service.time.monotonic", return_value=130):
+        assert cache.get("a") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+
+    cache = TTLCache(maxsize=2, ttl=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_invalidate():
+
+    cache = TTLCache(maxsize=2, ttl=30)
+    cache.set("a", 1)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+
+    assert cache.get("a") is None
@@ -1,10 +1,26 @@
+import io
+import os
+import re
 import json
-from unittest.mock import patch
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
 
+import msgpack
 import pytest
 
 from app import app
+from routes.calculation import (
+    DEFAULT_HISTORY_FIELDS,
+    HISTORY_FIELDS,
+    _history_columns,
+    _fetch_history_page,
+    _fetch_history_page_json,
+)
+from services.db_service import DBService
 from services.jwt_service import JWTService
+from services.record_archive_service import ARCHIVE_STATE_TABLE
+from services.rate_limit_service import InMemoryBucketStore
 
 
 @pytest.fixture
@@ -14,12 +30,32 @@ def client():
         yield client
 
 
+@pytest.fixture(autouse=True)
+def rate_limit_buckets():
+    # Every test starts with a full bucket
+    with patch(
+        "routes.calculation.calculation_rate_limiter.store", InMemoryBucketStore()
+    ):
+        yield
+
+
 @pytest.fixture
 def auth_header():
     token = JWTService().generate_token(user_id=1)
     return {"Authorization": f"Bearer {token}"}
 
 
+@pytest.fixture
+def admin_auth_header():
+
+    token = JWTService().generate_admin_token(
+        "UNIT TEST SUITE",
+        "FAKE TOKEN FOR UNIT TESTING",
+    )
+
+    return {"Authorization": f"Bearer {token}"}
+
+
 def test_get_previous_calculations_is_protected(client):
 
     response = client.get("/api/v1/calculations")
@@ -123,6 +159,372 @@ def test_get_previous_calculations(mock_db_service, client, auth_header):
     assert json_data == {"results": formatted_results, "metadata": expected_metadata}
 
 
+@patch("routes.calculation.DBService")
+def test_get_previous_calculations_fields(mock_db_service, client, auth_header):
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.execute_query.side_effect = [
+        [{"total": 1}],
+        [{"id": 2, "date": "2024-11-02 12:45:00", "result": "12"}],
+    ]
+
+    response = client.get(
+        "/api/v1/calculations?fields=result,id,date&operation_type=multiplication",
+        headers=auth_header,
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["results"] == [
+        {"id": 2, "date": "2024-11-02 12:45:00", "result": 12}
+    ]
+
+    # Only the requested columns are selected, with no joins
+    count_query = mock_db.execute_query.call_args_list[0].args[0]
+    query, params = mock_db.execute_query.call_args_list[1].args
+    assert "JOIN" not in count_query
+    assert "JOIN" not in query
+    assert "'calculation'" not in query
+    assert params == ("%Y-%m-%d %H:%i:%s", 1, "multiplication", 10, 0)
+
+
+@patch("routes.calculation.DBService")
+def test_get_previous_calculations_fields_without_date(
+    mock_db_service, client, auth_header
+):
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.execute_query.side_effect = [
+        [{"total": 1}],
+        [
+            {
+                "id": 2,
+                "operation_id": 3,
+                "operation_type": "addition",
+                "operation_cost": "0.1",
+            }
+        ],
+    ]
+
+    response = client.get("/api/v1/calculations?fields=id,operation", headers=auth_header)
+
+    assert response.status_code == 200
+    assert response.get_json()["results"] == [
+        {"id": 2, "operation": {"id": 3, "type": "addition", "cost": "0.1"}}
+    ]
+
+    # The operation is read from the record itself, and no date format is bound
+    query, params = mock_db.execute_query.call_args_list[1].args
+    assert "r.charged_cost" in query
+    assert "JOIN" not in query
+    assert params == (1, 10, 0)
+
+
+def test_get_previous_calculations_unknown_field(client, auth_header):
+
+    response = client.get("/api/v1/calculations?fields=id,password", headers=auth_header)
+
+    assert response.status_code == 400
+    assert "password" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("fields", [",", "%20", " , "])
+def test_get_previous_calculations_no_fields(fields, client, auth_header):
+
+    response = client.get(f"/api/v1/calculations?fields={fields}", headers=auth_header)
+
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith("No fields given")
+
+
+@patch("routes.calculation.archived_before")
+@patch("routes.calculation.DBService")
+def test_get_previous_calculations_with_archive(
+    mock_db_service, mock_archived_before, client, auth_header
+):
+
+    boundary = datetime(2025, 10, 1)
+    mock_archived_before.return_value = boundary
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.execute_query.side_effect = [
+        [{"total": 1}],
+        [{"id": 2, "result": "12"}],
+    ]
+
+    response = client.get(
+        "/api/v1/calculations?fields=id,result&page=2&page_size=5"
+        "&start_date=2025-06-01",
+        headers=auth_header,
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["results"] == [{"id": 2, "result": 12}]
+
+    # Both tables are read, split at the boundary, and only the rows needed
+    # for the page are taken from each
+    count_query, count_params = mock_db.execute_query.call_args_list[0].args
+    query, params = mock_db.execute_query.call_args_list[1].args
+    assert "UNION ALL" in count_query and "record_archive" in count_query
+    assert "UNION ALL" in query and "record_archive" in query
+    assert count_params == (1, "2025-06-01", boundary) * 2
+    assert params == (1, "2025-06-01", boundary, 10) * 2 + (5, 5)
+
+
+@patch("routes.calculation.archived_before")
+@patch("routes.calculation.DBService")
+def test_get_previous_calculations_skips_archive(
+    mock_db_service, mock_archived_before, client, auth_header
+):
+
+    mock_archived_before.return_value = datetime(2025, 10, 1)
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.execute_query.side_effect = [[{"total": 0}], []]
+
+    response = client.get(
+        "/api/v1/calculations?fields=id&start_date=2025-11-01", headers=auth_header
+    )
+
+    assert response.status_code == 200
+
+    # Every requested record is newer than the archive
+    for call in mock_db.execute_query.call_args_list:
+        assert "record_archive" not in call.args[0]
+
+
+@patch("routes.calculation.HISTORY_QUERY_MODE", "json")
+@patch("routes.calculation.DBService")
+def test_get_previous_calculations_json_mode(mock_db_service, client, auth_header):
+
+    # The page as the database builds it (key order as MySQL returns it)
+    page = json.dumps(
+        {
+            "results": [
+                {
+                    "id": 2,
+                    "date": "2024-11-02 12:45:00",
+                    "user": {"id": 1, "status": "active", "username": "a@example.com"},
+                    "operation": {"id": 3, "cost": "0.25", "type": "multiplication"},
+                    "calculation": {"result": 12, "operands": [2, 2, 3]},
+                    "user_balance": "24.65",
+                }
+            ],
+            "metadata": {"page": 2, "total": 11, "page_size": 10},
+        }
+    )
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.execute_query.return_value = [{"page": page}]
+
+    response = client.get(
+        "/api/v1/calculations?page=2&operation_type=multiplication",
+        headers=auth_header,
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    assert response.get_data(as_text=True) == page + "\n"
+
+    # A single query, with the filters bound for both the page and the count
+    query, params = mock_db.execute_query.call_args.args
+    assert "JSON_ARRAYAGG" in query
+    assert params == (
+        "%Y-%m-%d %H:%i:%s",
+        1,
+        "multiplication",
+        10,
+        10,
+        1,
+        "multiplication",
+        2,
+        10,
+    )
+
+
+# History columns that hold JSON, which JSON_OBJECT embeds as is
+HISTORY_JSON_COLUMNS = {"calculation", "result"}
+
+HISTORY_JSON_TOKEN = re.compile(
+    r"\s*(?:'(?P<key>[^']*)'|(?P<object>JSON_OBJECT\()"
+    r"|CAST\(h\.(?P<cast>\w+) AS CHAR\)|h\.`?(?P<column>\w+)`?|(?P<punct>[,)]))"
+)
+
+
+def evaluate_history_json(sql, row):
+    """Build a history item from a row the way the "json" mode's SQL does.
+
+    Understands the subset of SQL used by HISTORY_FIELDS' "json" expressions:
+    JSON_OBJECT, CAST(... AS CHAR) and `h.` columns.
+    """
+
+    tokens = [match.groupdict() for match in HISTORY_JSON_TOKEN.finditer(sql)]
+
+    def value(i):
+        token = tokens[i]
+        if token["object"]:
+            return pairs(i + 1)
+        if token["cast"]:
+            cast = row[token["cast"]]
+            return i + 1, None if cast is None else str(cast)
+
+        column = row[token["column"]]
+        if token["column"] in HISTORY_JSON_COLUMNS and column is not None:
+            column = json.loads(column)
+
+        return i + 1, column
+
+    def pairs(i):
+        item = {}
+        while i < len(tokens) and tokens[i]["punct"] != ")":
+            key = tokens[i]["key"]
+            assert key is not None and tokens[i + 1]["punct"] == ","
+            i, item[key] = value(i + 2)
+            if i < len(tokens) and tokens[i]["punct"] == ",":
+                i += 1
+
+        return i + 1, item
+
+    return pairs(0)[1]
+
+
+def history_rows(fields):
+    """Return fake history rows with the columns selected for `fields`."""
+
+    columns, _ = _history_columns(fields)
+
+    rows = [
+        {
+            "id": 2,
+            "user_balance": Decimal("24.65"),
+            "date": "2024-11-02 12:45:00",
+            "operation_id": 3,
+            "operation_type": "multiplication",
+            "operation_cost": Decimal("0.25"),
+            "user_id": 1,
+            "username": "a@example.com",
+            "user_status": "active",
+            "calculation": '{"operands": [2, 2, 3], "result": 12}',
+            "result": "12",
+        },
+        # A user that's no longer there, and a result that isn't stored
+        {
+            "id": 1,
+            "user_balance": Decimal("24.90"),
+            "date": "2024-11-01 08:00:00",
+            "operation_id": 6,
+            "operation_type": "random_string",
+            "operation_cost": Decimal("1.00"),
+            "user_id": None,
+            "username": None,
+            "user_status": None,
+            "calculation": '{"operands": [{"string_length": 4}], "result": "abcd"}',
+            "result": None,
+        },
+    ]
+
+    return [{alias: row[alias] for alias in columns} for row in rows]
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        DEFAULT_HISTORY_FIELDS,
+        tuple(HISTORY_FIELDS),
+        ("id", "date", "result"),
+        ("user",),
+    ],
+)
+def test_history_formatting_modes_match(fields):
+
+    rows = history_rows(fields)
+
+    db = MagicMock()
+    db.execute_query.side_effect = [[{"total": len(rows)}], rows]
+    page = _fetch_history_page(db, "WHERE r.user_id = %s", [1], 10, 0, fields)
+
+    with app.app_context():
+        expected = json.loads(app.json.dumps(page["results"]))
+
+    item_json = ", ".join(HISTORY_FIELDS[field]["json"] for field in fields)
+    assert [evaluate_history_json(item_json, row) for row in rows] == expected
+
+
+@pytest.mark.parametrize("archive_boundary", [None, datetime(2024, 1, 1)])
+@pytest.mark.parametrize("fetch", [_fetch_history_page, _fetch_history_page_json])
+def test_history_queries_bind_every_param(fetch, archive_boundary):
+
+    db = MagicMock()
+    # Only the count (and the page built by the database) returns a row
+    db.execute_query.side_effect = lambda query, params, **_: (
+        [{"total": 0, "page": "{}"}] if "total" in query else []
+    )
+
+    fetch(
+        db,
+        "WHERE r.user_id = %s AND r.deleted = 0 AND r.operation_type = %s",
+        [1, "addition"],
+        10,
+        20,
+        DEFAULT_HISTORY_FIELDS,
+        archive_boundary,
+    )
+
+    for call in db.execute_query.call_args_list:
+        query, params = call.args
+        assert query.count("%s") == len(params)
+
+
+@pytest.mark.skipif(
+    not os.environ.get("DB_PARITY_TESTS"),
+    reason="Set DB_PARITY_TESTS to compare history query modes against a real database",
+)
+@pytest.mark.parametrize(
+    "where_clause, filters",
+    [
+        ("WHERE r.user_id = %s AND r.deleted = 0", []),
+        (
+            "WHERE r.user_id = %s AND r.deleted = 0 AND r.operation_type = %s",
+            ["addition"],
+        ),
+    ],
+)
+@pytest.mark.parametrize("limit, offset", [(10, 0), (5, 5), (10, 100000)])
+@pytest.mark.parametrize(
+    "fields", [DEFAULT_HISTORY_FIELDS, ("id", "date", "result"), ("user",)]
+)
+@pytest.mark.parametrize("with_archive", [False, True])
+def test_history_query_modes_match(
+    where_clause, filters, limit, offset, fields, with_archive
+):
+
+    user_id = int(os.environ.get("DB_PARITY_USER_ID", 1))
+    filters = [user_id] + filters
+
+    with DBService() as db:
+        # Reads the archive too, split at its boundary
+        archive_boundary = None
+        if with_archive:
+            rows = db.execute_query(
+                f"SELECT archived_before FROM {ARCHIVE_STATE_TABLE} LIMIT 1;"
+            )
+            if not rows:
+                pytest.skip("Nothing has been archived yet")
+
+            archive_boundary = rows[0]["archived_before"]
+
+        page = _fetch_history_page(
+            db, where_clause, filters, limit, offset, fields, archive_boundary
+        )
+        page_json = _fetch_history_page_json(
+            db, where_clause, filters, limit, offset, fields, archive_boundary
+        )
+
+    with app.app_context():
+        expected = json.loads(app.json.dumps(page))
+
+    assert json.loads(page_json) == expected
+
+
 def test_run_calculation_is_protected(client):
 
     calculation_request = {
@@ -163,7 +565,333 @@ def test_run_calculation(mock_db_service, client, auth_header):
 
     assert response.status_code == 200
     json_data = response.get_json()
-    assert json_data == {"operation": "addition", "operands": [1, 3, 2], "result": 6}
+    assert json_data == {
+        "operation": "addition",
+        "operands": [1, 3, 2],
+        "operand_count": 3,
+        "result": 6,
+    }
+
+    # The operation's type and cost are stored with the record
+    stored = mock_db.insert_record.call_args.args[1]
+    assert stored["operation_type"] == "addition"
+    assert stored["charged_cost"] == "0.1"
+
+
+@patch("routes.calculation.DBService")
+def test_run_calculation_msgpack(mock_db_service, client, auth_header):
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+
+    mock_db.insert_record.return_value = 1  # new record ID
+    mock_db.execute_query.return_value = [
+        {"balance": "18.35"},
+    ]
+    mock_db.fetch_records.return_value = [
+        {"id": 3, "type": "multiplication", "cost": "0.25"}
+    ]
+
+    calculation_request = {
+        "operation": "multiplication",
+        "operands": [2**40, 2**40, 3],
+    }
+
+    response = client.post(
+        "/api/v1/calculations/new",
+        data=msgpack.packb(calculation_request),
+        content_type="application/msgpack",
+        headers=auth_header | {"Accept": "application/msgpack"},
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/msgpack"
+
+    # The result doesn't fit in 64 bits, so it is sent as a string
+    assert msgpack.unpackb(response.data) == {
+        "operation": "multiplication",
+        "operands": [2**40, 2**40, 3],
+        "operand_count": 3,
+        "result": str(3 * 2**80),
+    }
+
+    # The record is still stored as JSON
+    stored = mock_db.insert_record.call_args.args[1]["operation_response"]
+    assert json.loads(stored)["result"] == 3 * 2**80
+
+
+def test_run_calculation_invalid_msgpack(client, auth_header):
+
+    response = client.post(
+        "/api/v1/calculations/new",
+        data=b"\xc1",
+        content_type="application/msgpack",
+        headers=auth_header,
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith(
+        "Failed to decode MessagePack body"
+    )
+
+
+@patch("services.idempotency_service.DBService")
+@patch("routes.calculation.DBService")
+def test_run_calculation_idempotency_key(
+    mock_db_service, mock_idempotency_db_service, client, auth_header
+):
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+
+    # The stored response is read back by the retry
+    stored = {}
+
+    def insert_record(table, data):
+        if table == "idempotency_key":
+            stored.update(data)
+        return 1
+
+    mock_db.insert_record.side_effect = insert_record
+    mock_db.execute_query.return_value = [
+        {"balance": "18.35"},
+    ]
+    mock_db.fetch_records.return_value = [{"id": 1, "type": "addition", "cost": "0.1"}]
+
+    mock_idempotency_db = mock_idempotency_db_service.return_value.__enter__.return_value
+    mock_idempotency_db.execute_query.side_effect = lambda *args: (
+        [stored] if stored else []
+    )
+
+    headers = auth_header | {"Idempotency-Key": "test-run-calculation-retry"}
+    calculation_request = {"operation": "addition", "operands": [1, 3, 2]}
+
+    responses = [
+        client.post(
+            "/api/v1/calculations/new", json=calculation_request, headers=headers
+        )
+        for _ in range(2)
+    ]
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[0].get_json() == responses[1].get_json()
+    assert responses[1].headers["Idempotent-Replayed"] == "true"
+
+    # The key was stored along with the charge, and the retry was neither
+    # calculated nor charged again
+    assert [c.args[0] for c in mock_db.insert_record.call_args_list] == [
+        "idempotency_key",
+        "record",
+    ]
+    mock_db.transaction.assert_called_once()
+
+
+@patch("routes.calculation.CALCULATION_STREAM_MIN_BYTES", 0)
+@patch("routes.calculation.DBService")
+def test_run_calculation_streamed(mock_db_service, client, auth_header):
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+
+    mock_db.insert_record.return_value = 1  # new record ID
+    mock_db.execute_query.return_value = [
+        {"balance": "18.35"},
+    ]
+    mock_db.fetch_records.return_value = [{"id": 1, "type": "addition", "cost": "0.1"}]
+
+    # Operands sent before the operation are kept until it's known
+    response = client.post(
+        "/api/v1/calculations/new",
+        data='{"operands": [1, 3, 2.5], "operation": "addition"}',
+        content_type="application/json",
+        headers=auth_header,
+    )
+
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "operation": "addition",
+        "operands": None,
+        "operand_count": 3,
+        "result": 6.5,
+    }
+
+    stored = mock_db.insert_record.call_args.args[1]["operation_response"]
+    assert json.loads(stored) == response.get_json()
+
+
+@patch("routes.calculation.CALCULATION_STREAM_MIN_BYTES", 0)
+@patch("routes.calculation.DBService")
+def test_run_calculation_streamed_invalid_operand(
+    mock_db_service, client, auth_header
+):
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+
+    mock_db.execute_query.return_value = [
+        {"balance": "18.35"},
+    ]
+    mock_db.fetch_records.return_value = [{"id": 1, "type": "addition", "cost": "0.1"}]
+
+    response = client.post(
+        "/api/v1/calculations/new",
+        data='{"operation": "addition", "operands": [1, "2", 3]}',
+        content_type="application/json",
+        headers=auth_header,
+    )
+
+    assert response.status_code == 400
+    assert response.get_json() == {
+        "error": "'Addition' operation accepts only number-type operands."
+    }
+    mock_db.insert_record.assert_not_called()
+
+
+@patch("services.calculator_service.requests.get")
+@patch("routes.calculation.DBService")
+def test_run_calculation_streamed_random_string(
+    mock_db_service, mock_get, client, auth_header
+):
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+
+    mock_db.insert_record.return_value = 1
+    mock_db.execute_query.return_value = [
+        {"balance": "18.35"},
+    ]
+    mock_db.fetch_records.return_value = [
+        {"id": 6, "type": "random_string", "cost": "0.5"}
+    ]
+    mock_get.return_value.text = "ABC123\n"
+
+    body = json.dumps(
+        {
+            "operation": "random_string",
+            "operands": [
+                {
+                    "string_length": 6,
+                    "include_digits": True,
+                    "include_uppercase_letters": True,
+                    "include_lowercase_letters": False,
+                }
+            ],
+        }
+    )
+
+    # Sent with chunked transfer encoding (so without a Content-Length), so
+    # the body is parsed as it's read
+    response = client.post(
+        "/api/v1/calculations/new",
+        input_stream=io.BytesIO(body.encode()),
+        content_type="application/json",
+        headers=auth_header | {"Transfer-Encoding": "chunked"},
+        environ_overrides={"wsgi.input_terminated": True},
+    )
+
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "operation": "random_string",
+        "operands": None,
+        "operand_count": 1,
+        "result": "ABC123",
+    }
+    assert mock_get.call_args.kwargs["params"]["len"] == 6
+
+
+@patch("routes.calculation.CALCULATION_STREAM_MIN_BYTES", 0)
+def test_run_calculation_streamed_missing_operation(client, auth_header):
+
+    response = client.post(
+        "/api/v1/calculations/new",
+        data='{"operands": [1, 2]}',
+        content_type="application/json",
+        headers=auth_header,
+    )
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Field 'operation' is required"}
+
+
+@patch("routes.calculation.CALCULATION_STREAM_MIN_BYTES", 0)
+@patch("routes.calculation.DBService")
+def test_run_calculation_streamed_malformed(mock_db_service, client, auth_header):
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+
+    mock_db.execute_query.return_value = [
+        {"balance": "18.35"},
+    ]
+    mock_db.fetch_records.return_value = [{"id": 1, "type": "addition", "cost": "0.1"}]
+
+    response = client.post(
+        "/api/v1/calculations/new",
+        data='{"operation": "addition", "operands": [1, 2',
+        content_type="application/json",
+        headers=auth_header,
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith("Failed to decode JSON body")
+    mock_db.insert_record.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        '{"operation": "addition", "operands": [1, 2]} []',
+        '{"operation": "addition", "operands": [1, 2], "operation": "addition"}',
+        '{"operands": [1], "operation": "addition", "operands": [2]}',
+    ],
+)
+@patch("routes.calculation.CALCULATION_STREAM_MIN_BYTES", 0)
+@patch("routes.calculation.DBService")
+def test_run_calculation_streamed_rejects_extra_data(
+    mock_db_service, body, client, auth_header
+):
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+
+    mock_db.execute_query.return_value = [
+        {"balance": "18.35"},
+    ]
+    mock_db.fetch_records.return_value = [{"id": 1, "type": "addition", "cost": "0.1"}]
+
+    response = client.post(
+        "/api/v1/calculations/new",
+        data=body,
+        content_type="application/json",
+        headers=auth_header,
+    )
+
+    assert response.status_code == 400
+    mock_db.insert_record.assert_not_called()
+
+
+@patch("routes.calculation.CALCULATION_MAX_BODY_BYTES", 16)
+def test_run_calculation_body_too_large(client, auth_header):
+
+    response = client.post(
+        "/api/v1/calculations/new",
+        json={"operation": "addition", "operands": [1, 2, 3]},
+        headers=auth_header,
+    )
+
+    assert response.status_code == 413
+
+
+@patch("routes.calculation.CALCULATION_MAX_BODY_BYTES", 16)
+@patch("routes.calculation.DBService")
+def test_run_calculation_chunked_body_too_large(mock_db_service, client, auth_header):
+
+    body = msgpack.packb({"operation": "addition", "operands": list(range(100))})
+
+    # Without a Content-Length the body is only rejected once it's read
+    response = client.post(
+        "/api/v1/calculations/new",
+        input_stream=io.BytesIO(body),
+        content_type="application/msgpack",
+        headers=auth_header | {"Transfer-Encoding": "chunked"},
+        environ_overrides={"wsgi.input_terminated": True},
+    )
+
+    assert response.status_code == 413
+    mock_db_service.assert_not_called()
 
 
 @patch("routes.calculation.DBService")
@@ -255,3 +983,60 @@ def test_run_calc_required_fields(client, auth_header):
 
     assert response3.status_code == 400
     assert response3.get_json() == {"error": "Field 'operation' is required"}
+
+
+@patch("routes.calculation.calculation_rate_limiter.capacity", 0)
+def test_run_calc_rate_limited(client):
+
+    token = JWTService().generate_token(user_id=42)
+    response = client.post(
+        "/api/v1/calculations/new",
+        json={"operation": "addition", "operands": [1, 2]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 429
+    assert response.get_json() == {"error": "Too many requests"}
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+@patch("routes.calculation.DBService")
+@patch("services.jwt_service.DBService")
+def test_delete_record_rebalances_with_charged_cost(
+    jwt_mock_db_service, mock_db_service, client, admin_auth_header
+):
+
+    jwt_mock_db_service.return_value.__enter__.return_value.fetch_records.return_value = [
+        {"api_key_hash": "valid_api_key_hash"}
+    ]
+
+    mock_db = mock_db_service.return_value.__enter__.return_value
+    mock_db.fetch_records.side_effect = [
+        [
+            {
+                "id": 2,
+                "user_id": 1,
+                "user_balance": Decimal("9.75"),
+                "charged_cost": Decimal("0.25"),
+            }
+        ],
+        [{"id": 2, "deleted": 1}],
+    ]
+    mock_db.execute_query.return_value = [
+        {"id": 3, "cost": Decimal("0.10")},
+        {"id": 4, "cost": Decimal("1.00")},
+    ]
+
+    response = client.delete("/api/v1/calculations/2", headers=admin_auth_header)
+
+    assert response.status_code == 200
+
+    # Later balances are recomputed from the costs actually charged
+    assert "JOIN" not in mock_db.execute_query.call_args.args[0]
+    mock_db.update_many.assert_called_once_with(
+        "record",
+        [
+            {"id": 3, "user_balance": Decimal("9.90")},
+            {"id": 4, "user_balance": Decimal("8.90")},
+        ],
+    )
@@ -202,3 +202,35 @@ def test_random_string_missing_opts(calculator):
             str(e)
             == "Field 'string_length' is required in the settings dictionary (first operand)."
         )
+
+
+@pytest.mark.parametrize(
+    "operation_key, operands",
+    [
+        (1, [1, 2.5, -3]),
+        (2, [10, 2.5, 3]),
+        (3, [2**40, 2**40, 3]),
+        (4, [100, 4, 0.5]),
+        (5, [16]),
+    ],
+)
+def test_calculate_stream_matches_calculate(calculator, operation_key, operands):
+    assert calculator.calculate_stream(operation_key, iter(operands)) == (
+        calculator.calculate(operation_key, operands)
+    )
+
+
+def test_calculate_stream_stops_at_invalid_operand(calculator):
+
+    consumed = []
+
+    def operands():
+        for operand in [1, "2", 3]:
+            consumed.append(operand)
+            yield operand
+
+    with pytest.raises(ValueError):
+        calculator.calculate_stream(1, operands())
+
+    # The operands after the invalid one are never read
+    assert consumed == [1, "2"]
@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import subprocess
+
+# Importing the app in a fresh interpreter must stay under this many
+# milliseconds (best of a few runs). Can be raised with COLD_IMPORT_BUDGET_MS
+# on slow machines.
+COLD_IMPORT_BUDGET_MS = float(os.environ.get("COLD_IMPORT_BUDGET_MS", 1000))
+
+# Modules imported with LazyModule, which importing the app must not load
+LAZY_MODULES = ["requests", "msgpack", "ijson"]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+COLD_IMPORT_SCRIPT = """
+import sys, json, time
+
+start = time.perf_counter()
+import app
+elapsed_ms = (time.perf_counter() - start) * 1000
+
+print(json.dumps({
+    "elapsed_ms": elapsed_ms,
+    "loaded_modules": sorted(sys.modules),
+}))
+"""
+
+
+def cold_import():
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_IMPORT_SCRIPT],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_cold_import_is_within_budget():
+
+    runs = [cold_import() for _ in range(3)]
+
+    assert min(run["elapsed_ms"] for run in runs) < COLD_IMPORT_BUDGET_MS
+
+
+def test_cold_import_skips_lazy_modules():
+
+    loaded = set(cold_import()["loaded_modules"])
+
+    for name in LAZY_MODULES:
+        assert name not in loaded, f"{name} is imported at startup"
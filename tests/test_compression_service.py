@@ -0,0 +1,85 @@
+import gzip
+
+import brotli
+import pytest
+from flask import Flask, Response, jsonify
+
+from services.compression_service import init_response_compression
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    init_response_compression(app, min_size=100)
+
+    @app.route("/large")
+    def large():
+        return jsonify({"results": [{"id": i, "value": "x" * 10} for i in range(100)]})
+
+    @app.route("/small")
+    def small():
+        return jsonify({"id": 1})
+
+    @app.route("/stream")
+    def stream():
+        return Response((f'{{"id": {i}}}\n' for i in range(50)), mimetype="text/plain")
+
+    @app.route("/binary")
+    def binary():
+        return Response(b"\x00" * 1000, mimetype="application/octet-stream")
+
+    with app.test_client() as client:
+        yield client
+
+
+def test_gzip(client):
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) == len(response.data)
+    assert gzip.decompress(response.data).startswith(b'{"results":')
+
+
+def test_brotli_preferred(client):
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, deflate, br"})
+
+    assert response.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(response.data).startswith(b'{"results":')
+
+
+def test_client_preference_respected(client):
+
+    response = client.get("/large", headers={"Accept-Encoding": "br;q=0.5, gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+
+
+def test_not_compressed(client):
+
+    # No acceptable encoding
+    response = client.get("/large")
+    assert "Content-Encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+    # Below the minimum size
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json() == {"id": 1}
+
+    # Not a compressible type
+    response = client.get("/binary", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_streamed_response(client):
+
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert gzip.decompress(response.data) == "".join(
+        f'{{"id": {i}}}\n' for i in range(50)
+    ).encode("utf-8")
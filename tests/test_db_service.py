@@ -0,0 +1,271 @@
+import json
+import logging
+from unittest.mock import MagicMock, patch
+
+import pymysql
+import pytest
+
+from services.db_service import DBService, ReplicaPool, fingerprint_query
+from services.metrics_service import db_query_seconds, db_query_rows
+
+
+def fake_mogrify(query, params):
+    return query % tuple(repr(p) for p in params)
+
+
+@pytest.fixture
+def db():
+    db = DBService()
+    db.connection = MagicMock()
+
+    cursor = db.connection.cursor.return_value.__enter__.return_value
+    cursor.mogrify.side_effect = fake_mogrify
+    # report one affected row per row in the statement
+    cursor.execute.side_effect = lambda sql, params=None: sql.count("), (") + 1
+
+    return db
+
+
+def executed_sql(db):
+    cursor = db.connection.cursor.return_value.__enter__.return_value
+    return [c.args[0] for c in cursor.execute.call_args_list]
+
+
+def test_insert_many(db):
+
+    rows = [{"type": f"op_{i}", "cost": i} for i in range(3)]
+    affected = db.insert_many("operation", rows)
+
+    assert affected == 3
+    assert executed_sql(db) == [
+        "INSERT INTO operation (`type`, `cost`) VALUES "
+        "('op_0', 0), ('op_1', 1), ('op_2', 2)"
+    ]
+    db.connection.commit.assert_called_once()
+
+
+def test_insert_many_chunks_by_packet_size(db):
+
+    rows = [{"type": f"op_{i}", "cost": i} for i in range(10)]
+    affected = db.insert_many("operation", rows, max_packet_bytes=100)
+
+    statements = executed_sql(db)
+    assert affected == 10
+    assert len(statements) > 1
+    assert all(len(sql) <= 100 for sql in statements)
+    assert sum(sql.count("'op_") for sql in statements) == 10
+
+
+def test_insert_many_chunks_by_bytes(db):
+
+    # Each "é" is two bytes once encoded
+    rows = [{"type": "é" * 20, "cost": i} for i in range(10)]
+    db.insert_many("operation", rows, max_packet_bytes=150)
+
+    statements = executed_sql(db)
+    assert len(statements) > 1
+    assert all(len(sql.encode("utf-8")) <= 150 for sql in statements)
+
+
+def test_transaction_commits_once(db):
+
+    with db.transaction():
+        db.insert_record("operation", {"type": "op", "cost": 1})
+        db.update_record("operation", {"cost": 2}, 1)
+
+    db.connection.commit.assert_called_once()
+    assert not db.in_transaction
+
+
+def test_transaction_rolls_back_on_error(db):
+
+    with pytest.raises(pymysql.IntegrityError):
+        with db.transaction():
+            db.insert_record("operation", {"type": "op", "cost": 1})
+            raise pymysql.IntegrityError()
+
+    db.connection.commit.assert_not_called()
+    db.connection.rollback.assert_called_once()
+
+
+def test_insert_many_no_rows(db):
+
+    assert db.insert_many("operation", []) == 0
+    assert executed_sql(db) == []
+
+
+def test_insert_many_mismatched_columns(db):
+
+    with pytest.raises(ValueError):
+        db.insert_many("operation", [{"type": "a", "cost": 1}, {"type": "b"}])
+
+
+def test_update_many(db):
+
+    rows = [{"id": 4, "user_balance": 10.5}, {"id": 7, "user_balance": 10.25}]
+    db.update_many("record", rows)
+
+    assert executed_sql(db) == [
+        "UPDATE record SET `user_balance` = CASE `id` "
+        "WHEN 4 THEN 10.5 WHEN 7 THEN 10.25 ELSE `user_balance` END "
+        "WHERE `id` IN (4, 7)"
+    ]
+    db.connection.commit.assert_called_once()
+
+
+def test_update_many_chunks_by_packet_size(db):
+
+    rows = [{"id": i, "user_balance": i / 4} for i in range(50)]
+    db.update_many("record", rows, max_packet_bytes=300)
+
+    statements = executed_sql(db)
+    assert len(statements) > 1
+    assert all(len(sql) <= 300 for sql in statements)
+    assert sum(sql.split("IN (")[1].count(",") + 1 for sql in statements) == 50
+
+
+def test_update_many_requires_columns(db):
+
+    with pytest.raises(ValueError):
+        db.update_many("record", [{"id": 1}])
+
+    with pytest.raises(ValueError):
+        db.update_many("record", [{"id": 1, "deleted": 1}, {"deleted": 1}])
+
+
+def test_fetch_records_builds_query(db):
+
+    db.execute_query = MagicMock(return_value=[])
+    db.fetch_records(
+        "record",
+        join=[{"table": "operation", "left": "operation.id", "right": "record.operation_id"}],
+        conditions={"record.id": 3, "record.deleted": 0},
+        limit=1,
+        offset=2,
+        order_by="`date` DESC",
+    )
+
+    db.execute_query.assert_called_once_with(
+        "SELECT * FROM record JOIN operation ON operation.id = record.operation_id"
+        " WHERE record.id=%s AND record.deleted=%s ORDER BY `date` DESC LIMIT %s OFFSET %s",
+        (3, 0, 1, 2),
+        read_only=True,
+        primary=False,
+    )
+
+
+def test_sql_cache_reuses_statements(db):
+
+    db.execute_query = MagicMock(return_value=[{"COUNT(*)": 4}])
+
+    db.count_records("operation", conditions={"deleted": 0, "type": "addition"})
+    before = DBService.sql_cache_stats()
+
+    assert db.count_records("operation", conditions={"deleted": 0, "type": "x"}) == 4
+    after = DBService.sql_cache_stats()
+
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"]
+    assert 0.0 < after["hit_rate"] <= 1.0
+
+    first_sql = db.execute_query.call_args_list[0].args[0]
+    second_sql = db.execute_query.call_args_list[1].args[0]
+    assert first_sql is second_sql
+
+
+def test_fingerprint_query():
+
+    assert fingerprint_query(
+        "SELECT * FROM record\n  WHERE user_id = 12 AND `type` = 'it''s'\n LIMIT %s;"
+    ) == "SELECT * FROM record WHERE user_id = ? AND `type` = ? LIMIT ?"
+
+    # bulk statements of any size share a fingerprint
+    assert fingerprint_query(
+        "INSERT INTO t (`a`, `b`) VALUES ('x', 1), ('y', 2.5), (NULL, -3)"
+    ) == fingerprint_query("INSERT INTO t (`a`, `b`) VALUES ('z', 7)")
+
+    assert fingerprint_query(
+        "UPDATE t SET `b` = CASE `id` WHEN 4 THEN 1.5 WHEN 7 THEN 2 ELSE `b` END "
+        "WHERE `id` IN (4, 7)"
+    ) == "UPDATE t SET `b` = CASE `id` WHEN ? THEN ? ELSE `b` END WHERE `id` IN (?+)"
+
+
+def test_queries_are_timed(db):
+
+    db_query_seconds.clear()
+    db_query_rows.clear()
+
+    db.insert_many("operation", [{"type": "a", "cost": 1}, {"type": "b", "cost": 2}])
+
+    fingerprint = "INSERT INTO operation (`type`, `cost`) VALUES (?+)"
+    assert db_query_seconds.snapshot()[fingerprint]["count"] == 1
+    assert db_query_rows.snapshot()[fingerprint]["sum"] == 2
+
+
+@patch("services.db_service.DB_SLOW_QUERY_MS", 0)
+def test_slow_query_log(db, caplog):
+
+    with caplog.at_level(logging.WARNING, logger="db.slow_query"):
+        db.update_record("operation", {"cost": 0.5}, 3)
+
+    entry = json.loads(caplog.records[-1].getMessage())
+    assert entry["event"] == "slow_query"
+    assert entry["fingerprint"] == "UPDATE operation SET cost = ? WHERE id = ?"
+    assert entry["route"] is None
+
+
+def test_replica_pool_round_robin():
+
+    pool = ReplicaPool(["replica-1", "replica-2", "replica-3"], retry_seconds=60)
+
+    assert pool.candidates() == ["replica-1", "replica-2", "replica-3"]
+    assert pool.candidates() == ["replica-2", "replica-3", "replica-1"]
+
+    pool.mark_down("replica-3")
+    assert pool.candidates() == ["replica-1", "replica-2"]
+
+
+@patch("services.db_service.replica_pool", ReplicaPool(["replica-1"]))
+def test_reads_go_to_replica(db):
+
+    replica = MagicMock()
+    replica.cursor.return_value.__enter__.return_value.execute.return_value = 0
+    replica.cursor.return_value.__enter__.return_value.fetchall.return_value = []
+    db._open_connection = MagicMock(return_value=replica)
+
+    db.fetch_records("operation")
+    db._open_connection.assert_called_once_with("replica-1")
+    replica.cursor.assert_called_once()
+
+    # the primary is used when asked for explicitly
+    db.fetch_records("record", primary=True)
+    assert replica.cursor.call_count == 1
+
+
+@patch("services.db_service.replica_pool", ReplicaPool(["replica-1"]))
+def test_reads_stick_to_primary_after_write(db):
+
+    db._open_connection = MagicMock()
+
+    db.update_record("record", {"deleted": 1}, 3)
+    db.fetch_records("record", conditions={"id": 3})
+
+    db._open_connection.assert_not_called()
+
+
+@patch("services.db_service.replica_pool", ReplicaPool(["replica-1", "replica-2"]))
+def test_unreachable_replica_is_skipped(db):
+
+    replica = MagicMock()
+    replica.cursor.return_value.__enter__.return_value.execute.return_value = 1
+    db._open_connection = MagicMock(
+        side_effect=[pymysql.OperationalError(2003, "unreachable"), replica]
+    )
+
+    db.count_records("operation")
+
+    assert [c.args[0] for c in db._open_connection.call_args_list] == [
+        "replica-1",
+        "replica-2",
+    ]
+    assert db.replica_host == "replica-2"
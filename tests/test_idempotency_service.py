@@ -0,0 +1,238 @@
+import contextlib
+
+import pymysql
+import pytest
+from flask import Flask, g, jsonify
+from pymysql.constants import ER
+
+from services.idempotency_service import (
+    IdempotencyConflict,
+    IdempotencyReplay,
+    IdempotencyStore,
+    idempotent,
+)
+
+
+class FakeDB:
+    """Stands in for DBService, keeping `idempotency_key` rows and charges in memory."""
+
+    def __init__(self):
+
+        self.keys = {}
+        self.charges = []
+        self.locked = False
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc_info):
+
+        pass
+
+    @contextlib.contextmanager
+    def transaction(self):
+
+        keys, charges = dict(self.keys), list(self.charges)
+        try:
+            yield self
+        except BaseException:
+            self.keys, self.charges = keys, charges
+            raise
+
+    def execute_query(self, query, params=None):
+
+        statement = query.split()[0]
+        if statement in ("SELECT", "DELETE"):
+            user_id, key, now = params
+            row = self.keys.get((user_id, key))
+
+            if statement == "SELECT":
+                return [row] if row and row["expires_at"] > now else []
+            if row and row["expires_at"] <= now:
+                del self.keys[(user_id, key)]
+
+        return []
+
+    def insert_record(self, table, data):
+
+        if table != "idempotency_key":
+            self.charges.append(data)
+            return len(self.charges)
+
+        if self.locked:
+            raise pymysql.OperationalError(ER.LOCK_WAIT_TIMEOUT, "Lock wait timeout")
+        if (data["user_id"], data["idempotency_key"]) in self.keys:
+            raise pymysql.IntegrityError(ER.DUP_ENTRY, "Duplicate entry")
+
+        self.keys[(data["user_id"], data["idempotency_key"])] = data
+        return 0
+
+
+@pytest.fixture
+def db(monkeypatch):
+
+    db = FakeDB()
+    monkeypatch.setattr("services.idempotency_service.DBService", lambda: db)
+
+    return db
+
+
+def make_app(db, ttl=60):
+
+    app = Flask(__name__)
+    store = IdempotencyStore(ttl=ttl, wait_timeout=1)
+
+    @app.route("/charge", methods=["POST"])
+    @idempotent(store, max_body_bytes=1024)
+    def charge():
+        if app.fail:
+            return jsonify({"error": "Internal Server Error"}), 500
+
+        response = jsonify({"charge": len(db.charges) + 1})
+        response.status_code = 201
+
+        with db.transaction():
+            store.claim(db, response)
+            db.insert_record("charge", {"amount": 1})
+
+        return response
+
+    @app.before_request
+    def authenticate():
+        g.jwt_payload = {"user_id": app.user_id}
+
+    app.store = store
+    app.user_id = 1
+    app.fail = False
+
+    return app
+
+
+@pytest.fixture
+def app(db):
+
+    return make_app(db)
+
+
+def test_idempotent_replays_response(app, db):
+
+    client = app.test_client()
+    headers = {"Idempotency-Key": "abc"}
+
+    first = client.post("/charge", json={"amount": 1}, headers=headers)
+    second = client.post("/charge", json={"amount": 1}, headers=headers)
+
+    assert first.status_code == second.status_code == 201
+    assert first.get_json() == second.get_json() == {"charge": 1}
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert len(db.charges) == 1
+
+    # requests without a key are always handled
+    assert client.post("/charge", json={"amount": 1}).get_json() == {"charge": 2}
+
+
+def test_idempotent_keys_are_per_user(app, db):
+
+    client = app.test_client()
+    headers = {"Idempotency-Key": "abc"}
+
+    client.post("/charge", json={}, headers=headers)
+
+    app.user_id = 2
+    assert client.post("/charge", json={}, headers=headers).get_json() == {"charge": 2}
+
+
+def test_idempotent_rejects_reused_key(app, db):
+
+    client = app.test_client()
+    headers = {"Idempotency-Key": "abc"}
+
+    client.post("/charge", json={"amount": 1}, headers=headers)
+    response = client.post("/charge", json={"amount": 2}, headers=headers)
+
+    assert response.status_code == 422
+    assert len(db.charges) == 1
+
+
+def test_idempotent_does_not_store_unclaimed_responses(app, db):
+
+    client = app.test_client()
+    headers = {"Idempotency-Key": "abc"}
+
+    app.fail = True
+    assert client.post("/charge", json={}, headers=headers).status_code == 500
+    assert not db.keys
+
+    app.fail = False
+    assert client.post("/charge", json={}, headers=headers).status_code == 201
+    assert len(db.charges) == 1
+
+
+def test_idempotent_conflict_while_in_flight(app, db):
+
+    db.locked = True
+    response = app.test_client().post(
+        "/charge", json={}, headers={"Idempotency-Key": "abc"}
+    )
+
+    assert response.status_code == 409
+    assert not db.charges
+
+
+def test_idempotent_expired_keys_are_handled_again(db):
+
+    client = make_app(db, ttl=0).test_client()
+    headers = {"Idempotency-Key": "abc"}
+
+    for _ in range(2):
+        assert client.post("/charge", json={}, headers=headers).status_code == 201
+
+    assert len(db.charges) == 2
+
+
+def test_idempotent_rejects_long_keys(app, db):
+
+    response = app.test_client().post(
+        "/charge", json={}, headers={"Idempotency-Key": "a" * 256}
+    )
+
+    assert response.status_code == 400
+    assert not db.charges
+
+
+def test_claim_replays_key_committed_concurrently(app, db):
+
+    # Both requests looked the key up before either claimed it
+    with app.test_request_context():
+        g.idempotency_key = (1, "abc", None)
+
+        with db.transaction():
+            app.store.claim(db, jsonify({"charge": 1}))
+            db.insert_record("charge", {"amount": 1})
+
+        with pytest.raises(IdempotencyReplay) as excinfo:
+            with db.transaction():
+                app.store.claim(db, jsonify({"charge": 2}))
+                db.insert_record("charge", {"amount": 1})
+
+    assert excinfo.value.stored["body"] == b'{"charge":1}\n'
+    assert len(db.charges) == 1
+
+
+def test_claim_without_key_does_nothing(app, db):
+
+    with app.test_request_context():
+        app.store.claim(db, jsonify({}))
+
+    assert not db.keys
+
+
+def test_claim_conflict_while_locked(app, db):
+
+    db.locked = True
+    with app.test_request_context():
+        g.idempotency_key = (1, "abc", None)
+
+        with pytest.raises(IdempotencyConflict):
+            app.store.claim(db, jsonify({}))
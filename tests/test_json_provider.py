@@ -0,0 +1,86 @@
+import json
+import decimal
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from services.json_provider import OrjsonJSONProvider, RawJSON, TimedJSONProvider
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+@pytest.fixture(params=[OrjsonJSONProvider, TimedJSONProvider])
+def provider(request, app):
+    return request.param(app)
+
+
+def test_dumps_matches_flask_default(provider):
+
+    data = {
+        "b": decimal.Decimal("13.40"),
+        "a": datetime(2024, 11, 2, 12, 45),
+        "c": [1, 2.5, None, True, "ü"],
+    }
+
+    default = TimedJSONProvider(Flask(__name__))
+    assert json.loads(provider.dumps(data)) == json.loads(default.dumps(data))
+    assert json.loads(provider.dumps(data)) == {
+        "a": "Sat, 02 Nov 2024 12:45:00 GMT",
+        "b": "13.40",
+        "c": [1, 2.5, None, True, "ü"],
+    }
+
+
+def test_dumps_sorts_keys(provider):
+
+    assert provider.dumps({"b": 1, "a": 2}).replace(" ", "") == '{"a":2,"b":1}'
+
+
+def test_dumps_large_integers(provider):
+
+    assert json.loads(provider.dumps({"result": 10**30})) == {"result": 10**30}
+
+
+def test_orjson_fallback_matches_orjson(app):
+
+    provider = OrjsonJSONProvider(app)
+    data = {"text": "ü €", "values": [float("nan"), float("inf"), -float("inf"), 1.5]}
+
+    # the same data, with and without an integer orjson can't serialize
+    # (under a key that sorts last)
+    fast = provider.dumps(data)
+    fallback = provider.dumps(data | {"~big": 10**30})
+
+    assert fallback == fast[:-1] + ',"~big":' + str(10**30) + "}"
+    assert '"text":"ü €"' in fallback
+    assert json.loads(fallback)["values"] == [None, None, None, 1.5]
+
+
+def test_raw_json(provider):
+
+    stored = '{"operation": "addition", "operands": [1, 2], "result": 3}'
+
+    assert json.loads(provider.dumps({"id": 1, "calculation": RawJSON(stored)})) == {
+        "id": 1,
+        "calculation": {"operation": "addition", "operands": [1, 2], "result": 3},
+    }
+
+
+def test_orjson_embeds_raw_json_as_is(app):
+
+    provider = OrjsonJSONProvider(app)
+
+    assert provider.dumps([RawJSON('{"b": 1,  "a": 2}')]) == '[{"b": 1,  "a": 2}]'
+
+
+def test_response(app, provider):
+
+    with app.app_context():
+        response = provider.response({"calculation": RawJSON(b'{"result": 3}')})
+
+    assert response.mimetype == "application/json"
+    assert response.get_json() == {"calculation": {"result": 3}}
@@ -0,0 +1,141 @@
+import json
+from datetime import datetime, timedelta, UTC
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+from services.jwt_key_service import JWTKeySet
+from services.jwt_service import JWTService
+
+
+NOW = datetime.now(UTC)
+
+
+def timestamp(days):
+    return (NOW + timedelta(days=days)).isoformat()
+
+
+def write_key_pair(directory, name):
+
+    private_key = Ed25519PrivateKey.generate()
+
+    (directory / f"{name}.private.pem").write_bytes(
+        private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    (directory / f"{name}.public.pem").write_bytes(
+        private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    )
+
+
+@pytest.fixture
+def keyset(tmp_path):
+
+    write_key_pair(tmp_path, "old")
+    write_key_pair(tmp_path, "new")
+
+    keys = [
+        {
+            "kid": "old",
+            "alg": "EdDSA",
+            "private_key_path": "old.private.pem",
+            "public_key_path": "old.public.pem",
+            "not_before": timestamp(-60),
+            "not_after": timestamp(-20),
+            "verify_until": timestamp(10),
+        },
+        {
+            "kid": "new",
+            "alg": "EdDSA",
+            "private_key_path": "new.private.pem",
+            "public_key_path": "new.public.pem",
+            "not_before": timestamp(-20),
+        },
+    ]
+
+    path = tmp_path / "keyset.json"
+    path.write_text(json.dumps({"keys": keys}))
+
+    return JWTKeySet.from_file(str(path))
+
+
+def test_signing_key_follows_rotation(keyset):
+
+    assert keyset.signing_key(NOW).kid == "new"
+    assert keyset.signing_key(NOW - timedelta(days=30)).kid == "old"
+
+    with pytest.raises(LookupError):
+        keyset.signing_key(NOW - timedelta(days=90))
+
+
+def test_verification_windows_overlap(keyset):
+
+    assert keyset.verifying_key("old", NOW).kid == "old"
+    assert keyset.verifying_key("old", NOW + timedelta(days=11)) is None
+    assert keyset.verifying_key("missing", NOW) is None
+
+    # retired keys can still verify credentials that never expire
+    late = NOW + timedelta(days=11)
+    assert keyset.verifying_key("old", late, include_retired=True).kid == "old"
+
+
+def test_jwks(keyset):
+
+    jwks = keyset.jwks(NOW)
+
+    assert sorted(key["kid"] for key in jwks["keys"]) == ["new", "old"]
+    assert all(key["kty"] == "OKP" and "d" not in key for key in jwks["keys"])
+
+
+def test_jwt_service_with_keyset(keyset):
+
+    jwt_service = JWTService(secret_key=None, keyset=keyset)
+    token = jwt_service.generate_token(user_id=999)
+
+    header = jwt.get_unverified_header(token)
+    assert header == {"alg": "EdDSA", "kid": "new", "typ": "JWT"}
+    assert jwt_service.verify_token(token)["user_id"] == 999
+
+    # tokens from before the rotation are still accepted
+    old_key = keyset.keys["old"]
+    old_token = jwt.encode(
+        {"user_id": 7},
+        old_key.signing_key,
+        algorithm="EdDSA",
+        headers={"kid": "old"},
+    )
+    assert jwt_service.verify_token(old_token)["user_id"] == 7
+
+    # tokens signed with the shared secret are rejected when no secret is set
+    hs_token = JWTService(secret_key="TEST SECRET").generate_token(user_id=1)
+    assert jwt_service.verify_token(hs_token) == {"error": "Invalid token"}
+
+
+def test_admin_key_outlives_signing_key(keyset):
+
+    jwt_service = JWTService(secret_key=None, keyset=keyset)
+
+    old_key = keyset.keys["old"]
+    admin_token = jwt.encode(
+        {"role": "admin", "created_by": "test", "description": "test"},
+        old_key.signing_key,
+        algorithm="EdDSA",
+        headers={"kid": "old"},
+    )
+
+    # the old key's verification window has closed
+    old_key.verify_until = NOW - timedelta(days=1)
+
+    assert jwt_service.verify_token(admin_token) == {"error": "Invalid token"}
+    assert (
+        jwt_service.verify_token(admin_token, include_retired_keys=True)["role"]
+        == "admin"
+    )
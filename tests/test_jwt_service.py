@@ -38,3 +38,18 @@ def test_verify_expired_token():
 
     result = jwt_service.verify_token(token)
     assert result == {"error": "Token has expired"}
+
+
+def test_refresh_token():
+
+    jwt_service = JWTService(secret_key="TEST SECRET", refresh_expiration_days=30)
+    token = jwt_service.generate_refresh_token(user_id=999)
+
+    decoded_token = jwt_service.verify_refresh_token(token)
+    assert decoded_token["user_id"] == 999
+    assert decoded_token["type"] == "refresh"
+    assert len(decoded_token["jti"]) == 32
+
+    # access tokens are not accepted as refresh tokens
+    access_token = jwt_service.generate_token(user_id=999)
+    assert jwt_service.verify_refresh_token(access_token) == {"error": "Invalid token"}
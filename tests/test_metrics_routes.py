@@ -0,0 +1,60 @@
+from unittest.mock import patch
+
+import pytest
+
+from app import app
+from services.jwt_service import JWTService
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def auth_header():
+    token = JWTService().generate_token(user_id=1)
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def admin_auth_header():
+
+    token = JWTService().generate_admin_token(
+        "UNIT TEST SUITE",
+        "FAKE TOKEN FOR UNIT TESTING",
+    )
+
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_metrics_is_protected(client, auth_header):
+
+    response = client.get("/metrics")
+    assert response.status_code == 401
+
+    response = client.get("/metrics", headers=auth_header)
+    assert response.status_code == 403
+
+
+@patch("services.jwt_service.DBService")
+def test_get_metrics(mock_db_service, client, admin_auth_header):
+
+    mock_db_service.return_value.__enter__.return_value.fetch_records.return_value = [
+        {"api_key_hash": "valid_api_key_hash"}
+    ]
+
+    # Make a request that should show up in the request metrics
+    client.get("/api/v1/operations")
+
+    response = client.get("/metrics", headers=admin_auth_header)
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+
+    body = response.get_data(as_text=True)
+    assert 'http_requests_total{blueprint="operation",status="401"}' in body
+    assert "# TYPE db_query_duration_seconds histogram" in body
+    assert 'cache_hits{cache="login_user"}' in body
@@ -0,0 +1,94 @@
+import threading
+
+from services.metrics_service import (
+    Counter,
+    CounterFamily,
+    Histogram,
+    HistogramFamily,
+    register,
+    render_prometheus,
+)
+
+
+def test_histogram():
+
+    histogram = Histogram(buckets=(1, 5, 10))
+    for value in [0.5, 1, 3, 7, 50]:
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {1: 2, 5: 3, 10: 4, "+Inf": 5}
+    assert snapshot["sum"] == 61.5
+    assert snapshot["count"] == 5
+
+
+def test_histogram_family():
+
+    family = HistogramFamily("route", buckets=(1,))
+    family.observe("a", 0.5)
+    family.observe("a", 2)
+    family.observe("b", 0.5)
+
+    snapshot = family.snapshot()
+    assert snapshot["a"]["count"] == 2
+    assert snapshot["b"]["buckets"] == {1: 1, "+Inf": 1}
+
+    family.clear()
+    assert family.snapshot() == {}
+
+
+def test_counter_sums_thread_shards():
+
+    counter = Counter()
+
+    def work():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value == 4000
+
+
+def test_render_prometheus():
+
+    family = register(
+        "test_operations_total",
+        "Test operations.",
+        CounterFamily(("operation", "outcome")),
+    )
+    family.inc(("add", "ok"), 3)
+
+    output = render_prometheus()
+
+    assert "# TYPE test_operations_total counter" in output
+    assert 'test_operations_total{operation="add",outcome="ok"} 3' in output
+    assert "# TYPE http_request_duration_seconds histogram" in output
+
+
+def test_counter_keeps_counts_of_finished_threads():
+
+    counter = Counter()
+
+    for _ in range(10):
+        thread = threading.Thread(target=counter.inc)
+        thread.start()
+        thread.join()
+
+    # each finished thread's shard is folded into the base total
+    assert counter.value == 10
+    assert len(counter._shards) == 0
+
+
+def test_render_connection_metrics():
+
+    import services.db_service  # noqa: F401  (registers the connection metrics)
+
+    output = render_prometheus()
+
+    assert "# TYPE db_connections_in_use gauge" in output
+    assert "# TYPE db_connections_opened_total counter" in output
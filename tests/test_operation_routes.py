@@ -3,7 +3,7 @@ from unittest.mock import patch
 import pytest
 
 from app import app
-from services.jwt_service import JWTService
+from services.jwt_service import JWTService, hash_api_key
 
 
 @pytest.fixture
@@ -213,7 +213,7 @@ def test_create_operation(
 ):
 
     jwt_mock_db_service.return_value.__enter__.return_value.fetch_records.return_value = [
-        {"api_key": "valid_api_key"}
+        {"api_key_hash": "valid_api_key_hash"}
     ]
 
     routes_mock_db_service.return_value.__enter__.return_value.insert_record.return_value = (
@@ -236,12 +236,19 @@ def test_create_operation(
         "operation", operation_data
     )
 
+    # the key is looked up by its hash
+    token = admin_auth_header["Authorization"].split(" ")[1]
+    jwt_mock_db_service.return_value.__enter__.return_value.fetch_records.assert_called_once_with(
+        "admin_key",
+        conditions={"api_key_hash": hash_api_key(token), "deleted": False},
+    )
+
 
 @patch("services.jwt_service.DBService")
 def test_create_op_missing_fields(jwt_mock_db_service, client, admin_auth_header):
 
     jwt_mock_db_service.return_value.__enter__.return_value.fetch_records.return_value = [
-        {"api_key": "valid_api_key"}
+        {"api_key_hash": "valid_api_key_hash"}
     ]
 
     operation_data = {"cost": 0.35}
@@ -297,7 +304,7 @@ def test_update_operation(
 ):
 
     jwt_mock_db_service.return_value.__enter__.return_value.fetch_records.return_value = [
-        {"api_key": "valid_api_key"}
+        {"api_key_hash": "valid_api_key_hash"}
     ]
 
     routes_mock_db_service.return_value.__enter__.return_value.update_record.return_value = (
@@ -336,7 +343,7 @@ def test_update_op_is_protected(client):
 def test_update_op_no_fields_provided(jwt_mock_db_service, client, admin_auth_header):
 
     jwt_mock_db_service.return_value.__enter__.return_value.fetch_records.return_value = [
-        {"api_key": "valid_api_key"}
+        {"api_key_hash": "valid_api_key_hash"}
     ]
 
     operation_data = {}
@@ -361,7 +368,7 @@ def test_delete_op(
 ):
 
     jwt_mock_db_service.return_value.__enter__.return_value.fetch_records.return_value = [
-        {"api_key": "valid_api_key"}
+        {"api_key_hash": "valid_api_key_hash"}
     ]
 
     mock_db = routes_mock_db_service.return_value.__enter__.return_value
@@ -0,0 +1,55 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from services.metrics_service import password_verify_seconds
+from services.password_service import PasswordService, PasswordQueueFullError
+
+
+def test_hash_and_verify():
+
+    password_service = PasswordService(rounds=4)
+    hashed = password_service.hash("HELLO-pw123~!")
+
+    assert hashed.startswith("$2b$04$")
+
+    before = password_verify_seconds.snapshot()["count"]
+    assert password_service.verify("HELLO-pw123~!", hashed)
+    assert not password_service.verify("wrong", hashed)
+    assert password_verify_seconds.snapshot()["count"] == before + 2
+
+
+def test_needs_rehash():
+
+    password_service = PasswordService(rounds=12)
+
+    assert not password_service.needs_rehash("$2b$12$somethinghashed")
+    assert password_service.needs_rehash("$2b$10$somethinghashed")
+    assert not password_service.needs_rehash("not-a-bcrypt-hash")
+
+
+def test_queue_depth_limit():
+
+    password_service = PasswordService(rounds=4, max_workers=1, max_queue=0)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_checkpw(*_):
+        started.set()
+        release.wait()
+        return True
+
+    with patch("services.password_service.bcrypt.checkpw", slow_checkpw):
+        worker = threading.Thread(target=password_service.verify, args=("a", "b"))
+        worker.start()
+        started.wait()
+
+        with pytest.raises(PasswordQueueFullError):
+            password_service.verify("a", "b")
+
+        release.set()
+        worker.join()
+
+        # the slot is freed once the running verification finishes
+        assert password_service.verify("a", "b")
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+from flask import Flask, g
+
+from services.rate_limit_service import InMemoryBucketStore, RateLimiter, rate_limited
+
+
+def test_token_bucket():
+
+    store = InMemoryBucketStore()
+
+    # a full bucket allows a burst up to its capacity
+    assert store.take("a", capacity=2, refill_rate=1, now=0) == (True, 0.0)
+    assert store.take("a", capacity=2, refill_rate=1, now=0) == (True, 0.0)
+    assert store.take("a", capacity=2, refill_rate=1, now=0) == (False, 1.0)
+
+    # tokens refill over time
+    assert store.take("a", capacity=2, refill_rate=1, now=0.5) == (False, 0.5)
+    assert store.take("a", capacity=2, refill_rate=1, now=1.5) == (True, 0.0)
+
+    # other keys have their own buckets
+    assert store.take("b", capacity=2, refill_rate=1, now=1.5) == (True, 0.0)
+
+
+def test_idle_buckets_are_evicted():
+
+    store = InMemoryBucketStore()
+    store.take("a", capacity=2, refill_rate=1, now=0)
+    store.take("b", capacity=2, refill_rate=1, now=5)
+
+    # "a" refilled completely at t=1, "b" is not full until t=6
+    store.take("c", capacity=2, refill_rate=1, now=5.5)
+    assert len(store) == 2
+
+    store.take("c", capacity=2, refill_rate=1, now=100)
+    assert len(store) == 1
+
+
+@patch.object(InMemoryBucketStore, "MIN_SWEEP_KEYS", 8)
+def test_idle_buckets_behind_active_ones_are_evicted():
+
+    store = InMemoryBucketStore()
+
+    # "slow" is still refilling when the "fast" buckets behind it are full
+    store.take("slow", capacity=100, refill_rate=1, cost=100, now=0)
+    for i in range(6):
+        store.take(f"fast-{i}", capacity=1, refill_rate=1, now=1)
+
+    store.take("new", capacity=1, refill_rate=1, now=5)
+    assert len(store) == 2
+
+
+def test_max_keys():
+
+    store = InMemoryBucketStore(max_keys=2)
+    for key in ["a", "b", "c"]:
+        store.take(key, capacity=5, refill_rate=1, now=0)
+
+    assert len(store) == 2
+
+
+def test_rate_limited_decorator():
+
+    app = Flask(__name__)
+    limiter = RateLimiter(capacity=1, refill_rate=0.25)
+
+    @rate_limited(limiter)
+    def view():
+        return "ok"
+
+    with app.test_request_context():
+        g.jwt_payload = {"user_id": 1}
+
+        assert view() == "ok"
+
+        response, status, headers = view()
+        assert status == 429
+        assert headers == {"Retry-After": "4"}
+        assert response.get_json() == {"error": "Too many requests"}
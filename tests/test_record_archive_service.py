@@ -0,0 +1,80 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from services import record_archive_service
+from services.record_archive_service import (
+    archived_before,
+    fetch_last_archived_record,
+    needs_archive,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_boundary_cache():
+    record_archive_service._boundary_cache.clear()
+    yield
+    record_archive_service._boundary_cache.clear()
+
+
+def test_archived_before_disabled():
+
+    db = MagicMock()
+
+    assert archived_before(db) is None
+    db.execute_query.assert_not_called()
+
+
+@patch("services.record_archive_service.RECORD_ARCHIVE_ENABLED", True)
+def test_archived_before_is_cached():
+
+    db = MagicMock()
+    db.execute_query.return_value = [{"archived_before": datetime(2025, 10, 1)}]
+
+    assert archived_before(db) == datetime(2025, 10, 1)
+    assert archived_before(db) == datetime(2025, 10, 1)
+    db.execute_query.assert_called_once()
+
+
+@patch("services.record_archive_service.RECORD_ARCHIVE_ENABLED", True)
+def test_archived_before_nothing_archived():
+
+    db = MagicMock()
+    db.execute_query.return_value = []
+
+    assert archived_before(db) is None
+    assert fetch_last_archived_record(db, 1) is None
+    db.fetch_records.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "boundary, start_date, expected",
+    [
+        (None, None, False),
+        (None, "2020-01-01", False),
+        (datetime(2025, 10, 1), None, True),
+        (datetime(2025, 10, 1), "2025-09-30", True),
+        (datetime(2025, 10, 1), "2025-09-30 23:59:59", True),
+        (datetime(2025, 10, 1), "2025-10-01", False),
+        (datetime(2025, 10, 1), "2026-01-15 08:00", False),
+        (datetime(2025, 10, 1), "not a date", True),
+        (datetime(2025, 10, 1), "2025-09-30T12:00:00Z", True),
+        (datetime(2025, 10, 1), "2025-10-01T10:00:00+00:00", True),
+        (datetime(2025, 10, 1), "2025-10-01T20:00:00-05:00", False),
+    ],
+)
+def test_needs_archive(boundary, start_date, expected):
+
+    assert needs_archive(boundary, start_date) is expected
+
+
+@patch("services.record_archive_service.RECORD_ARCHIVE_ENABLED", True)
+def test_fetch_last_archived_record():
+
+    db = MagicMock()
+    db.execute_query.return_value = [{"archived_before": datetime(2025, 10, 1)}]
+    db.fetch_records.return_value = [{"id": 7, "user_balance": "12.30"}]
+
+    assert fetch_last_archived_record(db, 1) == {"id": 7, "user_balance": "12.30"}
+    assert db.fetch_records.call_args.args == ("record_archive",)
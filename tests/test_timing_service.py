@@ -0,0 +1,59 @@
+import json
+import logging
+from unittest.mock import patch
+
+import pytest
+
+from app import app
+from services.jwt_service import JWTService
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def auth_header():
+    token = JWTService().generate_token(user_id=1)
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def mock_db_service():
+    with patch("routes.operation.DBService") as mock_db_service:
+        mock_db = mock_db_service.return_value.__enter__.return_value
+        mock_db.fetch_records.return_value = [{"id": 1, "type": "addition", "cost": "0.10"}]
+        yield mock_db_service
+
+
+@patch("services.timing_service.SERVER_TIMING_ENABLED", True)
+def test_server_timing_header(mock_db_service, client, auth_header, caplog):
+
+    with caplog.at_level(logging.INFO, logger="request.timing"):
+        response = client.get("/api/v1/operations/1", headers=auth_header)
+
+    assert response.status_code == 200
+
+    phases = [
+        metric.split(";")[0].strip()
+        for metric in response.headers["Server-Timing"].split(",")
+    ]
+    assert phases == ["auth", "serialize", "total"]
+
+    entry = json.loads(caplog.records[-1].getMessage())
+    assert entry["event"] == "request_timing"
+    assert entry["route"] == "operation.get_single_operation"
+    assert entry["status"] == 200
+    assert set(entry["timings_ms"]) == {"auth", "serialize", "total"}
+
+
+@patch("services.timing_service.SERVER_TIMING_ENABLED", False)
+def test_server_timing_disabled(mock_db_service, client, auth_header):
+
+    response = client.get("/api/v1/operations/1", headers=auth_header)
+
+    assert response.status_code == 200
+    assert "Server-Timing" not in response.headers